@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+
+class _Job:
+    """
+    One database call running on a worker thread.
+
+    Remembers the worker's connection while the call runs so that a cancelled
+    or timed out call can interrupt its query instead of letting it finish.
+    """
+
+    def __init__(self, func, args, kwargs, connections):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.connections = connections
+        self.cancelled = False
+        self.db = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        db = database.get_connection()
+        with self._lock:
+            if self.cancelled:
+                raise asyncio.CancelledError()
+            self.db = db
+            self.connections.add(db)
+        try:
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            with self._lock:
+                self.db = None
+
+    def cancel(self):
+        """Stop the call, interrupting its query if it is already running."""
+        with self._lock:
+            self.cancelled = True
+            if self.db is not None:
+                self.db.interrupt()
+
+
+class AsyncSchoolDB:
+    """
+    asyncio version of the database.py functions for clients that must not block.
+
+    Every call runs on a pool of worker threads and each worker uses its own
+    SQLite connection, so several queries can run at the same time:
+
+        db = AsyncSchoolDB()
+        students, courses = await asyncio.gather(db.get_all_students(), db.get_all_courses())
+
+    Cancelling a call or hitting its timeout interrupts the running query.
+    Write functions report an interrupted write like any other failure (False).
+
+    :ivar timeout: Default seconds to wait for a call, None waits forever
+    :vartype timeout: float
+    """
+
+    def __init__(self, max_workers=4, timeout=None):
+        """
+        Start the worker pool.
+
+        :param max_workers: Number of worker threads (and connections), defaults to 4
+        :type max_workers: int
+        :param timeout: Default timeout in seconds for every call, defaults to None
+        :type timeout: float, optional
+        """
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='school-db')
+        self._connections = set()
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """
+        Run any database function on the worker pool.
+
+        :param func: Function from database.py (or any function using its connections)
+        :type func: callable
+        :param timeout: Seconds to wait, defaults to the instance timeout
+        :type timeout: float, optional
+        :return: Whatever func returns
+        :raises asyncio.TimeoutError: If the call takes longer than timeout
+        """
+        job = _Job(func, args, kwargs, self._connections)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, job)
+        try:
+            return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            job.cancel()
+            raise
+
+    def close(self):
+        """Wait for running calls, stop the workers and close their connections."""
+        self._executor.shutdown(wait=True)
+        manager = database.get_connection_manager()
+        for db in self._connections:
+            manager.close(db)
+        self._connections.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    # Mirrors of the database.py functions
+    async def insert_student(self, student_id, name, age, email, timeout=None):
+        """Async database.insert_student."""
+        return await self.run(database.insert_student, student_id, name, age, email, timeout=timeout)
+
+    async def insert_instructor(self, instructor_id, name, age, email, timeout=None):
+        """Async database.insert_instructor."""
+        return await self.run(database.insert_instructor, instructor_id, name, age, email, timeout=timeout)
+
+    async def insert_course(self, course_id, name, instructor_id=None, timeout=None):
+        """Async database.insert_course."""
+        return await self.run(database.insert_course, course_id, name, instructor_id, timeout=timeout)
+
+    async def register_student_for_course(self, student_id, course_id, timeout=None):
+        """Async database.register_student_for_course."""
+        return await self.run(database.register_student_for_course, student_id, course_id, timeout=timeout)
+
+    async def get_all_students(self, timeout=None):
+        """Async database.get_all_students."""
+        return await self.run(database.get_all_students, timeout=timeout)
+
+    async def get_all_instructors(self, timeout=None):
+        """Async database.get_all_instructors."""
+        return await self.run(database.get_all_instructors, timeout=timeout)
+
+    async def get_all_courses(self, timeout=None):
+        """Async database.get_all_courses."""
+        return await self.run(database.get_all_courses, timeout=timeout)
+
+    async def get_student_courses(self, student_id, include_archive=False, timeout=None):
+        """Async database.get_student_courses."""
+        return await self.run(database.get_student_courses, student_id, include_archive,
+                              timeout=timeout)
+
+    async def get_course_students(self, course_id, include_archive=False, timeout=None):
+        """Async database.get_course_students."""
+        return await self.run(database.get_course_students, course_id, include_archive,
+                              timeout=timeout)
+
+    async def search_students(self, search_term, mode='substring', limit=None, ranked=True, timeout=None):
+        """Async database.search_students."""
+        return await self.run(database.search_students, search_term, mode, limit, ranked, timeout=timeout)
+
+    async def search_instructors(self, search_term, mode='substring', limit=None, ranked=True, timeout=None):
+        """Async database.search_instructors."""
+        return await self.run(database.search_instructors, search_term, mode, limit, ranked, timeout=timeout)
+
+    async def search_courses(self, search_term, mode='substring', limit=None, ranked=True, timeout=None):
+        """Async database.search_courses."""
+        return await self.run(database.search_courses, search_term, mode, limit, ranked, timeout=timeout)
+
+    async def get_database_statistics(self, live=False, timeout=None):
+        """Async database.get_database_statistics."""
+        return await self.run(database.get_database_statistics, live, timeout=timeout)
@@ -0,0 +1,337 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import columnar
+import database
+
+
+# Small timing scripts for the database layer. Each benchmark works on its own
+# temporary database file so it never touches the real school.db.
+# Run with: python benchmark.py [name ...]
+
+def _timed(func, repeat):
+    """
+    Call func repeat times and return the average time per call in microseconds.
+
+    :param func: Function without arguments to time
+    :type func: callable
+    :param repeat: Number of calls
+    :type repeat: int
+    :return: Average microseconds per call
+    :rtype: float
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1_000_000
+
+
+def _fresh_database(tmp_dir, name='bench.db'):
+    """Point the database module at a new empty file inside tmp_dir."""
+    path = os.path.join(tmp_dir, name)
+    database.configure_database(path)
+    database.create_tables()
+    return path
+
+
+def bench_connections(repeat=2000):
+    """
+    Per-call latency of a read and a write with connect-per-call vs the shared connection.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = _fresh_database(tmp_dir)
+        for i in range(100):
+            database.get_connection().execute(
+                "INSERT INTO STUDENTS(ID, NAME, AGE, EMAIL) VALUES (?,?,?,?)",
+                (f"S{i}", f"Student {i}", 20, f"s{i}@school.edu"))
+        database.get_connection().commit()
+
+        def old_read():
+            db = sqlite3.connect(path)
+            db.execute('SELECT id, name, age, email FROM STUDENTS WHERE id = ?', ('S42',)).fetchall()
+            db.close()
+
+        def new_read():
+            database.get_connection().execute(
+                'SELECT id, name, age, email FROM STUDENTS WHERE id = ?', ('S42',)).fetchall()
+
+        def old_write():
+            db = sqlite3.connect(path)
+            db.execute("UPDATE STUDENTS SET AGE = AGE + 1 WHERE ID = ?", ('S1',))
+            db.commit()
+            db.close()
+
+        def new_write():
+            db = database.get_connection()
+            db.execute("UPDATE STUDENTS SET AGE = AGE + 1 WHERE ID = ?", ('S1',))
+            db.commit()
+
+        print("connections (us per call)")
+        print(f"  read   connect-per-call: {_timed(old_read, repeat):8.1f}")
+        print(f"  read   shared:           {_timed(new_read, repeat):8.1f}")
+        write_repeat = max(1, repeat // 10)
+        print(f"  write  connect-per-call: {_timed(old_write, write_repeat):8.1f}")
+        print(f"  write  shared:           {_timed(new_write, write_repeat):8.1f}")
+        database.close_connections()
+
+
+def bench_search(students=200_000, repeat=50):
+    """
+    search_students latency with the FTS5 trigram index vs the LIKE fallback.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _fresh_database(tmp_dir)
+        database.insert_students_bulk(
+            (f"S{i:07d}", f"Name{i} Smith", 20, f"s{i}@school.edu") for i in range(students))
+        terms = ('Name12345', 's99@school', 'S00150')
+
+        def run():
+            for term in terms:
+                database.search_students(term, limit=20)
+
+        print(f"search over {students} students (ms per search)")
+        indexed = _timed(run, repeat) / len(terms) / 1000
+        database.drop_search_index()
+        fallback = _timed(run, max(1, repeat // 10)) / len(terms) / 1000
+        print(f"  FTS5 trigram: {indexed:8.2f}")
+        print(f"  LIKE scan:    {fallback:8.2f}")
+        database.close_connections()
+
+
+def _fill_school(registrations, per_student=5, per_course=50):
+    """Insert a school with the given number of registrations through the bulk APIs."""
+    students = max(1, registrations // per_student)
+    courses = max(1, registrations // per_course)
+    database.insert_instructors_bulk(
+        (f"I{i}", f"Instructor {i}", 40, f"i{i}@school.edu") for i in range(max(1, courses // 3)))
+    database.insert_students_bulk(
+        (f"S{i}", f"Student {i}", 20, f"s{i}@school.edu") for i in range(students))
+    database.insert_courses_bulk(
+        (f"C{i}", f"Course {i}", f"I{i % max(1, courses // 3)}") for i in range(courses))
+    database.register_many(
+        (f"S{n % students}", f"C{(n // students + n) % courses}") for n in range(registrations))
+    return students, courses
+
+
+def _load_all_linear():
+    """The old load_all_from_db: list scans to resolve every instructor and registration."""
+    students = [database.Student(r[1], r[2], r[3], r[0]) for r in database.get_all_students()]
+    instructors = [database.Instructor(r[1], r[2], r[3], r[0]) for r in database.get_all_instructors()]
+    courses = []
+    for course_data in database.get_all_courses():
+        instructor = next((i for i in instructors if i.id == course_data[2]), None)
+        courses.append(database.Course(course_data[0], course_data[1], instructor))
+    for student_id, course_id in database.get_connection().execute(
+            'SELECT student_id, course_id FROM REGISTRATIONS'):
+        student = next((s for s in students if s.id == student_id), None)
+        course = next((c for c in courses if c.id == course_id), None)
+        if student and course:
+            student.register_course(course)
+            course.add_student(student)
+    return students, instructors, courses
+
+
+def bench_load(sizes=(10_000, 100_000, 1_000_000), linear_limit=10_000):
+    """
+    DatabaseGUI.load_all_from_db at several registration counts, plus a single roster load.
+    The old list-scan version is only timed up to linear_limit registrations.
+    """
+    print("load_all_from_db (seconds)")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _fresh_database(tmp_dir)
+            _fill_school(size)
+            gui = database.DatabaseGUI()
+            start = time.perf_counter()
+            gui.load_all_from_db()
+            indexed = time.perf_counter() - start
+            start = time.perf_counter()
+            gui.load_all_from_db(course_ids=['C0'])
+            roster = time.perf_counter() - start
+            line = f"  {size:>9} registrations: indexed {indexed:7.3f}, one roster {roster:7.4f}"
+            if size <= linear_limit:
+                start = time.perf_counter()
+                _load_all_linear()
+                line += f", list scans {time.perf_counter() - start:7.3f}"
+            print(line)
+            gui.close()
+
+
+def bench_profiles(single_rows=500, bulk_rows=200_000):
+    """
+    Single-row commits and a bulk import under each performance profile.
+    """
+    print(f"profiles: {single_rows} insert_student calls / {bulk_rows} row bulk import (seconds)")
+    for name in ('safe', 'fast', 'bulk-load'):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            database.configure_database(os.path.join(tmp_dir, 'bench.db'), profile=name)
+            # Without the FTS index, its triggers would dominate the bulk numbers
+            database.create_tables(search_index=False)
+            start = time.perf_counter()
+            for i in range(single_rows):
+                database.insert_student(f"S{i}", f"Student {i}", 20, f"s{i}@school.edu")
+            single = time.perf_counter() - start
+            # Bulk imports always switch to bulk-load, so time the plain
+            # executemany path here to show the profile's own effect
+            db = database.get_connection()
+            start = time.perf_counter()
+            db.executemany("INSERT INTO STUDENTS(ID, NAME, AGE, EMAIL) VALUES (?,?,?,?)",
+                           ((f"B{i}", f"Bulk {i}", 20, f"b{i}@school.edu") for i in range(bulk_rows)))
+            db.commit()
+            bulk = time.perf_counter() - start
+            print(f"  {name:10} single rows {single:7.3f}, bulk {bulk:7.3f}")
+            database.close_connections()
+
+
+def _used_bytes():
+    """Bytes of the database file in use, not counting free pages."""
+    db = database.get_connection()
+    page_size = db.execute("PRAGMA page_size").fetchone()[0]
+    used = db.execute("PRAGMA page_count").fetchone()[0] - db.execute("PRAGMA freelist_count").fetchone()[0]
+    return used * page_size
+
+
+def bench_compact(registrations=500_000, repeat=2000):
+    """
+    Size and query latency of the default schema vs the compact integer-key schema.
+    """
+    print(f"schema with {registrations} registrations")
+    database.configure_cache(enabled=False)
+    for compact in (False, True):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _fresh_database(tmp_dir)
+            students, courses = _fill_school(registrations)
+            line = f"  {'compact' if compact else 'default':8}"
+            if compact:
+                start = time.perf_counter()
+                database.convert_to_compact_schema()
+                line += f" (converted in {time.perf_counter() - start:5.2f} s)"
+            print(line)
+            print(f"    size:                 {_used_bytes() / 1_000_000:8.1f} MB")
+            n = [0]
+
+            def student_courses():
+                n[0] += 1
+                database.get_student_courses(f"S{n[0] % students}")
+
+            def course_students():
+                n[0] += 1
+                database.get_course_students(f"C{n[0] % courses}")
+
+            print(f"    get_student_courses:  {_timed(student_courses, repeat):8.1f} us")
+            print(f"    get_course_students:  {_timed(course_students, repeat):8.1f} us")
+            start = time.perf_counter()
+            database.DatabaseGUI().load_all_from_db()
+            print(f"    load_all_from_db:     {time.perf_counter() - start:8.3f} s")
+            start = time.perf_counter()
+            database.register_many((f"S{i}", f"C{(i * 7 + 3) % courses}") for i in range(students))
+            print(f"    register_many:        {time.perf_counter() - start:8.3f} s for {students} rows")
+            database.close_connections()
+    database.configure_cache()
+
+
+class _DictStudent:
+    """Student as it was before __slots__, without validation, for bench_memory."""
+
+    def __init__(self, name, age, email, std_id):
+        self.name = name
+        self.age = age
+        self._email = email
+        self.id = std_id
+        self.reg_courses = []
+
+
+class _DictCourse:
+    """Course as it was before __slots__, for bench_memory."""
+
+    def __init__(self, crs_id, crs_name, inst):
+        self.id = crs_id
+        self.name = crs_name
+        self.instructor = inst
+        self.enrolled_students = []
+
+
+def _bytes_per_object(factory, args):
+    """Average bytes tracemalloc sees allocated per factory(*a) call, the args are allocated beforehand."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(*a) for a in args]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / len(objects)
+
+
+def bench_memory(count=200_000):
+    """
+    Bytes per Student and Course object with a per-instance __dict__ vs __slots__.
+    """
+    student_args = [(f"Student {i}", 20, f"s{i}@school.edu", f"S{i}") for i in range(count)]
+    course_args = [(f"C{i}", f"Course {i}", None) for i in range(count)]
+    print(f"memory per object, {count} objects (bytes, includes the empty registration list)")
+    print(f"  Student __dict__:  {_bytes_per_object(_DictStudent, student_args):7.1f}")
+    print(f"  Student __slots__: {_bytes_per_object(database.Student, student_args):7.1f}")
+    print(f"  Course  __dict__:  {_bytes_per_object(_DictCourse, course_args):7.1f}")
+    print(f"  Course  __slots__: {_bytes_per_object(database.Course, course_args):7.1f}")
+
+
+def _load(func):
+    """Call func, return (result, seconds without tracing, bytes still allocated after a second, traced call)."""
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = func()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, used
+
+
+def bench_columnar(registrations=1_000_000, repeat=5):
+    """
+    Building and filtering the columnar store vs loading one object per row.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _fresh_database(tmp_dir)
+        students, courses = _fill_school(registrations)
+        print(f"columnar store, {students} students / {registrations} registrations")
+        loaded, seconds, used = _load(database.DatabaseGUI().load_all_from_db)
+        print(f"  objects:  load {seconds:6.2f} s, {used / 1_000_000:7.1f} MB")
+        objects = loaded[0]
+        del loaded
+        store, seconds, used = _load(columnar.ColumnStore.from_database)
+        print(f"  columnar: load {seconds:6.2f} s, {used / 1_000_000:7.1f} MB")
+
+        def object_filter():
+            return [s for s in objects if 20 <= s.age <= 22 and len(s.reg_courses) >= 5]
+
+        def column_filter():
+            return store.select_students(min_age=20, max_age=22, min_courses=5)
+
+        print("  filter age 20-22 and >= 5 courses (ms)")
+        print(f"    objects:  {_timed(object_filter, repeat) / 1000:8.2f}")
+        print(f"    columnar: {_timed(column_filter, repeat) / 1000:8.2f}")
+        rows = column_filter()[:100]
+        print(f"  materialize 100 matching students: {_timed(lambda: list(store.students_at(rows)), 1):8.1f} us")
+        database.close_connections()
+
+
+BENCHMARKS = {
+    'connections': bench_connections,
+    'search': bench_search,
+    'load': bench_load,
+    'profiles': bench_profiles,
+    'compact': bench_compact,
+    'memory': bench_memory,
+    'columnar': bench_columnar,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+    database.configure_database()
@@ -0,0 +1,431 @@
+from array import array
+from collections import Counter
+from itertools import accumulate, compress, islice, repeat
+import operator
+import sys
+
+import database
+from people import Student, Instructor, Course, enroll
+from serialization_csv import read_csv_rows
+
+
+# Column-oriented (struct-of-arrays) copy of the school for analytics over
+# millions of students. Instead of one Student object per row, every field is
+# one column: ages in a typed array, names interned so repeated names are
+# stored once, and registrations as CSR (compressed sparse row) arrays of row
+# numbers. Filters run over whole columns with map()/compress(), so the loop
+# happens in C. Student/Course objects are only created for the rows the
+# caller actually asks for. The store is a read-only snapshot, changes to the
+# database or CSV files after it was built are not seen.
+
+# Rows read per batch while building, so a big cursor is never held in memory all at once
+_CHUNK_SIZE = 100_000
+
+
+def _csr(keys, values, size):
+    """
+    Group values by key into compressed sparse row arrays.
+
+    The values of key k end up in grouped[offsets[k]:offsets[k + 1]], in the
+    order they were given. Sorting the positions by key with a C-level key
+    function is a lot faster than a counting sort written as a Python loop.
+
+    :param keys: Row number of the key for every value
+    :type keys: array
+    :param values: The values to group
+    :type values: array
+    :param size: Number of keys
+    :type size: int
+    :return: Tuple of (offsets, grouped) arrays
+    :rtype: tuple
+    """
+    order = sorted(range(len(keys)), key=keys.__getitem__)  # stable, keeps the given order
+    grouped = array('I', map(values.__getitem__, order))
+    counts = Counter(keys)
+    offsets = array('I', accumulate(map(counts.get, range(size), repeat(0)), initial=0))
+    return offsets, grouped
+
+
+def _small(column):
+    """
+    The column as bytes if every value fits in one, else None.
+
+    Ages and enrollment counts practically always do, and a bytes column can
+    be filtered with bytes.translate(), which runs entirely in C.
+    """
+    try:
+        return bytes(iter(column))
+    except ValueError:
+        return None
+
+
+def _between(column, small, low, high):
+    """
+    Mask of which values in a column are within [low, high], None means no bound.
+
+    :param column: The values
+    :type column: array
+    :param small: Same values as bytes from _small(), or None
+    :type small: bytes, optional
+    :return: bytes of 0/1 when small is given, else an iterator of booleans,
+        None if there are no bounds
+    """
+    if low is None and high is None:
+        return None
+    if small is not None:
+        # One lookup table for all 256 possible values, then a single translate()
+        table = bytes((low is None or low <= value) and (high is None or value <= high)
+                      for value in range(256))
+        return small.translate(table)
+    masks = []
+    if low is not None:
+        masks.append(map(operator.le, repeat(low), column))
+    if high is not None:
+        masks.append(map(operator.ge, repeat(high), column))
+    if len(masks) == 1:
+        return masks[0]
+    return map(operator.and_, *masks)
+
+
+def _select(count, masks):
+    """
+    Row numbers where every mask is true, all rows if there are no masks.
+
+    :param count: Number of rows
+    :type count: int
+    :param masks: Masks from _between(), None entries are ignored
+    :type masks: list
+    :return: Row numbers in ascending order
+    :rtype: array
+    """
+    masks = [mask for mask in masks if mask is not None]
+    if not masks:
+        return array('I', range(count))
+    if all(isinstance(mask, bytes) for mask in masks):
+        # AND the byte masks as big integers instead of element by element
+        combined = int.from_bytes(masks[0], 'little')
+        for mask in masks[1:]:
+            combined &= int.from_bytes(mask, 'little')
+        mask = combined.to_bytes(count, 'little')
+    elif len(masks) == 1:
+        mask = masks[0]
+    else:
+        mask = map(operator.and_, *masks)
+    return array('I', compress(range(count), mask))
+
+
+class ColumnStore:
+    """
+    Columnar, read-only snapshot of students, courses and registrations.
+
+    Students and courses are addressed by row number (0 to count - 1).
+    Build one with from_database(), from_csv() or from plain rows, filter with
+    select_students() / select_courses(), then materialize only the rows you
+    need with student(), course() or students_at().
+
+    A materialized student has all of its courses, and a materialized course
+    all of its students. Objects reached through them are shared (the same
+    row always gives the same object) but only list the relationships to
+    objects materialized so far until they are asked for themselves.
+
+    :ivar student_ids: ID of every student
+    :vartype student_ids: list
+    :ivar student_names: Name of every student, interned
+    :vartype student_names: list
+    :ivar student_ages: Age of every student
+    :vartype student_ages: array
+    :ivar student_emails: Email of every student
+    :vartype student_emails: list
+    :ivar course_ids: ID of every course
+    :vartype course_ids: list
+    :ivar course_names: Name of every course, interned
+    :vartype course_names: list
+    :ivar course_instructor_ids: Instructor ID of every course, None if it has none
+    :vartype course_instructor_ids: list
+    :ivar student_offsets: CSR offsets, the courses of student s are
+        student_courses[student_offsets[s]:student_offsets[s + 1]]
+    :vartype student_offsets: array
+    :ivar student_courses: Course row numbers grouped by student
+    :vartype student_courses: array
+    :ivar course_offsets: CSR offsets into course_students, same as student_offsets
+    :vartype course_offsets: array
+    :ivar course_students: Student row numbers grouped by course
+    :vartype course_students: array
+    """
+
+    def __init__(self, students, instructors, courses, registrations):
+        """
+        Build the columns from plain rows, usually through one of the from_* constructors.
+
+        Registrations naming an unknown student or course are skipped, like
+        load_from_csv does. They are expected to be unique, as they are in
+        the database.
+
+        :param students: (id, name, age, email) rows
+        :type students: iterable
+        :param instructors: (id, name, age, email) rows
+        :type instructors: iterable
+        :param courses: (id, name, instructor_id) rows, extra columns are ignored
+        :type courses: iterable
+        :param registrations: (student_id, course_id) pairs
+        :type registrations: iterable
+        """
+        intern = sys.intern
+        self.student_ids = []
+        self.student_names = []
+        self.student_ages = array('I')
+        self.student_emails = []
+        students = iter(students)
+        while chunk := list(islice(students, _CHUNK_SIZE)):
+            ids, names, ages, emails = zip(*chunk)
+            self.student_ids.extend(ids)
+            self.student_names.extend(map(intern, names))
+            self.student_ages.extend(ages)
+            self.student_emails.extend(emails)
+
+        # Instructors are few, they stay rows and are materialized on demand
+        self._instructor_rows = {row[0]: tuple(row) for row in instructors}
+
+        self.course_ids = []
+        self.course_names = []
+        self.course_instructor_ids = []
+        for row in courses:
+            self.course_ids.append(row[0])
+            self.course_names.append(intern(row[1]))
+            self.course_instructor_ids.append(row[2] or None)
+
+        self._student_index = {student_id: row for row, student_id in enumerate(self.student_ids)}
+        self._course_index = {course_id: row for row, course_id in enumerate(self.course_ids)}
+
+        # Translate the IDs to row numbers with C-level map()s
+        student_rows = array('I')
+        course_rows = array('I')
+        registrations = iter(registrations)
+        while chunk := list(islice(registrations, _CHUNK_SIZE)):
+            students_of_chunk = list(map(self._student_index.get, map(operator.itemgetter(0), chunk)))
+            courses_of_chunk = list(map(self._course_index.get, map(operator.itemgetter(1), chunk)))
+            if None in students_of_chunk or None in courses_of_chunk:
+                known = list(map(operator.and_,
+                                 map(operator.is_not, students_of_chunk, repeat(None)),
+                                 map(operator.is_not, courses_of_chunk, repeat(None))))
+                students_of_chunk = compress(students_of_chunk, known)
+                courses_of_chunk = compress(courses_of_chunk, known)
+            student_rows.extend(students_of_chunk)
+            course_rows.extend(courses_of_chunk)
+        self.student_offsets, self.student_courses = _csr(
+            student_rows, course_rows, len(self.student_ids))
+        self.course_offsets, self.course_students = _csr(
+            course_rows, student_rows, len(self.course_ids))
+
+        self._small_ages = _small(self.student_ages)
+        # (counts, bytes or None), computed on the first filter that needs them
+        self._count_cache = None
+        self._size_cache = None
+
+        # Objects handed out so far, by row number (instructors by ID)
+        self._students = {}
+        self._courses = {}
+        self._instructors = {}
+        # Rows whose relationships are complete
+        self._full_students = set()
+        self._full_courses = set()
+
+    @classmethod
+    def from_database(cls):
+        """
+        Build a store from the current database, streaming the tables instead of loading objects.
+
+        :return: The new store
+        :rtype: ColumnStore
+        """
+        registrations = database.get_connection().execute(
+            'SELECT student_id, course_id FROM REGISTRATIONS')
+        return cls(database.iter_students(), database.iter_instructors(),
+                   database.iter_courses(), registrations)
+
+    @classmethod
+    def from_csv(cls, filename_prefix="school_data"):
+        """
+        Build a store from the CSV files written by save_to_csv, validating the people like load_from_csv.
+
+        :param filename_prefix: Prefix of the CSV file names, defaults to "school_data"
+        :type filename_prefix: str
+        :return: The new store
+        :rtype: ColumnStore
+        :raises ValueError: If a student or instructor row is invalid
+        """
+        return cls(*read_csv_rows(filename_prefix))
+
+    @property
+    def student_count(self):
+        """Number of students in the store."""
+        return len(self.student_ids)
+
+    @property
+    def course_count(self):
+        """Number of courses in the store."""
+        return len(self.course_ids)
+
+    def student_row(self, student_id):
+        """Row number of a student ID, or None."""
+        return self._student_index.get(student_id)
+
+    def course_row(self, course_id):
+        """Row number of a course ID, or None."""
+        return self._course_index.get(course_id)
+
+    def courses_of(self, row):
+        """Course row numbers of the student in this row."""
+        return self.student_courses[self.student_offsets[row]:self.student_offsets[row + 1]]
+
+    def students_of(self, row):
+        """Student row numbers of the course in this row."""
+        return self.course_students[self.course_offsets[row]:self.course_offsets[row + 1]]
+
+    def enrollment_counts(self):
+        """
+        Number of courses of every student, computed from the CSR offsets.
+
+        :return: One count per student row
+        :rtype: array
+        """
+        offsets = self.student_offsets
+        return array('I', map(operator.sub, islice(offsets, 1, None), offsets))
+
+    def course_sizes(self):
+        """
+        Number of students in every course.
+
+        :return: One count per course row
+        :rtype: array
+        """
+        offsets = self.course_offsets
+        return array('I', map(operator.sub, islice(offsets, 1, None), offsets))
+
+    def select_students(self, min_age=None, max_age=None, min_courses=None, max_courses=None):
+        """
+        Row numbers of the students matching every given bound (all bounds are inclusive).
+
+        Example: store.select_students(min_age=18, max_age=21, min_courses=5)
+
+        :param min_age: Lowest age, defaults to None (no bound)
+        :type min_age: int, optional
+        :param max_age: Highest age, defaults to None (no bound)
+        :type max_age: int, optional
+        :param min_courses: Fewest registered courses, defaults to None (no bound)
+        :type min_courses: int, optional
+        :param max_courses: Most registered courses, defaults to None (no bound)
+        :type max_courses: int, optional
+        :return: Matching student row numbers in ascending order
+        :rtype: array
+        """
+        masks = [_between(self.student_ages, self._small_ages, min_age, max_age)]
+        if min_courses is not None or max_courses is not None:
+            if self._count_cache is None:
+                counts = self.enrollment_counts()
+                self._count_cache = (counts, _small(counts))
+            masks.append(_between(*self._count_cache, min_courses, max_courses))
+        return _select(self.student_count, masks)
+
+    def select_courses(self, min_students=None, max_students=None):
+        """
+        Row numbers of the courses whose number of students is within the bounds (inclusive).
+
+        :param min_students: Fewest students, defaults to None (no bound)
+        :type min_students: int, optional
+        :param max_students: Most students, defaults to None (no bound)
+        :type max_students: int, optional
+        :return: Matching course row numbers in ascending order
+        :rtype: array
+        """
+        if self._size_cache is None:
+            sizes = self.course_sizes()
+            self._size_cache = (sizes, _small(sizes))
+        return _select(self.course_count, [_between(*self._size_cache, min_students, max_students)])
+
+    def _instructor(self, instructor_id):
+        instructor = self._instructors.get(instructor_id)
+        if instructor is None:
+            row = self._instructor_rows.get(instructor_id)
+            if row is None:
+                return None
+            instructor = Instructor.from_trusted_row(row)
+            self._instructors[instructor_id] = instructor
+        return instructor
+
+    def _student_object(self, row):
+        student = self._students.get(row)
+        if student is None:
+            student = Student.from_trusted_row((self.student_ids[row], self.student_names[row],
+                                                self.student_ages[row], self.student_emails[row]))
+            self._students[row] = student
+        return student
+
+    def _course_object(self, row):
+        course = self._courses.get(row)
+        if course is None:
+            instructor = self._instructor(self.course_instructor_ids[row])
+            course = Course(self.course_ids[row], self.course_names[row], instructor)
+            if instructor:
+                instructor.assign_course(course)
+            self._courses[row] = course
+        return course
+
+    def student(self, row):
+        """
+        The Student object of a row, with all of its courses registered.
+
+        :param row: Student row number
+        :type row: int
+        :return: The student, the same object every time
+        :rtype: Student
+        """
+        student = self._student_object(row)
+        if row not in self._full_students:
+            for course_row in self.courses_of(row):
+                enroll(student, self._course_object(course_row))
+            self._full_students.add(row)
+        return student
+
+    def course(self, row):
+        """
+        The Course object of a row, with all of its students enrolled.
+
+        :param row: Course row number
+        :type row: int
+        :return: The course, the same object every time
+        :rtype: Course
+        """
+        course = self._course_object(row)
+        if row not in self._full_courses:
+            for student_row in self.students_of(row):
+                enroll(self._student_object(student_row), course)
+            self._full_courses.add(row)
+        return course
+
+    def students_at(self, rows):
+        """
+        Materialize students one at a time, e.g. for the rows of select_students().
+
+        :param rows: Student row numbers
+        :type rows: iterable
+        :return: Generator of Student objects
+        :rtype: generator
+        """
+        for row in rows:
+            yield self.student(row)
+
+    def courses_at(self, rows):
+        """Materialize courses one at a time, see students_at()."""
+        for row in rows:
+            yield self.course(row)
+
+    def get_student(self, student_id):
+        """The Student with this ID, materialized, or None."""
+        row = self._student_index.get(student_id)
+        return None if row is None else self.student(row)
+
+    def get_course(self, course_id):
+        """The Course with this ID, materialized, or None."""
+        row = self._course_index.get(course_id)
+        return None if row is None else self.course(row)
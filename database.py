@@ -1,20 +1,1014 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from functools import wraps
+from itertools import islice
+from pathlib import Path
+import gzip
+import logging
+import lzma
+import queue
+import reprlib
+import shutil
 import sqlite3
+import tempfile
+import threading
+import time
 import os
 from people import Student, Instructor, Course
 
+DEFAULT_DB_PATH = 'school.db'
+
+logger = logging.getLogger(__name__)
+
+
+class PerformanceProfile:
+    """
+    A set of SQLite PRAGMA settings applied to every connection.
+
+    :ivar name: Name used to select the profile
+    :vartype name: str
+    :ivar journal_mode: 'WAL' lets readers and a writer work at the same time, 'DELETE' is the SQLite default
+    :vartype journal_mode: str
+    :ivar synchronous: 'FULL' fsyncs every commit, 'NORMAL' only at WAL checkpoints, 'OFF' never
+    :vartype synchronous: str
+    :ivar cache_size: Page cache size, negative values are in KiB
+    :vartype cache_size: int
+    :ivar mmap_size: Bytes of the file read through memory mapping, 0 turns it off
+    :vartype mmap_size: int
+    :ivar temp_store: 'DEFAULT', 'FILE' or 'MEMORY' for temporary tables and indexes
+    :vartype temp_store: str
+    :ivar busy_timeout: Milliseconds to wait for a lock before failing
+    :vartype busy_timeout: int
+    """
+
+    def __init__(self, name, journal_mode='WAL', synchronous='NORMAL', cache_size=-2000,
+                 mmap_size=0, temp_store='DEFAULT', busy_timeout=5000):
+        """Create a profile, see the class docstring for the settings."""
+        self.name = name
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.temp_store = temp_store
+        self.busy_timeout = busy_timeout
+
+    def apply(self, db, journal=True):
+        """
+        Run the PRAGMA statements of this profile on a connection.
+
+        :param db: Connection to configure
+        :type db: sqlite3.Connection
+        :param journal: Also set journal_mode, defaults to True
+        :type journal: bool
+        """
+        # journal_mode and synchronous cannot change inside a transaction (e.g.
+        # a bulk import inside transaction()), the open transaction keeps the
+        # current values. journal_mode is also stored in the database file.
+        if journal and not db.in_transaction:
+            try:
+                db.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            except sqlite3.OperationalError:
+                # Leaving WAL needs every other connection closed, keep the
+                # current mode rather than failing the whole connection
+                pass
+        if not db.in_transaction:
+            db.execute(f"PRAGMA synchronous = {self.synchronous}")
+        db.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        db.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        db.execute(f"PRAGMA temp_store = {self.temp_store}")
+        db.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+
+
+PROFILES = {
+    # SQLite defaults: rollback journal and an fsync on every commit
+    'safe': PerformanceProfile('safe', journal_mode='DELETE', synchronous='FULL'),
+    # WAL with fsync only at checkpoints, survives application crashes but
+    # may lose the last commits on power loss
+    'fast': PerformanceProfile('fast', journal_mode='WAL', synchronous='NORMAL',
+                               cache_size=-65536, mmap_size=256 * 1024 * 1024,
+                               temp_store='MEMORY'),
+    # Used while importing: no fsync at all and a big cache
+    'bulk-load': PerformanceProfile('bulk-load', journal_mode='WAL', synchronous='OFF',
+                                    cache_size=-262144, mmap_size=256 * 1024 * 1024,
+                                    temp_store='MEMORY'),
+}
+DEFAULT_PROFILE = 'fast'
+
+
+def get_profile(profile):
+    """
+    Look up a profile by name, PerformanceProfile objects are returned unchanged.
+
+    :param profile: Profile name or object
+    :type profile: str or PerformanceProfile
+    :return: The profile
+    :rtype: PerformanceProfile
+    :raises ValueError: If there is no profile with that name
+    """
+    if isinstance(profile, PerformanceProfile):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown performance profile '{profile}', choose from {', '.join(PROFILES)}")
+    return PROFILES[profile]
+
+
+class ReadPool:
+    """
+    A fixed number of read-only connections shared by worker threads.
+
+    Used to fan out many small report queries (e.g. rosters for every course)
+    in parallel. The connections are opened with a mode=ro URI and query_only,
+    so they can never take the write lock. With the WAL profiles they read
+    while a writer is working instead of waiting for it. They only see
+    committed data.
+
+    :ivar db_path: Path of the SQLite database file
+    :vartype db_path: str
+    :ivar size: Maximum number of connections and worker threads
+    :vartype size: int
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, size=4, cached_statements=256, profile=DEFAULT_PROFILE):
+        """
+        Create a pool for the given database file. Connections are opened on first use.
+
+        :param db_path: Path of the SQLite database file, defaults to 'school.db'
+        :type db_path: str
+        :param size: Maximum number of connections and worker threads, defaults to 4
+        :type size: int
+        :param cached_statements: Prepared statements kept per connection, defaults to 256
+        :type cached_statements: int
+        :param profile: Performance profile for the cache and mmap settings, defaults to DEFAULT_PROFILE
+        :type profile: str or PerformanceProfile
+        """
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.cached_statements = cached_statements
+        self.profile = get_profile(profile)
+        self._idle = queue.Queue()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _open(self):
+        """Open one read-only connection."""
+        uri = Path(os.path.abspath(self.db_path)).as_uri() + '?mode=ro'
+        db = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                             cached_statements=self.cached_statements)
+        # journal_mode belongs to the file and needs write access, leave it
+        self.profile.apply(db, journal=False)
+        db.execute("PRAGMA query_only = ON")
+        return db
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection, waiting for one if all of them are in use.
+
+        :return: Context manager yielding a read-only sqlite3.Connection
+        """
+        try:
+            db = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                db = self._open() if len(self._connections) < self.size else None
+                if db is not None:
+                    self._connections.append(db)
+            if db is None:
+                db = self._idle.get()
+        try:
+            yield db
+        finally:
+            self._idle.put(db)
+
+    def _run(self, func, item):
+        """Call func with a borrowed connection, in a worker thread."""
+        with self.connection() as db:
+            return func(db, item)
+
+    def map(self, func, items, max_pending=None):
+        """
+        Run func(db, item) for every item on the pool's worker threads.
+
+        Results are yielded in the order of items. At most max_pending calls are
+        queued at a time, so a long generator of items is not read all at once.
+        An exception from func is raised when its result is reached.
+
+        :param func: Function taking a connection and one item
+        :type func: callable
+        :param items: Iterable of items, can be a generator
+        :type items: iterable
+        :param max_pending: Calls submitted ahead of the one being collected, defaults to twice the pool size
+        :type max_pending: int, optional
+        :return: Generator of results
+        :rtype: generator
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size,
+                                                    thread_name_prefix='read-pool')
+            executor = self._executor
+        max_pending = max_pending or self.size * 2
+        pending = deque()
+        items = iter(items)
+        try:
+            for item in items:
+                pending.append(executor.submit(self._run, func, item))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Only left early if the caller stopped or a call failed
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        """Stop the worker threads and close every connection."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            connections, self._connections = self._connections, []
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for db in connections:
+            db.close()
+        self._idle = queue.Queue()
+
+
+class ConnectionManager:
+    """
+    Keeps one open SQLite connection per thread and hands it back on every call.
+
+    Opening and closing school.db inside every function meant a bulk import paid
+    for a new connection (and lost the statement cache) on every single row.
+    The manager opens a connection the first time a thread asks for one and then
+    keeps reusing it until close() or close_all() is called.
+
+    :ivar db_path: Path of the SQLite database file
+    :vartype db_path: str
+    :ivar cached_statements: Size of the per-connection prepared statement cache
+    :vartype cached_statements: int
+    :ivar profile: Performance profile applied to every connection
+    :vartype profile: PerformanceProfile
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, cached_statements=256, profile=DEFAULT_PROFILE):
+        """
+        Create a manager for the given database file.
+
+        :param db_path: Path of the SQLite database file, defaults to 'school.db'
+        :type db_path: str
+        :param cached_statements: Prepared statements kept per connection, defaults to 256
+        :type cached_statements: int
+        :param profile: Performance profile name or object, defaults to DEFAULT_PROFILE
+        :type profile: str or PerformanceProfile
+        """
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.profile = get_profile(profile)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._on_connect = []
+        # None until the first search checks whether the FTS5 index exists
+        self.search_index = None
+        # None for the default next to db_path, see get_archive_path()
+        self.archive_path = None
+        self._read_pool = None
+
+    def add_connect_hook(self, hook):
+        """
+        Register a function that is called with every newly opened connection.
+
+        :param hook: Callable taking a sqlite3.Connection
+        :type hook: callable
+        """
+        self._on_connect.append(hook)
+
+    def connect(self):
+        """
+        Get the connection for the current thread, opening it if needed.
+
+        :return: Open connection to db_path
+        :rtype: sqlite3.Connection
+        """
+        db = getattr(self._local, 'db', None)
+        start = None
+        if db is None:
+            start = time.perf_counter()
+            # check_same_thread is off so close_all() can run from any thread,
+            # each connection is still only used by the thread that opened it
+            db = sqlite3.connect(self.db_path, check_same_thread=False,
+                                 cached_statements=self.cached_statements)
+            # Off by default in SQLite, needed for the ON DELETE actions
+            db.execute("PRAGMA foreign_keys = ON")
+            for hook in self._on_connect:
+                hook(db)
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        if start is not None or getattr(self._local, 'profile', None) is not self.profile:
+            # New connection, or set_profile() was called since this thread's
+            # connection was configured
+            self.profile.apply(db)
+            self._local.profile = self.profile
+            if _metrics.enabled and start is not None:
+                _metrics.record_connect((time.perf_counter() - start) * 1000)
+        return db
+
+    def set_profile(self, profile):
+        """
+        Switch the performance profile. Each thread picks it up on its next call.
+
+        :param profile: Profile name or object
+        :type profile: str or PerformanceProfile
+        """
+        self.profile = get_profile(profile)
+
+    def close(self, db=None):
+        """
+        Close the connection that belongs to the current thread.
+
+        :param db: Close this connection instead, e.g. one left behind by a finished worker thread
+        :type db: sqlite3.Connection, optional
+        """
+        if db is None:
+            db = getattr(self._local, 'db', None)
+            self._local.db = None
+            self._local.profile = None
+        if db is not None:
+            with self._lock:
+                if db in self._connections:
+                    self._connections.remove(db)
+            db.close()
+
+    def close_all(self):
+        """Close every connection opened by this manager, from all threads."""
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+        for db in connections:
+            db.close()
+        # Other threads still hold a reference in their thread-local slot,
+        # a fresh local makes them reconnect on their next call
+        self._local = threading.local()
+        if self._read_pool is not None:
+            self._read_pool.close()
+            self._read_pool = None
+
+    def read_pool(self, size=4):
+        """
+        Get the read-only connection pool for this database, creating it on first use.
+
+        :param size: Pool size, only used when the pool is created, defaults to 4
+        :type size: int
+        :return: The manager's read pool
+        :rtype: ReadPool
+        """
+        with self._lock:
+            if self._read_pool is None:
+                self._read_pool = ReadPool(self.db_path, size, self.cached_statements, self.profile)
+            return self._read_pool
+
+
+_manager = ConnectionManager()
+
+
+def configure_database(db_path=DEFAULT_DB_PATH, cached_statements=256, profile=DEFAULT_PROFILE):
+    """
+    Point the module at a different database file.
+
+    Closes any connections to the old file first. Every module function and
+    DatabaseGUI use the new manager afterwards.
+
+    :param db_path: Path of the SQLite database file, defaults to 'school.db'
+    :type db_path: str
+    :param cached_statements: Prepared statements kept per connection, defaults to 256
+    :type cached_statements: int
+    :param profile: Performance profile name or object, defaults to DEFAULT_PROFILE
+    :type profile: str or PerformanceProfile
+    :return: The new connection manager
+    :rtype: ConnectionManager
+    """
+    global _manager
+    old_manager = _manager
+    _manager = ConnectionManager(db_path, cached_statements, profile)
+    _manager._on_connect = list(old_manager._on_connect)
+    old_manager.close_all()
+    _query_cache.clear()
+    return _manager
+
+
+def get_connection_manager():
+    """Return the connection manager shared by the module functions."""
+    return _manager
+
+
+def get_connection():
+    """
+    Get the shared connection for the calling thread.
+
+    :return: Open connection to the configured database
+    :rtype: sqlite3.Connection
+    """
+    return _manager.connect()
+
+
+def get_read_pool(size=4):
+    """
+    Get the read-only connection pool of the configured database.
+
+    :param size: Pool size, only used when the pool is created, defaults to 4
+    :type size: int
+    :return: Shared read pool
+    :rtype: ReadPool
+    """
+    return _manager.read_pool(size)
+
+
+def close_connections():
+    """Close all shared connections. They are reopened on the next call."""
+    _manager.close_all()
+
+
+def set_performance_profile(profile):
+    """
+    Select the performance profile used by all shared connections.
+
+    :param profile: 'safe', 'fast', 'bulk-load' or a PerformanceProfile
+    :type profile: str or PerformanceProfile
+    """
+    _manager.set_profile(profile)
+
+
+@contextmanager
+def use_profile(profile):
+    """
+    Temporarily run the calling thread's connection with another profile.
+
+    Only the per-connection settings change, the journal mode stays as it is.
+    The manager's profile is restored when the block ends.
+
+    :param profile: Profile name or object
+    :type profile: str or PerformanceProfile
+    """
+    db = get_connection()
+    get_profile(profile).apply(db, journal=False)
+    try:
+        yield db
+    finally:
+        _manager.profile.apply(db, journal=False)
+
+
+class QueryCache:
+    """
+    Bounded LRU cache with a time-to-live for query results.
+
+    Every entry is stored with a set of tags such as ('student', 'S1') or
+    ('course', 'C1'). Write functions call invalidate() with the tags they
+    touch, so only the entries that can have changed are thrown away.
+
+    A query that was running while something got invalidated may have read
+    the rows from before the write. Take generation before running it and
+    pass it to put(), which then drops the result instead of caching it.
+
+    :ivar maxsize: Maximum number of entries
+    :vartype maxsize: int
+    :ivar ttl: Seconds an entry stays valid, None for no expiry
+    :vartype ttl: float
+    :ivar enabled: When False every lookup is a miss and nothing is stored
+    :vartype enabled: bool
+    :ivar generation: Number of invalidate() and clear() calls so far
+    :vartype generation: int
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0, enabled=True):
+        """Create an empty cache, see the class docstring for the settings."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()  # key -> (expires, value, tags)
+        self._tagged = {}              # tag -> set of keys
+        self._lock = threading.Lock()
+        self.generation = 0            # bumped by every invalidate() and clear()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Set the hit/miss/eviction/invalidation counters back to zero."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Look up a key.
+
+        :return: Tuple (found, value)
+        :rtype: tuple
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, tags, generation=None):
+        """
+        Store value under key with the given tags, evicting the least recently used entry if full.
+
+        :param generation: The generation read before the value was queried, nothing
+            is stored if there was an invalidation since, defaults to None (always store)
+        :type generation: int, optional
+        """
+        if not self.enabled or self.maxsize <= 0:
+            return
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, value, tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags."""
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self._tagged.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tagged.clear()
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        :return: Dictionary with hits, misses, evictions, invalidations, size and maxsize
+        :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'invalidations': self.invalidations, 'size': len(self._entries),
+                    'maxsize': self.maxsize}
+
+    def _remove(self, key):
+        """Remove one entry and its tag references. The lock must be held."""
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+
+_query_cache = QueryCache()
+
+
+def configure_cache(maxsize=1024, ttl=30.0, enabled=True):
+    """
+    Change the query cache settings. The cache is emptied.
+
+    :param maxsize: Maximum number of cached results, defaults to 1024
+    :type maxsize: int
+    :param ttl: Seconds a result stays valid, None for no expiry, defaults to 30.0
+    :type ttl: float, optional
+    :param enabled: Turn caching on or off, defaults to True
+    :type enabled: bool
+    """
+    _query_cache.clear()
+    _query_cache.maxsize = maxsize
+    _query_cache.ttl = ttl
+    _query_cache.enabled = enabled
+
+
+def get_cache_stats():
+    """Get hit/miss counters and size of the query cache as a dictionary."""
+    return _query_cache.stats()
+
+
+def clear_cache():
+    """Empty the query cache, e.g. after another program changed the database."""
+    _query_cache.clear()
+
+
+def _cached(tags):
+    """
+    Decorator that serves a query function's results from the query cache.
+
+    :param tags: Function called with the query's arguments and result that returns the entry's tags
+    :type tags: callable
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            key = (func.__name__,) + args
+            # Read before the query, so a write committed while it runs is noticed
+            generation = _query_cache.generation
+            found, rows = _query_cache.get(key)
+            if not found:
+                rows = func(*args)
+                # Rows read inside a unit of work may not be committed yet
+                if not _in_unit_of_work():
+                    _query_cache.put(key, rows, tags(*args, rows), generation)
+            # Hand out a copy so callers cannot change the cached list
+            return list(rows)
+        return wrapper
+    return decorator
+
+
+class QueryMetrics:
+    """
+    Call counts, latency histograms and a slow-query log for database functions.
+
+    Turned off by default; configure_instrumentation() switches it on. While on,
+    every instrumented function records its latency and the number of rows it
+    returned, and the SQL it ran is captured with a trace callback. Calls slower
+    than slow_query_ms are logged with their SQL and EXPLAIN QUERY PLAN output.
+
+    :ivar enabled: Whether calls are being recorded
+    :vartype enabled: bool
+    :ivar slow_query_ms: Calls taking at least this many milliseconds are logged, None turns the log off
+    :vartype slow_query_ms: float
+    """
+
+    # Upper bounds (ms) of the latency histogram buckets, plus one open bucket
+    LATENCY_BUCKETS = (1, 5, 10, 50, 100, 500, 1000)
+
+    # Slow bulk calls get whole batches as arguments, only a short repr is
+    # logged and kept, never the objects themselves
+    ARGS_REPR = reprlib.Repr()
+    ARGS_REPR.maxlevel = 3
+    ARGS_REPR.maxtuple = ARGS_REPR.maxlist = ARGS_REPR.maxdict = ARGS_REPR.maxset = 6
+    ARGS_REPR.maxstring = ARGS_REPR.maxother = 60
+
+    def __init__(self, enabled=False, slow_query_ms=100.0, slow_log_size=100):
+        """Create empty metrics, see the class docstring for the settings."""
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._slow_log_size = slow_log_size
+        self.reset()
+
+    def reset(self):
+        """Clear all recorded numbers and the slow-query log."""
+        with self._lock:
+            self.functions = {}
+            self.connections = {'opened': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            self.slow_queries = deque(maxlen=self._slow_log_size)
+
+    def record_call(self, name, elapsed_ms, rows, failed):
+        """Add one call of function name to its counters."""
+        bucket = len(self.LATENCY_BUCKETS)
+        for index, bound in enumerate(self.LATENCY_BUCKETS):
+            if elapsed_ms <= bound:
+                bucket = index
+                break
+        with self._lock:
+            stats = self.functions.get(name)
+            if stats is None:
+                stats = {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                         'histogram': [0] * (len(self.LATENCY_BUCKETS) + 1)}
+                self.functions[name] = stats
+            stats['calls'] += 1
+            stats['errors'] += failed
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['rows'] += rows or 0
+            stats['histogram'][bucket] += 1
+
+    def record_connect(self, elapsed_ms):
+        """Add one newly opened connection and the time it took to set up."""
+        with self._lock:
+            self.connections['opened'] += 1
+            self.connections['total_ms'] += elapsed_ms
+            self.connections['max_ms'] = max(self.connections['max_ms'], elapsed_ms)
+
+    def record_slow(self, name, args, elapsed_ms, statements, db):
+        """Log a slow call with the plan of every statement it ran."""
+        args = self.ARGS_REPR.repr(tuple(args))
+        entries = []
+        for sql in statements:
+            sql = sql.strip()
+            if sql.split(None, 1)[0].upper() not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'):
+                continue
+            try:
+                plan = [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql)]
+            except sqlite3.Error as e:
+                plan = [f"(no plan: {e})"]
+            entries.append({'sql': sql, 'plan': plan})
+        record = {'function': name, 'args': args, 'ms': round(elapsed_ms, 3),
+                  'time': datetime.now().isoformat(timespec='seconds'), 'statements': entries}
+        with self._lock:
+            self.slow_queries.append(record)
+        lines = [f"Slow query: {name}{args} took {elapsed_ms:.1f} ms"]
+        for entry in entries:
+            lines.append(f"  SQL: {entry['sql']}")
+            lines.extend(f"    PLAN: {step}" for step in entry['plan'])
+        skipped = getattr(statements, 'skipped', 0)
+        if skipped:
+            lines.append(f"  ... and {skipped} more statements")
+        logger.warning('\n'.join(lines))
+
+    def snapshot(self):
+        """
+        Copy of the current numbers.
+
+        :return: Dictionary with 'functions', 'connections', 'slow_queries' and 'buckets'
+        :rtype: dict
+        """
+        with self._lock:
+            functions = {}
+            for name, stats in self.functions.items():
+                stats = dict(stats, histogram=list(stats['histogram']))
+                stats['avg_ms'] = stats['total_ms'] / stats['calls']
+                functions[name] = stats
+            return {'functions': functions, 'connections': dict(self.connections),
+                    'slow_queries': list(self.slow_queries),
+                    'buckets': self.LATENCY_BUCKETS + (float('inf'),)}
+
+
+_metrics = QueryMetrics()
+
+
+def configure_instrumentation(enabled=True, slow_query_ms=100.0):
+    """
+    Turn query instrumentation on or off.
+
+    Slow calls are logged through the standard logging module (logger
+    'database', level WARNING) and kept for get_metrics().
+
+    :param enabled: Record calls, defaults to True
+    :type enabled: bool
+    :param slow_query_ms: Threshold for the slow-query log in milliseconds, None for no log, defaults to 100.0
+    :type slow_query_ms: float, optional
+    """
+    _metrics.enabled = enabled
+    _metrics.slow_query_ms = slow_query_ms
+
+
+def get_metrics():
+    """Get the recorded metrics, see QueryMetrics.snapshot()."""
+    return _metrics.snapshot()
+
+
+def reset_metrics():
+    """Clear the recorded metrics."""
+    _metrics.reset()
+
+
+def print_metrics():
+    """Print a table of the recorded metrics, slowest functions first."""
+    snapshot = _metrics.snapshot()
+    print(f"{'function':34} {'calls':>7} {'errors':>6} {'avg ms':>9} {'max ms':>9} {'rows':>9}")
+    ordered = sorted(snapshot['functions'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+    for name, stats in ordered:
+        print(f"{name:34} {stats['calls']:7} {stats['errors']:6} {stats['avg_ms']:9.3f} "
+              f"{stats['max_ms']:9.3f} {stats['rows']:9}")
+    connections = snapshot['connections']
+    print(f"connections opened: {connections['opened']}, setup time {connections['total_ms']:.3f} ms")
+    print(f"slow queries logged: {len(snapshot['slow_queries'])}")
+
+
+class _StatementRecorder(list):
+    """
+    Trace callback that keeps the first few distinct statements of a call.
+
+    executemany and triggers trace once per row, so a bulk import would
+    otherwise collect millions of strings just to log a handful of them.
+    """
+
+    MAX_STATEMENTS = 20
+
+    def __init__(self):
+        super().__init__()
+        self._seen = set()
+        self.skipped = 0
+
+    def __call__(self, sql):
+        if sql in self._seen:
+            return
+        if len(self) >= self.MAX_STATEMENTS:
+            self.skipped += 1
+            return
+        self._seen.add(sql)
+        self.append(sql)
+
+
+def _instrumented(func=None, trace=True):
+    """
+    Decorator that records a database function in the query metrics.
+
+    Only the outermost instrumented call on a thread captures SQL, so a
+    function that calls other instrumented functions logs all of their
+    statements together if it is slow. Use @_instrumented(trace=False) for
+    bulk functions, where tracing every row would cost more than the insert.
+    """
+    if func is None:
+        return lambda func: _instrumented(func, trace)
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _metrics.enabled:
+            return func(*args, **kwargs)
+        local = _metrics._local
+        outer = not getattr(local, 'active', False)
+        statements = _StatementRecorder()
+        if outer:
+            db = get_connection()
+            local.active = True
+            if trace:
+                db.set_trace_callback(statements)
+        start = time.perf_counter()
+        result = None
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = result is False
+            return result
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if outer:
+                if trace:
+                    db.set_trace_callback(None)
+                local.active = False
+            if isinstance(result, list):
+                rows = len(result)
+            elif isinstance(result, dict) and 'inserted' in result:
+                rows = result['inserted']
+            else:
+                rows = None
+            _metrics.record_call(name, elapsed_ms, rows, failed)
+            slow = _metrics.slow_query_ms
+            if outer and slow is not None and elapsed_ms >= slow:
+                _metrics.record_slow(name, args, elapsed_ms, statements, db)
+    return wrapper
+
+
+def _in_unit_of_work():
+    """Check whether the calling thread is inside a transaction() block."""
+    return getattr(_manager._local, 'tx_depth', 0) > 0
+
+
+def _commit(db):
+    """Commit, unless a transaction() block will commit everything at its end."""
+    if not _in_unit_of_work():
+        db.commit()
+
+
+def _rollback():
+    """
+    Undo a half-finished write so the shared connection stays usable.
+
+    Inside a transaction() block nothing is rolled back here: SQLite already
+    undid the failed statement, and the block decides what happens to the rest.
+    """
+    db = getattr(_manager._local, 'db', None)
+    if db is not None and db.in_transaction and not _in_unit_of_work():
+        db.rollback()
+
+
+def _invalidate(*tags):
+    """
+    Drop the cached results carrying any of the tags, or everything without tags.
+
+    Inside a transaction() block the tags are dropped again once the outermost
+    block commits, otherwise another thread reading before the commit would
+    cache the old rows and keep serving them afterwards.
+    """
+    if tags:
+        _query_cache.invalidate(*tags)
+    else:
+        _query_cache.clear()
+    if _in_unit_of_work():
+        local = _manager._local
+        if not hasattr(local, 'tx_invalidated'):
+            local.tx_invalidated = set()
+        # None stands for "clear everything"
+        local.tx_invalidated.update(tags or (None,))
+
+
+def _apply_pending_invalidations():
+    """Drop what the committed unit of work invalidated, see _invalidate()."""
+    tags = getattr(_manager._local, 'tx_invalidated', None)
+    if not tags:
+        return
+    _manager._local.tx_invalidated = set()
+    if None in tags:
+        _query_cache.clear()
+    else:
+        _query_cache.invalidate(*tags)
+
+
+def _outside_unit_of_work(action):
+    """
+    Refuse schema changes inside a transaction() block.
+
+    They commit on their own (or run their own BEGIN), which would either
+    commit the caller's unit of work halfway through or fail.
+
+    :raises RuntimeError: If the calling thread is inside transaction()
+    """
+    if _in_unit_of_work():
+        raise RuntimeError(f"{action} commits on its own and cannot run inside a transaction() block")
+
+
+@contextmanager
+def transaction():
+    """
+    Group several database calls into one unit of work.
+
+    Every module function that reads or writes rows joins it: nothing is
+    committed until the block ends, so a batch of edits costs one commit and
+    either all of it is saved or, if the block raises, none of it is.
+    Nested blocks become savepoints, so an inner block that raises only undoes
+    its own changes:
+
+        with transaction():
+            insert_course('C1', 'Math', 'I1')
+            for student_id in student_ids:
+                register_student_for_course(student_id, 'C1')
+
+    Functions that report failure by returning False (e.g. a duplicate ID)
+    only lose their own statement, the rest of the block is kept.
+    Schema changes (create_tables, migrate, convert_to_compact_schema, the
+    search index and rebuild_statistics functions) commit on their own and
+    raise RuntimeError inside a block.
+
+    :return: The calling thread's connection
+    :rtype: sqlite3.Connection
+    """
+    db = get_connection()
+    local = _manager._local
+    depth = getattr(local, 'tx_depth', 0)
+    savepoint = f"unit_of_work_{depth}"
+    if depth == 0:
+        if db.in_transaction:
+            db.commit()
+        db.execute("BEGIN")
+    else:
+        db.execute(f"SAVEPOINT {savepoint}")
+    local.tx_depth = depth + 1
+    try:
+        yield db
+    except BaseException:
+        local.tx_depth = depth
+        if depth == 0:
+            db.rollback()
+            local.tx_invalidated = set()
+        else:
+            db.execute(f"ROLLBACK TO {savepoint}")
+            db.execute(f"RELEASE {savepoint}")
+        # Results read inside the block may include the undone changes
+        _query_cache.clear()
+        raise
+    local.tx_depth = depth
+    if depth == 0:
+        db.commit()
+        _apply_pending_invalidations()
+    else:
+        db.execute(f"RELEASE {savepoint}")
+
+
 # Database operations - I added this later when I learned about SQL
 # Based on the demo the professor showed us in class
-def create_tables():
+def create_tables(search_index=True):
     """
     Create the database tables for the school system.
     
     Sets up the SQLite database with proper foreign key relationships.
     I struggled with the SQL syntax at first but eventually got it working.
     
+    :param search_index: Also set up the FTS5 search index, defaults to True
+    :type search_index: bool
     :raises sqlite3.Error: If there's a problem creating the database tables
     """
-    db = sqlite3.connect('school.db')
+    _outside_unit_of_work("create_tables()")
+    db = get_connection()
     cursor = db.cursor()
     
     # Students table
@@ -59,9 +1053,780 @@ def create_tables():
     """)
     
     db.commit()
-    db.close()
 
+    migrate()
+
+    if search_index:
+        create_search_index()
+
+
+# Statistics counters - kept up to date by triggers so get_database_statistics
+# reads a few rows instead of running COUNT(*) over every table
+_STATISTICS_TABLES = [
+    """CREATE TABLE IF NOT EXISTS TABLE_COUNTS
+       (NAME TEXT PRIMARY KEY,
+        ROW_COUNT INTEGER NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS COURSE_ENROLLMENT
+       (COURSE_ID TEXT PRIMARY KEY,
+        STUDENT_COUNT INTEGER NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS INSTRUCTOR_COURSES
+       (INSTRUCTOR_ID TEXT PRIMARY KEY,
+        COURSE_COUNT INTEGER NOT NULL)""",
+]
+
+# New course and instructor rows count their existing registrations/courses
+# through the indexes from migration 1, so the order rows are inserted in
+# (e.g. courses before their instructor) does not matter
+_ENTITY_STATISTICS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS STATS_STUDENTS_AI AFTER INSERT ON STUDENTS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT + 1 WHERE NAME = 'STUDENTS';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_STUDENTS_AD AFTER DELETE ON STUDENTS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT - 1 WHERE NAME = 'STUDENTS';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_INSTRUCTORS_AI AFTER INSERT ON INSTRUCTORS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT + 1 WHERE NAME = 'INSTRUCTORS';
+           INSERT OR REPLACE INTO INSTRUCTOR_COURSES(INSTRUCTOR_ID, COURSE_COUNT)
+           VALUES (new.ID, (SELECT COUNT(*) FROM COURSES WHERE INSTRUCTOR_ID = new.ID));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_INSTRUCTORS_AD AFTER DELETE ON INSTRUCTORS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT - 1 WHERE NAME = 'INSTRUCTORS';
+           DELETE FROM INSTRUCTOR_COURSES WHERE INSTRUCTOR_ID = old.ID;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_COURSES_AI AFTER INSERT ON COURSES BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT + 1 WHERE NAME = 'COURSES';
+           INSERT OR REPLACE INTO COURSE_ENROLLMENT(COURSE_ID, STUDENT_COUNT)
+           VALUES (new.ID, (SELECT COUNT(*) FROM REGISTRATIONS WHERE COURSE_ID = new.ID));
+           UPDATE INSTRUCTOR_COURSES SET COURSE_COUNT = COURSE_COUNT + 1
+           WHERE INSTRUCTOR_ID = new.INSTRUCTOR_ID;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_COURSES_AD AFTER DELETE ON COURSES BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT - 1 WHERE NAME = 'COURSES';
+           DELETE FROM COURSE_ENROLLMENT WHERE COURSE_ID = old.ID;
+           UPDATE INSTRUCTOR_COURSES SET COURSE_COUNT = COURSE_COUNT - 1
+           WHERE INSTRUCTOR_ID = old.INSTRUCTOR_ID;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_COURSES_AU AFTER UPDATE OF INSTRUCTOR_ID ON COURSES
+       WHEN old.INSTRUCTOR_ID IS NOT new.INSTRUCTOR_ID BEGIN
+           UPDATE INSTRUCTOR_COURSES SET COURSE_COUNT = COURSE_COUNT - 1
+           WHERE INSTRUCTOR_ID = old.INSTRUCTOR_ID;
+           UPDATE INSTRUCTOR_COURSES SET COURSE_COUNT = COURSE_COUNT + 1
+           WHERE INSTRUCTOR_ID = new.INSTRUCTOR_ID;
+       END""",
+]
+
+_REGISTRATION_STATISTICS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS STATS_REGISTRATIONS_AI AFTER INSERT ON REGISTRATIONS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT + 1 WHERE NAME = 'REGISTRATIONS';
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT + 1
+           WHERE COURSE_ID = new.COURSE_ID;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_REGISTRATIONS_AD AFTER DELETE ON REGISTRATIONS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT - 1 WHERE NAME = 'REGISTRATIONS';
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT - 1
+           WHERE COURSE_ID = old.COURSE_ID;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_REGISTRATIONS_AU AFTER UPDATE OF COURSE_ID ON REGISTRATIONS
+       WHEN old.COURSE_ID IS NOT new.COURSE_ID BEGIN
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT - 1
+           WHERE COURSE_ID = old.COURSE_ID;
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT + 1
+           WHERE COURSE_ID = new.COURSE_ID;
+       END""",
+]
+
+_STATISTICS_TRIGGERS = _ENTITY_STATISTICS_TRIGGERS + _REGISTRATION_STATISTICS_TRIGGERS
+
+# Recount everything from the base tables
+_STATISTICS_REBUILD = [
+    "DELETE FROM TABLE_COUNTS",
+    """INSERT INTO TABLE_COUNTS(NAME, ROW_COUNT)
+       SELECT 'STUDENTS', COUNT(*) FROM STUDENTS
+       UNION ALL SELECT 'INSTRUCTORS', COUNT(*) FROM INSTRUCTORS
+       UNION ALL SELECT 'COURSES', COUNT(*) FROM COURSES
+       UNION ALL SELECT 'REGISTRATIONS', COUNT(*) FROM REGISTRATIONS""",
+    "DELETE FROM COURSE_ENROLLMENT",
+    """INSERT INTO COURSE_ENROLLMENT(COURSE_ID, STUDENT_COUNT)
+       SELECT c.ID, COUNT(r.COURSE_ID)
+       FROM COURSES c LEFT JOIN REGISTRATIONS r ON r.COURSE_ID = c.ID
+       GROUP BY c.ID""",
+    "DELETE FROM INSTRUCTOR_COURSES",
+    """INSERT INTO INSTRUCTOR_COURSES(INSTRUCTOR_ID, COURSE_COUNT)
+       SELECT i.ID, COUNT(c.ID)
+       FROM INSTRUCTORS i LEFT JOIN COURSES c ON c.INSTRUCTOR_ID = i.ID
+       GROUP BY i.ID""",
+]
+
+
+# Change feed - every row carries the time and the change version of its last
+# insert/update, and deletes leave a tombstone, so clients can ask for what
+# changed since a token instead of reloading everything.
+# The version comes from a single counter row. SQLite only lets one write
+# transaction run at a time, so versions are handed out in commit order and a
+# reader never sees a version committed "behind" a token it already has.
+# Each entry is (table, key columns, data columns).
+CHANGE_FEED_TABLES = [
+    ('STUDENTS', ('ID',), ('NAME', 'AGE', 'EMAIL')),
+    ('INSTRUCTORS', ('ID',), ('NAME', 'AGE', 'EMAIL')),
+    ('COURSES', ('ID',), ('NAME', 'INSTRUCTOR_ID')),
+    ('REGISTRATIONS', ('STUDENT_ID', 'COURSE_ID'), ()),
+]
+
+_CHANGE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _change_feed_statements():
+    """Build the columns, tables and triggers of the change feed (migration 3)."""
+    statements = [
+        """CREATE TABLE IF NOT EXISTS CHANGE_COUNTER
+           (ID INTEGER PRIMARY KEY CHECK (ID = 1),
+            VERSION INTEGER NOT NULL,
+            PURGED_VERSION INTEGER NOT NULL DEFAULT 0)""",
+        "INSERT OR IGNORE INTO CHANGE_COUNTER(ID, VERSION) VALUES (1, 0)",
+        # KEY2 is '' for the tables with a single column key
+        """CREATE TABLE IF NOT EXISTS TOMBSTONES
+           (TABLE_NAME TEXT NOT NULL,
+            KEY1 TEXT NOT NULL,
+            KEY2 TEXT NOT NULL DEFAULT '',
+            CHANGE_VERSION INTEGER NOT NULL,
+            DELETED_AT DATETIME NOT NULL,
+            PRIMARY KEY (TABLE_NAME, KEY1, KEY2))""",
+        "CREATE INDEX IF NOT EXISTS IDX_TOMBSTONES_VERSION ON TOMBSTONES(CHANGE_VERSION)",
+    ]
+    for table, keys, columns in CHANGE_FEED_TABLES:
+        # ALTER TABLE cannot add a column with a non-constant default, so the
+        # existing rows take their CREATED_AT and version 0
+        statements += [
+            f"ALTER TABLE {table} ADD COLUMN UPDATED_AT DATETIME",
+            f"ALTER TABLE {table} ADD COLUMN CHANGE_VERSION INTEGER NOT NULL DEFAULT 0",
+            f"UPDATE {table} SET UPDATED_AT = COALESCE(CREATED_AT, {_CHANGE_NOW})",
+            f"CREATE INDEX IF NOT EXISTS IDX_{table}_CHANGE_VERSION ON {table}(CHANGE_VERSION)",
+        ]
+        statements += _change_feed_triggers(table, keys, columns)
+    return statements
+
+
+def _change_feed_triggers(table, keys, columns):
+    """SQL for the triggers that stamp the rows of one table and record its deletes."""
+    bump = "UPDATE CHANGE_COUNTER SET VERSION = VERSION + 1 WHERE ID = 1"
+    version = "(SELECT VERSION FROM CHANGE_COUNTER WHERE ID = 1)"
+    key1 = keys[0]
+    key2 = keys[1] if len(keys) > 1 else None
+    stamp = (f"UPDATE {table} SET UPDATED_AT = {_CHANGE_NOW}, CHANGE_VERSION = {version} "
+             f"WHERE rowid = new.rowid")
+    old_key2 = f"old.{key2}" if key2 else "''"
+    new_key2 = f"new.{key2}" if key2 else "''"
+    tombstone = (f"INSERT OR REPLACE INTO TOMBSTONES"
+                 f"(TABLE_NAME, KEY1, KEY2, CHANGE_VERSION, DELETED_AT) "
+                 f"SELECT '{table}', old.{key1}, {old_key2}, {version}, {_CHANGE_NOW}")
+    # A row that comes back after a delete is no longer deleted
+    revive = (f"DELETE FROM TOMBSTONES WHERE TABLE_NAME = '{table}' "
+              f"AND KEY1 = new.{key1} AND KEY2 = {new_key2}")
+    watched = keys + columns
+    changed = ' OR '.join(f"old.{c} IS NOT new.{c}" for c in watched)
+    key_changed = ' OR '.join(f"old.{c} IS NOT new.{c}" for c in keys)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS CHANGES_{table}_AI AFTER INSERT ON {table} BEGIN
+                {bump};
+                {stamp};
+                {revive};
+            END""",
+        # Only the data columns are watched, so the stamp itself and
+        # updates that change nothing do not count as a change
+        f"""CREATE TRIGGER IF NOT EXISTS CHANGES_{table}_AU
+            AFTER UPDATE OF {', '.join(watched)} ON {table}
+            WHEN {changed} BEGIN
+                {bump};
+                {stamp};
+                {tombstone} WHERE {key_changed};
+                {revive};
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS CHANGES_{table}_AD AFTER DELETE ON {table} BEGIN
+                {bump};
+                {tombstone};
+            END""",
+    ]
+
+
+# Schema migrations - PRAGMA user_version stores how many of these have been
+# applied to a database file, so existing school.db files get upgraded in place.
+# Only ever append to this list, never change an entry that has shipped.
+# Each entry is (version, description, list of SQL statements). A statement
+# can also be a function taking the cursor, for steps that depend on the file.
+_HOT_PATH_INDEXES = [
+    # COURSE_ID is the second column of the REGISTRATIONS primary key,
+    # so get_course_students could not use the key to filter on it
+    "CREATE INDEX IF NOT EXISTS IDX_REGISTRATIONS_COURSE ON REGISTRATIONS(COURSE_ID)",
+    "CREATE INDEX IF NOT EXISTS IDX_COURSES_INSTRUCTOR ON COURSES(INSTRUCTOR_ID)",
+    "CREATE INDEX IF NOT EXISTS IDX_STUDENTS_EMAIL ON STUDENTS(EMAIL)",
+    "CREATE INDEX IF NOT EXISTS IDX_INSTRUCTORS_EMAIL ON INSTRUCTORS(EMAIL)",
+]
+
+
+def _check_foreign_keys(cursor):
+    """Raise sqlite3.IntegrityError if any row points at a missing parent row."""
+    violations = cursor.execute("PRAGMA foreign_key_check").fetchall()
+    if violations:
+        raise sqlite3.IntegrityError(
+            f"{len(violations)} rows violate foreign keys, first: {violations[0]}")
+
+
+# SQLite cannot change a foreign key in place, so COURSES and REGISTRATIONS
+# are copied into new tables with ON DELETE actions (rowids kept for the FTS
+# index). Foreign keys were never enforced before, so rows pointing at missing
+# students/courses are dropped and missing instructors become NULL on the way.
+# Dropping a table drops its indexes and triggers, they are recreated after.
+_CASCADE_REBUILD = [
+    """CREATE TABLE COURSES_NEW
+       (ID TEXT PRIMARY KEY,
+        NAME TEXT NOT NULL,
+        INSTRUCTOR_ID TEXT,
+        CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UPDATED_AT DATETIME,
+        CHANGE_VERSION INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (INSTRUCTOR_ID) REFERENCES INSTRUCTORS(ID) ON DELETE SET NULL)""",
+    """INSERT INTO COURSES_NEW(rowid, ID, NAME, INSTRUCTOR_ID, CREATED_AT, UPDATED_AT, CHANGE_VERSION)
+       SELECT c.rowid, c.ID, c.NAME,
+              CASE WHEN EXISTS (SELECT 1 FROM INSTRUCTORS i WHERE i.ID = c.INSTRUCTOR_ID)
+                   THEN c.INSTRUCTOR_ID END,
+              c.CREATED_AT, c.UPDATED_AT, c.CHANGE_VERSION
+       FROM COURSES c""",
+    """CREATE TABLE REGISTRATIONS_NEW
+       (STUDENT_ID TEXT,
+        COURSE_ID TEXT,
+        CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UPDATED_AT DATETIME,
+        CHANGE_VERSION INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (STUDENT_ID, COURSE_ID),
+        FOREIGN KEY (STUDENT_ID) REFERENCES STUDENTS(ID) ON DELETE CASCADE,
+        FOREIGN KEY (COURSE_ID) REFERENCES COURSES(ID) ON DELETE CASCADE)""",
+    """INSERT INTO REGISTRATIONS_NEW(rowid, STUDENT_ID, COURSE_ID, CREATED_AT, UPDATED_AT, CHANGE_VERSION)
+       SELECT r.rowid, r.STUDENT_ID, r.COURSE_ID, r.CREATED_AT, r.UPDATED_AT, r.CHANGE_VERSION
+       FROM REGISTRATIONS r
+       WHERE EXISTS (SELECT 1 FROM STUDENTS s WHERE s.ID = r.STUDENT_ID)
+         AND EXISTS (SELECT 1 FROM COURSES c WHERE c.ID = r.COURSE_ID)""",
+    "DROP TABLE REGISTRATIONS",
+    "DROP TABLE COURSES",
+    # Triggers on INSTRUCTORS and STUDENTS still name COURSES/REGISTRATIONS,
+    # the modern RENAME would check them while those tables are gone
+    "PRAGMA legacy_alter_table = ON",
+    "ALTER TABLE COURSES_NEW RENAME TO COURSES",
+    "ALTER TABLE REGISTRATIONS_NEW RENAME TO REGISTRATIONS",
+    "PRAGMA legacy_alter_table = OFF",
+    "CREATE INDEX IF NOT EXISTS IDX_COURSES_CHANGE_VERSION ON COURSES(CHANGE_VERSION)",
+    "CREATE INDEX IF NOT EXISTS IDX_REGISTRATIONS_CHANGE_VERSION ON REGISTRATIONS(CHANGE_VERSION)",
+    # Dropped orphans left no tombstones, so every client starts over once
+    "UPDATE CHANGE_COUNTER SET PURGED_VERSION = VERSION WHERE ID = 1",
+]
+
+MIGRATIONS = [
+    (1, "secondary indexes for hot query paths", _HOT_PATH_INDEXES),
+    (2, "trigger-maintained statistics counters",
+     _STATISTICS_TABLES + _STATISTICS_TRIGGERS + _STATISTICS_REBUILD),
+    # The old FTS update triggers fired on any column, including the new stamp
+    (3, "change feed columns and tombstones",
+     _change_feed_statements() + [lambda cursor: _refresh_search_triggers(cursor)]),
+    (4, "foreign keys with ON DELETE CASCADE / SET NULL",
+     _CASCADE_REBUILD + _HOT_PATH_INDEXES + _STATISTICS_TRIGGERS
+     + [trigger for table, keys, columns in CHANGE_FEED_TABLES
+        if table in ('COURSES', 'REGISTRATIONS')
+        for trigger in _change_feed_triggers(table, keys, columns)]
+     + [lambda cursor: _refresh_search_triggers(cursor)]
+     + _STATISTICS_REBUILD + [_check_foreign_keys]),
+]
+
+
+def get_schema_version():
+    """
+    Get the schema version of the database file.
+
+    :return: Number of the last migration applied, 0 for a database that was never migrated
+    :rtype: int
+    """
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(target_version=None):
+    """
+    Apply all migrations newer than the database's schema version.
+
+    Each migration runs in its own transaction together with the user_version
+    bump, so a failed migration leaves the database at the previous version.
+
+    :param target_version: Stop after this version, defaults to None (latest)
+    :type target_version: int, optional
+    :return: Schema version after migrating
+    :rtype: int
+    :raises sqlite3.Error: If a migration fails
+    """
+    _outside_unit_of_work("migrate()")
+    db = get_connection()
+    cursor = db.cursor()
+    current = get_schema_version()
+    # A table rebuild drops tables other rows point at, which would cascade
+    # with foreign keys on. The pragma is ignored inside a transaction, so it
+    # is switched around the whole loop.
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, description, statements in MIGRATIONS:
+            if version <= current or (target_version is not None and version > target_version):
+                continue
+            try:
+                cursor.execute("BEGIN")
+                for statement in statements:
+                    if callable(statement):
+                        statement(cursor)
+                    else:
+                        cursor.execute(statement)
+                # PRAGMA values cannot be bound as parameters
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+                db.commit()
+            except Exception:
+                _rollback()
+                raise
+            print(f"Database migrated to version {version}: {description}")
+            current = version
+    finally:
+        cursor.execute("PRAGMA foreign_keys = ON")
+    return current
+
+
+# Compact schema - optional layout for large schools. STUDENTS and COURSES get
+# an INTEGER PRIMARY KEY (SK) that aliases their rowid, and registrations are
+# stored as (student SK, course SK) pairs in a WITHOUT ROWID table, with the
+# creation time as unix seconds. REGISTRATIONS becomes a view with the old
+# columns and INSTEAD OF triggers that map the string IDs to SKs, so every
+# query and function that uses REGISTRATIONS keeps working unchanged.
+# Switched on per database file with convert_to_compact_schema().
+_COMPACT_ENTITY_TABLES = [
+    """CREATE TABLE STUDENTS_NEW
+       (SK INTEGER PRIMARY KEY,
+        ID TEXT NOT NULL UNIQUE,
+        NAME TEXT NOT NULL,
+        AGE INTEGER NOT NULL,
+        EMAIL TEXT NOT NULL,
+        CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UPDATED_AT DATETIME,
+        CHANGE_VERSION INTEGER NOT NULL DEFAULT 0)""",
+    # The SKs are the old rowids, so the FTS index stays valid
+    """INSERT INTO STUDENTS_NEW(SK, ID, NAME, AGE, EMAIL, CREATED_AT, UPDATED_AT, CHANGE_VERSION)
+       SELECT rowid, ID, NAME, AGE, EMAIL, CREATED_AT, UPDATED_AT, CHANGE_VERSION FROM STUDENTS""",
+    """CREATE TABLE COURSES_NEW
+       (SK INTEGER PRIMARY KEY,
+        ID TEXT NOT NULL UNIQUE,
+        NAME TEXT NOT NULL,
+        INSTRUCTOR_ID TEXT,
+        CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UPDATED_AT DATETIME,
+        CHANGE_VERSION INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (INSTRUCTOR_ID) REFERENCES INSTRUCTORS(ID) ON DELETE SET NULL)""",
+    """INSERT INTO COURSES_NEW(SK, ID, NAME, INSTRUCTOR_ID, CREATED_AT, UPDATED_AT, CHANGE_VERSION)
+       SELECT rowid, ID, NAME, INSTRUCTOR_ID, CREATED_AT, UPDATED_AT, CHANGE_VERSION FROM COURSES""",
+    """CREATE TABLE REGISTRATION_KEYS
+       (STUDENT_SK INTEGER NOT NULL,
+        COURSE_SK INTEGER NOT NULL,
+        CREATED_AT INTEGER NOT NULL,
+        CHANGE_VERSION INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (STUDENT_SK, COURSE_SK),
+        FOREIGN KEY (STUDENT_SK) REFERENCES STUDENTS(SK) ON DELETE CASCADE,
+        FOREIGN KEY (COURSE_SK) REFERENCES COURSES(SK) ON DELETE CASCADE) WITHOUT ROWID""",
+    """INSERT INTO REGISTRATION_KEYS(STUDENT_SK, COURSE_SK, CREATED_AT, CHANGE_VERSION)
+       SELECT s.rowid, c.rowid, CAST(strftime('%s', COALESCE(r.CREATED_AT, 'now')) AS INTEGER),
+              r.CHANGE_VERSION
+       FROM REGISTRATIONS r
+       JOIN STUDENTS s ON s.ID = r.STUDENT_ID
+       JOIN COURSES c ON c.ID = r.COURSE_ID""",
+    "DROP TABLE REGISTRATIONS",
+    "DROP TABLE STUDENTS",
+    "DROP TABLE COURSES",
+    "PRAGMA legacy_alter_table = ON",
+    "ALTER TABLE STUDENTS_NEW RENAME TO STUDENTS",
+    "ALTER TABLE COURSES_NEW RENAME TO COURSES",
+    "PRAGMA legacy_alter_table = OFF",
+    "CREATE INDEX IDX_REGISTRATION_KEYS_COURSE ON REGISTRATION_KEYS(COURSE_SK)",
+    "CREATE INDEX IDX_REGISTRATION_KEYS_CHANGE_VERSION ON REGISTRATION_KEYS(CHANGE_VERSION)",
+    "CREATE INDEX IF NOT EXISTS IDX_STUDENTS_CHANGE_VERSION ON STUDENTS(CHANGE_VERSION)",
+    "CREATE INDEX IF NOT EXISTS IDX_COURSES_CHANGE_VERSION ON COURSES(CHANGE_VERSION)",
+]
+
+# The mapping layer: REGISTRATIONS as a view over the SK pairs
+_COMPACT_REGISTRATIONS_VIEW = [
+    """CREATE VIEW REGISTRATIONS AS
+       SELECT s.ID AS STUDENT_ID, c.ID AS COURSE_ID,
+              datetime(r.CREATED_AT, 'unixepoch') AS CREATED_AT,
+              datetime(r.CREATED_AT, 'unixepoch') AS UPDATED_AT,
+              r.CHANGE_VERSION AS CHANGE_VERSION
+       FROM REGISTRATION_KEYS r
+       JOIN STUDENTS s ON s.SK = r.STUDENT_SK
+       JOIN COURSES c ON c.SK = r.COURSE_SK""",
+    # Views have no foreign keys, so a missing student or course raises the
+    # same constraint error the table would
+    """CREATE TRIGGER REGISTRATIONS_II INSTEAD OF INSERT ON REGISTRATIONS BEGIN
+           SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed')
+           WHERE NOT EXISTS (SELECT 1 FROM STUDENTS WHERE ID = new.STUDENT_ID)
+              OR NOT EXISTS (SELECT 1 FROM COURSES WHERE ID = new.COURSE_ID);
+           INSERT INTO REGISTRATION_KEYS(STUDENT_SK, COURSE_SK, CREATED_AT)
+           SELECT s.SK, c.SK, CAST(strftime('%s', COALESCE(new.CREATED_AT, 'now')) AS INTEGER)
+           FROM STUDENTS s, COURSES c
+           WHERE s.ID = new.STUDENT_ID AND c.ID = new.COURSE_ID;
+       END""",
+    """CREATE TRIGGER REGISTRATIONS_ID INSTEAD OF DELETE ON REGISTRATIONS BEGIN
+           DELETE FROM REGISTRATION_KEYS
+           WHERE STUDENT_SK = (SELECT SK FROM STUDENTS WHERE ID = old.STUDENT_ID)
+             AND COURSE_SK = (SELECT SK FROM COURSES WHERE ID = old.COURSE_ID);
+       END""",
+    """CREATE TRIGGER REGISTRATIONS_IU INSTEAD OF UPDATE OF STUDENT_ID, COURSE_ID ON REGISTRATIONS BEGIN
+           UPDATE REGISTRATION_KEYS
+           SET STUDENT_SK = (SELECT SK FROM STUDENTS WHERE ID = new.STUDENT_ID),
+               COURSE_SK = (SELECT SK FROM COURSES WHERE ID = new.COURSE_ID)
+           WHERE STUDENT_SK = (SELECT SK FROM STUDENTS WHERE ID = old.STUDENT_ID)
+             AND COURSE_SK = (SELECT SK FROM COURSES WHERE ID = old.COURSE_ID);
+       END""",
+]
+
+# The statistics and change feed triggers of REGISTRATIONS, on the SK pairs.
+# When a registration goes with a deleted student or course, the parent row is
+# already gone, so no tombstone is written - the parent's own tombstone covers it.
+_CHANGE_VERSION_SQL = "(SELECT VERSION FROM CHANGE_COUNTER WHERE ID = 1)"
+_COMPACT_REGISTRATION_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS STATS_REGISTRATION_KEYS_AI AFTER INSERT ON REGISTRATION_KEYS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT + 1 WHERE NAME = 'REGISTRATIONS';
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT + 1
+           WHERE COURSE_ID = (SELECT ID FROM COURSES WHERE SK = new.COURSE_SK);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_REGISTRATION_KEYS_AD AFTER DELETE ON REGISTRATION_KEYS BEGIN
+           UPDATE TABLE_COUNTS SET ROW_COUNT = ROW_COUNT - 1 WHERE NAME = 'REGISTRATIONS';
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT - 1
+           WHERE COURSE_ID = (SELECT ID FROM COURSES WHERE SK = old.COURSE_SK);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS STATS_REGISTRATION_KEYS_AU AFTER UPDATE OF COURSE_SK ON REGISTRATION_KEYS
+       WHEN old.COURSE_SK IS NOT new.COURSE_SK BEGIN
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT - 1
+           WHERE COURSE_ID = (SELECT ID FROM COURSES WHERE SK = old.COURSE_SK);
+           UPDATE COURSE_ENROLLMENT SET STUDENT_COUNT = STUDENT_COUNT + 1
+           WHERE COURSE_ID = (SELECT ID FROM COURSES WHERE SK = new.COURSE_SK);
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS CHANGES_REGISTRATION_KEYS_AI AFTER INSERT ON REGISTRATION_KEYS BEGIN
+           UPDATE CHANGE_COUNTER SET VERSION = VERSION + 1 WHERE ID = 1;
+           UPDATE REGISTRATION_KEYS SET CHANGE_VERSION = {_CHANGE_VERSION_SQL}
+           WHERE STUDENT_SK = new.STUDENT_SK AND COURSE_SK = new.COURSE_SK;
+           DELETE FROM TOMBSTONES WHERE TABLE_NAME = 'REGISTRATIONS'
+           AND KEY1 = (SELECT ID FROM STUDENTS WHERE SK = new.STUDENT_SK)
+           AND KEY2 = (SELECT ID FROM COURSES WHERE SK = new.COURSE_SK);
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS CHANGES_REGISTRATION_KEYS_AU
+       AFTER UPDATE OF STUDENT_SK, COURSE_SK ON REGISTRATION_KEYS
+       WHEN old.STUDENT_SK IS NOT new.STUDENT_SK OR old.COURSE_SK IS NOT new.COURSE_SK BEGIN
+           UPDATE CHANGE_COUNTER SET VERSION = VERSION + 1 WHERE ID = 1;
+           UPDATE REGISTRATION_KEYS SET CHANGE_VERSION = {_CHANGE_VERSION_SQL}
+           WHERE STUDENT_SK = new.STUDENT_SK AND COURSE_SK = new.COURSE_SK;
+           INSERT OR REPLACE INTO TOMBSTONES(TABLE_NAME, KEY1, KEY2, CHANGE_VERSION, DELETED_AT)
+           SELECT 'REGISTRATIONS', s.ID, c.ID, {_CHANGE_VERSION_SQL}, {_CHANGE_NOW}
+           FROM STUDENTS s, COURSES c WHERE s.SK = old.STUDENT_SK AND c.SK = old.COURSE_SK;
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS CHANGES_REGISTRATION_KEYS_AD AFTER DELETE ON REGISTRATION_KEYS BEGIN
+           UPDATE CHANGE_COUNTER SET VERSION = VERSION + 1 WHERE ID = 1;
+           INSERT OR REPLACE INTO TOMBSTONES(TABLE_NAME, KEY1, KEY2, CHANGE_VERSION, DELETED_AT)
+           SELECT 'REGISTRATIONS', s.ID, c.ID, {_CHANGE_VERSION_SQL}, {_CHANGE_NOW}
+           FROM STUDENTS s, COURSES c WHERE s.SK = old.STUDENT_SK AND c.SK = old.COURSE_SK;
+       END""",
+]
+
+
+def is_compact_schema():
+    """
+    Check if the database uses the compact schema from convert_to_compact_schema().
+
+    :return: True if registrations are stored as integer key pairs
+    :rtype: bool
+    """
+    return get_connection().execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='REGISTRATION_KEYS'"
+    ).fetchone() is not None
+
+
+def _statistics_triggers():
+    """The statistics triggers that fit the database's schema."""
+    if is_compact_schema():
+        return _ENTITY_STATISTICS_TRIGGERS + _COMPACT_REGISTRATION_TRIGGERS[:3]
+    return _STATISTICS_TRIGGERS
+
+
+def convert_to_compact_schema():
+    """
+    Convert the database to the compact schema.
+
+    Rebuilds STUDENTS, COURSES and REGISTRATIONS in one transaction, the
+    string-ID API keeps working through the REGISTRATIONS view. The freed
+    pages are reused by new rows, run VACUUM afterwards to shrink the file.
+    There is no way back other than restoring a backup, so take one first.
+
+    The SK columns alias the rowids of STUDENTS and COURSES, which VACUUM
+    never renumbers, so their search index stays valid. INSTRUCTORS keeps a
+    plain rowid, so rebuild_search_index() is still needed after a VACUUM.
+
+    :return: True if the database was converted or already compact, False on error
+    :rtype: bool
+    """
+    _outside_unit_of_work("convert_to_compact_schema()")
+    if get_schema_version() < MIGRATIONS[-1][0]:
+        migrate()
+    if is_compact_schema():
+        print("Database already uses the compact schema")
+        return True
+    db = get_connection()
+    cursor = db.cursor()
+    # Same as in migrate(), the rebuild must not cascade
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    try:
+        cursor.execute("BEGIN")
+        for statement in _COMPACT_ENTITY_TABLES + _COMPACT_REGISTRATIONS_VIEW:
+            cursor.execute(statement)
+        # Dropping STUDENTS and COURSES took their indexes and triggers along
+        for statement in _HOT_PATH_INDEXES:
+            if 'ON REGISTRATIONS' not in statement:
+                cursor.execute(statement)
+        for statement in _ENTITY_STATISTICS_TRIGGERS + _COMPACT_REGISTRATION_TRIGGERS:
+            cursor.execute(statement)
+        for table, keys, columns in CHANGE_FEED_TABLES:
+            if table in ('STUDENTS', 'COURSES'):
+                for trigger in _change_feed_triggers(table, keys, columns):
+                    cursor.execute(trigger)
+        _refresh_search_triggers(cursor)
+        for statement in _STATISTICS_REBUILD:
+            cursor.execute(statement)
+        _check_foreign_keys(cursor)
+        db.commit()
+    except sqlite3.Error as e:
+        _rollback()
+        print(f"Error converting to the compact schema: {e}")
+        return False
+    finally:
+        cursor.execute("PRAGMA foreign_keys = ON")
+    _invalidate()
+    print("Database converted to the compact schema")
+    return True
+
+
+# Full-text search - FTS5 shadow tables with the trigram tokenizer so that
+# substring searches use an index instead of scanning with LIKE '%term%'.
+# Each entry is (searchable table, indexed columns).
+SEARCH_TABLES = {
+    'STUDENTS': ('ID', 'NAME', 'EMAIL'),
+    'INSTRUCTORS': ('ID', 'NAME', 'EMAIL'),
+    'COURSES': ('ID', 'NAME'),
+}
+
+
+def fts5_available():
+    """
+    Check whether this SQLite build has FTS5 with the trigram tokenizer.
+
+    :return: True if a trigram FTS5 table can be created
+    :rtype: bool
+    """
+    try:
+        probe = sqlite3.connect(':memory:')
+        probe.execute("CREATE VIRTUAL TABLE probe USING fts5(x, tokenize='trigram')")
+        probe.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def create_search_index():
+    """
+    Create the FTS5 search tables and the triggers that keep them in sync.
+
+    The FTS tables are external-content tables on the rowid of STUDENTS,
+    INSTRUCTORS and COURSES, so they only store the index, not a second copy of
+    the data. Tables that are new get filled from the existing rows.
+    Call rebuild_search_index() after a VACUUM, see there.
+
+    :return: True if the index is in place, False if FTS5 is not available
+    :rtype: bool
+    """
+    _outside_unit_of_work("create_search_index()")
+    if not fts5_available():
+        _manager.search_index = False
+        return False
+
+    db = get_connection()
+    cursor = db.cursor()
+    try:
+        for table, columns in SEARCH_TABLES.items():
+            fts = f"{table}_FTS"
+            exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts,)).fetchone()
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+                USING fts5({', '.join(columns)}, content='{table}', content_rowid='rowid',
+                           tokenize='trigram')
+            """)
+            for trigger in _search_triggers(table, columns):
+                cursor.execute(trigger)
+            if not exists:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        db.commit()
+    except Exception:
+        _rollback()
+        raise
+    _manager.search_index = True
+    return True
+
+
+def _search_triggers(table, columns):
+    """
+    SQL for the insert, delete and update triggers that keep a table's FTS index in sync.
+
+    The update trigger is limited to the indexed columns, so updates that only
+    touch e.g. AGE or the change feed stamp do not rewrite the FTS entry.
+    """
+    fts = f"{table}_FTS"
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{c}" for c in columns)
+    old_values = ', '.join(f"old.{c}" for c in columns)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_AI AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {column_list}) VALUES (new.rowid, {new_values});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_AD AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column_list})
+                VALUES ('delete', old.rowid, {old_values});
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_AU AFTER UPDATE OF {column_list} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column_list})
+                VALUES ('delete', old.rowid, {old_values});
+                INSERT INTO {fts}(rowid, {column_list}) VALUES (new.rowid, {new_values});
+            END""",
+    ]
+
+
+def _refresh_search_triggers(cursor):
+    """
+    Recreate the FTS triggers of a database that already has a search index.
+
+    Used by migrations that replace the update triggers or rebuild a table
+    (which drops the table's triggers).
+    """
+    for table, columns in SEARCH_TABLES.items():
+        fts = f"{table}_FTS"
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                          (fts,)).fetchone():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_AU")
+            for trigger in _search_triggers(table, columns):
+                cursor.execute(trigger)
+
+
+def drop_search_index():
+    """Remove the FTS5 tables and triggers, searches fall back to LIKE."""
+    _outside_unit_of_work("drop_search_index()")
+    db = get_connection()
+    cursor = db.cursor()
+    for table in SEARCH_TABLES:
+        fts = f"{table}_FTS"
+        for suffix in ('AI', 'AD', 'AU'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {fts}")
+    db.commit()
+    _manager.search_index = False
+
+
+def rebuild_search_index():
+    """
+    Rebuild the FTS5 tables from the base tables.
+
+    Needed after a VACUUM, which may renumber the rowids the index points
+    at, on the compact schema too (see convert_to_compact_schema()).
+
+    :return: True if rebuilt, False if there is no search index
+    :rtype: bool
+    """
+    _outside_unit_of_work("rebuild_search_index()")
+    if not _has_search_index():
+        return False
+    db = get_connection()
+    for table in SEARCH_TABLES:
+        fts = f"{table}_FTS"
+        db.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    db.commit()
+    return True
+
+
+def _has_search_index():
+    """Check (once per connection manager) whether the FTS5 tables exist."""
+    if _manager.search_index is None:
+        db = get_connection()
+        found = db.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name IN (?,?,?)",
+            tuple(f"{table}_FTS" for table in SEARCH_TABLES)).fetchone()[0]
+        _manager.search_index = found == len(SEARCH_TABLES)
+    return _manager.search_index
+
+
+def _search(table, select, alias, search_term, mode, limit, ranked):
+    """
+    Shared search used by search_students, search_instructors and search_courses.
+
+    Uses the FTS5 index when it exists and the term is at least three characters
+    (the trigram tokenizer cannot match shorter strings), otherwise LIKE.
+    Index results are ordered by bm25 rank, best match first, unless ranked is
+    False - ranking has to score every match, so unranked searches with a limit
+    are much cheaper for very common terms.
 
+    :param table: Base table name, a key of SEARCH_TABLES
+    :type table: str
+    :param select: SELECT ... FROM clause returning the result columns, with the base table aliased
+    :type select: str
+    :param alias: Alias of the base table inside select
+    :type alias: str
+    :param search_term: Text to look for
+    :type search_term: str
+    :param mode: 'substring' to match anywhere, 'prefix' to match the start of a column
+    :type mode: str
+    :param limit: Maximum number of rows, None for all
+    :type limit: int, optional
+    :param ranked: Order index results by relevance
+    :type ranked: bool
+    :return: List of result tuples
+    :rtype: list
+    """
+    if mode not in ('substring', 'prefix'):
+        raise ValueError("mode must be 'substring' or 'prefix'")
+
+    db = get_connection()
+    columns = SEARCH_TABLES[table]
+    prefix_filter = ' OR '.join(f"{alias}.{c} LIKE ?" for c in columns)
+    prefix_params = (f'{search_term}%',) * len(columns)
+
+    if len(search_term) >= 3 and _has_search_index():
+        fts = f"{table}_FTS"
+        query = select.replace(
+            f"{table} {alias}",
+            f"{fts} f JOIN {table} {alias} ON {alias}.rowid = f.rowid", 1)
+        query += f" WHERE {fts} MATCH ?"
+        # Quote the term so FTS5 treats it as plain text, not query syntax
+        params = ('"' + search_term.replace('"', '""') + '"',)
+        if mode == 'prefix':
+            query += f" AND ({prefix_filter})"
+            params += prefix_params
+        if ranked:
+            query += " ORDER BY f.rank"
+    else:
+        if mode == 'prefix':
+            query = select + f" WHERE {prefix_filter}"
+            params = prefix_params
+        else:
+            query = select + ' WHERE ' + ' OR '.join(f"{alias}.{c} LIKE ?" for c in columns)
+            params = (f'%{search_term}%',) * len(columns)
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params += (limit,)
+    return db.execute(query, params).fetchall()
+
+
+@_instrumented
 def insert_student(student_id, name, age, email):
     """
     Insert a new student into the database.
@@ -81,25 +1846,28 @@ def insert_student(student_id, name, age, email):
     :raises sqlite3.IntegrityError: If student ID already exists
     """
     try:
-        db = sqlite3.connect('school.db')
+        db = get_connection()
         query = """
             INSERT INTO STUDENTS(ID, NAME, AGE, EMAIL)
             VALUES (?,?,?,?)
         """
         cursor = db.cursor()
         cursor.execute(query, (student_id, name, age, email))
-        db.commit()
-        db.close()
+        _commit(db)
+        _invalidate(('student', student_id))
         print(f'Student {name} inserted successfully')
         return True
     except sqlite3.IntegrityError:
+        _rollback()
         print(f'Student with ID {student_id} already exists')
         return False
     except Exception as e:
+        _rollback()
         print(f'Error inserting student: {e}')
         return False
 
 
+@_instrumented
 def get_all_students():
     """
     Get all students from the database.
@@ -109,19 +1877,19 @@ def get_all_students():
     :return: List of student tuples (id, name, age, email)
     :rtype: list
     """
-    db = sqlite3.connect('school.db')
+    db = get_connection()
     query = 'SELECT id, name, age, email FROM STUDENTS'
     cursor = db.cursor()
     students = cursor.execute(query).fetchall()
-    db.close()
     return students
 
 
+@_instrumented
 def delete_student(student_id):
     """
     Delete a student and their registrations.
     
-    Removes the student from both STUDENTS and REGISTRATIONS tables.
+    The registrations go with the student through ON DELETE CASCADE.
     
     :param student_id: ID of student to delete
     :type student_id: str
@@ -129,16 +1897,9 @@ def delete_student(student_id):
     :rtype: bool
     """
     try:
-        db = sqlite3.connect('school.db')
-        cursor = db.cursor()
-        
-        # First delete registrations
-        cursor.execute("DELETE FROM REGISTRATIONS WHERE STUDENT_ID = ?", (student_id,))
-        
-        # Then delete student
-        cursor.execute("DELETE FROM STUDENTS WHERE ID = ?", (student_id,))
-        db.commit()
-        db.close()
+        with transaction() as db:
+            db.execute("DELETE FROM STUDENTS WHERE ID = ?", (student_id,))
+        _invalidate(('student', student_id))
         print(f"Student with ID {student_id} deleted successfully")
         return True
     except Exception as e:
@@ -146,6 +1907,7 @@ def delete_student(student_id):
         return False
 
 
+@_instrumented
 def update_student(student_id, updated_name, updated_age, updated_email):
     """
     Update an existing student's information.
@@ -162,64 +1924,63 @@ def update_student(student_id, updated_name, updated_age, updated_email):
     :rtype: bool
     """
     try:
-        db = sqlite3.connect('school.db')
+        db = get_connection()
         query = "UPDATE STUDENTS SET NAME=?, AGE=?, EMAIL=? WHERE ID=?"
         cursor = db.cursor()
         cursor.execute(query, (updated_name, updated_age, updated_email, student_id))
-        db.commit()
-        db.close()
+        _commit(db)
+        _invalidate(('student', student_id))
         print(f"Student with ID {student_id} updated successfully")
         return True
     except Exception as e:
+        _rollback()
         print(f'Error updating student: {e}')
         return False
 
 
+@_instrumented
 def insert_instructor(instructor_id, name, age, email):
     """Insert a new instructor into the database."""
     try:
-        db = sqlite3.connect('school.db')
+        db = get_connection()
         query = """
             INSERT INTO INSTRUCTORS(ID, NAME, AGE, EMAIL)
             VALUES (?,?,?,?)
         """
         cursor = db.cursor()
         cursor.execute(query, (instructor_id, name, age, email))
-        db.commit()
-        db.close()
+        _commit(db)
+        _invalidate('courses')
         print(f'Instructor {name} inserted successfully')
         return True
     except sqlite3.IntegrityError:
+        _rollback()
         print(f'Instructor with ID {instructor_id} already exists')
         return False
     except Exception as e:
+        _rollback()
         print(f'Error inserting instructor: {e}')
         return False
 
 
+@_instrumented
 def get_all_instructors():
     """Get all instructors from the database."""
-    db = sqlite3.connect('school.db')
+    db = get_connection()
     query = 'SELECT id, name, age, email FROM INSTRUCTORS'
     cursor = db.cursor()
     instructors = cursor.execute(query).fetchall()
-    db.close()
     return instructors
 
 
+@_instrumented
 def delete_instructor(instructor_id):
     """Delete an instructor from the database."""
     try:
-        db = sqlite3.connect('school.db')
-        cursor = db.cursor()
-        
-        # Update courses to remove instructor
-        cursor.execute("UPDATE COURSES SET INSTRUCTOR_ID=NULL WHERE INSTRUCTOR_ID = ?", (instructor_id,))
-        
-        # Delete instructor
-        cursor.execute("DELETE FROM INSTRUCTORS WHERE ID = ?", (instructor_id,))
-        db.commit()
-        db.close()
+        with transaction() as db:
+            # Their courses get INSTRUCTOR_ID NULL through ON DELETE SET NULL
+            db.execute("DELETE FROM INSTRUCTORS WHERE ID = ?", (instructor_id,))
+        _invalidate('courses')
         print(f"Instructor with ID {instructor_id} deleted successfully")
         return True
     except Exception as e:
@@ -227,47 +1988,57 @@ def delete_instructor(instructor_id):
         return False
 
 
+@_instrumented
 def update_instructor(instructor_id, updated_name, updated_age, updated_email):
     """Update an existing instructor's details."""
     try:
-        db = sqlite3.connect('school.db')
+        db = get_connection()
         query = "UPDATE INSTRUCTORS SET NAME=?, AGE=?, EMAIL=? WHERE ID=?"
         cursor = db.cursor()
         cursor.execute(query, (updated_name, updated_age, updated_email, instructor_id))
-        db.commit()
-        db.close()
+        _commit(db)
+        _invalidate('courses')
         print(f"Instructor with ID {instructor_id} updated successfully")
         return True
     except Exception as e:
+        _rollback()
         print(f'Error updating instructor: {e}')
         return False
 
 
+@_instrumented
 def insert_course(course_id, name, instructor_id=None):
     """Insert a new course into the database."""
     try:
-        db = sqlite3.connect('school.db')
+        db = get_connection()
         query = """
             INSERT INTO COURSES(ID, NAME, INSTRUCTOR_ID)
             VALUES (?,?,?)
         """
         cursor = db.cursor()
         cursor.execute(query, (course_id, name, instructor_id))
-        db.commit()
-        db.close()
+        _commit(db)
+        _invalidate('courses', ('course', course_id))
         print(f'Course {name} inserted successfully')
         return True
-    except sqlite3.IntegrityError:
-        print(f'Course with ID {course_id} already exists')
+    except sqlite3.IntegrityError as e:
+        _rollback()
+        if 'FOREIGN KEY' in str(e):
+            print(f'Instructor with ID {instructor_id} does not exist')
+        else:
+            print(f'Course with ID {course_id} already exists')
         return False
     except Exception as e:
+        _rollback()
         print(f'Error inserting course: {e}')
         return False
 
 
+@_instrumented
+@_cached(lambda rows: {'courses'} | {('course', row[0]) for row in rows})
 def get_all_courses():
     """Get all courses with instructor information."""
-    db = sqlite3.connect('school.db')
+    db = get_connection()
     query = '''
         SELECT c.id, c.name, c.instructor_id, i.name as instructor_name
         FROM COURSES c
@@ -275,23 +2046,17 @@ def get_all_courses():
     '''
     cursor = db.cursor()
     courses = cursor.execute(query).fetchall()
-    db.close()
     return courses
 
 
+@_instrumented
 def delete_course(course_id):
     """Delete a course and its registrations."""
     try:
-        db = sqlite3.connect('school.db')
-        cursor = db.cursor()
-        
-        # First delete registrations
-        cursor.execute("DELETE FROM REGISTRATIONS WHERE COURSE_ID = ?", (course_id,))
-        
-        # Then delete course
-        cursor.execute("DELETE FROM COURSES WHERE ID = ?", (course_id,))
-        db.commit()
-        db.close()
+        with transaction() as db:
+            # Registrations go with it through ON DELETE CASCADE
+            db.execute("DELETE FROM COURSES WHERE ID = ?", (course_id,))
+        _invalidate('courses', ('course', course_id))
         print(f"Course with ID {course_id} deleted successfully")
         return True
     except Exception as e:
@@ -299,174 +2064,916 @@ def delete_course(course_id):
         return False
 
 
-def update_course(course_id, updated_name, updated_instructor_id=None):
-    """Update an existing course's details."""
-    try:
-        db = sqlite3.connect('school.db')
-        query = "UPDATE COURSES SET NAME=?, INSTRUCTOR_ID=? WHERE ID=?"
+@_instrumented
+def update_course(course_id, updated_name, updated_instructor_id=None):
+    """Update an existing course's details."""
+    try:
+        db = get_connection()
+        query = "UPDATE COURSES SET NAME=?, INSTRUCTOR_ID=? WHERE ID=?"
+        cursor = db.cursor()
+        cursor.execute(query, (updated_name, updated_instructor_id, course_id))
+        _commit(db)
+        _invalidate('courses', ('course', course_id))
+        print(f"Course with ID {course_id} updated successfully")
+        return True
+    except Exception as e:
+        _rollback()
+        print(f'Error updating course: {e}')
+        return False
+
+
+@_instrumented
+def register_student_for_course(student_id, course_id):
+    """
+    Register a student for a course in the database.
+    
+    Creates the many-to-many relationship between students and courses.
+    
+    :param student_id: ID of the student
+    :type student_id: str
+    :param course_id: ID of the course
+    :type course_id: str
+    :return: True if registration successful
+    :rtype: bool
+    """
+    try:
+        db = get_connection()
+        query = """
+            INSERT INTO REGISTRATIONS(STUDENT_ID, COURSE_ID)
+            VALUES (?,?)
+        """
+        cursor = db.cursor()
+        cursor.execute(query, (student_id, course_id))
+        _commit(db)
+        _invalidate(('student', student_id), ('course', course_id))
+        print(f'Student {student_id} registered for course {course_id}')
+        return True
+    except sqlite3.IntegrityError as e:
+        _rollback()
+        if 'FOREIGN KEY' in str(e):
+            print(f'Student {student_id} or course {course_id} does not exist')
+        else:
+            print(f'Student {student_id} already registered for course {course_id}')
+        return False
+    except Exception as e:
+        _rollback()
+        print(f'Error registering student: {e}')
+        return False
+
+
+@_instrumented
+def unregister_student_from_course(student_id, course_id):
+    """Unregister a student from a course."""
+    try:
+        db = get_connection()
+        query = "DELETE FROM REGISTRATIONS WHERE STUDENT_ID=? AND COURSE_ID=?"
+        cursor = db.cursor()
+        cursor.execute(query, (student_id, course_id))
+        _commit(db)
+        _invalidate(('student', student_id), ('course', course_id))
+        print(f'Student {student_id} unregistered from course {course_id}')
+        return True
+    except Exception as e:
+        _rollback()
+        print(f'Error unregistering student: {e}')
+        return False
+
+
+# Shared with the read pool versions below
+_STUDENT_COURSES_QUERY = '''
+        SELECT c.id, c.name
+        FROM COURSES c
+        JOIN REGISTRATIONS r ON c.id = r.course_id
+        WHERE r.student_id = ?
+    '''
+_COURSE_STUDENTS_QUERY = '''
+        SELECT s.id, s.name
+        FROM STUDENTS s
+        JOIN REGISTRATIONS r ON s.id = r.student_id
+        WHERE r.course_id = ?
+    '''
+
+
+@_cached(lambda student_id, rows: {('student', student_id)} | {('course', row[0]) for row in rows})
+def _student_courses(student_id):
+    """Courses of a student from the hot tables, through the query cache."""
+    db = get_connection()
+    cursor = db.cursor()
+    courses = cursor.execute(_STUDENT_COURSES_QUERY, (student_id,)).fetchall()
+    return courses
+
+
+@_cached(lambda course_id, rows: {('course', course_id)} | {('student', row[0]) for row in rows})
+def _course_students(course_id):
+    """Students of a course from the hot tables, through the query cache."""
+    db = get_connection()
+    cursor = db.cursor()
+    students = cursor.execute(_COURSE_STUDENTS_QUERY, (course_id,)).fetchall()
+    return students
+
+
+@_instrumented
+def get_student_courses(student_id, include_archive=False):
+    """
+    Get all courses for a specific student.
+    
+    :param student_id: ID of the student
+    :type student_id: str
+    :param include_archive: Also list archived registrations, see archive_before(), defaults to False
+    :type include_archive: bool
+    :return: List of course tuples (id, name)
+    :rtype: list
+    :raises RuntimeError: With include_archive inside a transaction() block, unless attach_archive() was called first
+    """
+    if include_archive and _attach_archive(get_connection()):
+        return get_connection().execute(_STUDENT_COURSES_ARCHIVE_QUERY,
+                                        (student_id, student_id)).fetchall()
+    return _student_courses(student_id)
+
+
+@_instrumented
+def get_course_students(course_id, include_archive=False):
+    """
+    Get all students for a specific course.
+    
+    :param course_id: ID of the course
+    :type course_id: str
+    :param include_archive: Also list archived registrations, see archive_before(), defaults to False
+    :type include_archive: bool
+    :return: List of student tuples (id, name)
+    :rtype: list
+    :raises RuntimeError: With include_archive inside a transaction() block, unless attach_archive() was called first
+    """
+    if include_archive and _attach_archive(get_connection()):
+        return get_connection().execute(_COURSE_STUDENTS_ARCHIVE_QUERY,
+                                        (course_id, course_id)).fetchall()
+    return _course_students(course_id)
+
+
+@_instrumented
+def get_student_courses_many(student_ids, max_pending=None):
+    """
+    Get the courses of many students in parallel on the read pool.
+
+    :param student_ids: Iterable of student IDs, can be a generator
+    :type student_ids: iterable
+    :param max_pending: Queries queued ahead, see ReadPool.map(), defaults to None
+    :type max_pending: int, optional
+    :return: One list of course tuples (id, name) per student, in the order of student_ids
+    :rtype: list
+    """
+    return list(get_read_pool().map(
+        lambda db, student_id: db.execute(_STUDENT_COURSES_QUERY, (student_id,)).fetchall(),
+        student_ids, max_pending))
+
+
+@_instrumented
+def get_course_students_many(course_ids, max_pending=None):
+    """
+    Get the students of many courses in parallel on the read pool, e.g. all rosters.
+
+    :param course_ids: Iterable of course IDs, can be a generator
+    :type course_ids: iterable
+    :param max_pending: Queries queued ahead, see ReadPool.map(), defaults to None
+    :type max_pending: int, optional
+    :return: One list of student tuples (id, name) per course, in the order of course_ids
+    :rtype: list
+    """
+    return list(get_read_pool().map(
+        lambda db, course_id: db.execute(_COURSE_STUDENTS_QUERY, (course_id,)).fetchall(),
+        course_ids, max_pending))
+
+
+# Row shapes shared by the search, streaming and paging functions
+_STUDENT_SELECT = 'SELECT s.id, s.name, s.age, s.email FROM STUDENTS s'
+_INSTRUCTOR_SELECT = 'SELECT i.id, i.name, i.age, i.email FROM INSTRUCTORS i'
+_COURSE_SELECT = '''SELECT c.id, c.name, c.instructor_id, i.name as instructor_name
+        FROM COURSES c
+        LEFT JOIN INSTRUCTORS i ON c.instructor_id = i.id'''
+
+
+@_instrumented
+def search_students(search_term, mode='substring', limit=None, ranked=True):
+    """
+    Search students by name, ID, or email.
+
+    :param search_term: Text to look for
+    :type search_term: str
+    :param mode: 'substring' (default) or 'prefix'
+    :type mode: str
+    :param limit: Maximum number of results, defaults to None (all)
+    :type limit: int, optional
+    :param ranked: Order indexed results by relevance, defaults to True
+    :type ranked: bool
+    :return: List of student tuples (id, name, age, email), best match first when indexed
+    :rtype: list
+    """
+    return _search('STUDENTS', _STUDENT_SELECT, 's', search_term, mode, limit, ranked)
+
+
+@_instrumented
+def search_instructors(search_term, mode='substring', limit=None, ranked=True):
+    """Search instructors by name, ID, or email. Same options as search_students."""
+    return _search('INSTRUCTORS', _INSTRUCTOR_SELECT, 'i', search_term, mode, limit, ranked)
+
+
+@_instrumented
+def search_courses(search_term, mode='substring', limit=None, ranked=True):
+    """Search courses by name or ID. Same options as search_students."""
+    return _search('COURSES', _COURSE_SELECT, 'c', search_term, mode, limit, ranked)
+
+
+# Streaming and paginated readers - the get_all_* functions above return the
+# whole table at once, these hand rows out as they are read
+DEFAULT_FETCH_SIZE = 1000
+
+
+def _iterate(query, fetch_size):
+    """
+    Yield the rows of query, reading fetch_size rows from SQLite at a time.
+
+    :param query: SELECT statement
+    :type query: str
+    :param fetch_size: Rows per fetchmany call
+    :type fetch_size: int
+    """
+    cursor = get_connection().cursor()
+    cursor.execute(query)
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        yield from rows
+    cursor.close()
+
+
+def iter_students(fetch_size=DEFAULT_FETCH_SIZE):
+    """
+    Iterate over all students without loading the whole table.
+
+    :param fetch_size: Rows read from SQLite per batch, defaults to DEFAULT_FETCH_SIZE
+    :type fetch_size: int
+    :return: Generator of student tuples (id, name, age, email)
+    :rtype: generator
+    """
+    return _iterate(_STUDENT_SELECT, fetch_size)
+
+
+def iter_instructors(fetch_size=DEFAULT_FETCH_SIZE):
+    """Iterate over all instructors. Same as iter_students but for instructors."""
+    return _iterate(_INSTRUCTOR_SELECT, fetch_size)
+
+
+def iter_courses(fetch_size=DEFAULT_FETCH_SIZE):
+    """Iterate over all courses as (id, name, instructor_id, instructor_name) tuples."""
+    return _iterate(_COURSE_SELECT, fetch_size)
+
+
+def _page(select, alias, after_id, limit, order):
+    """
+    Get one page of rows ordered by ID, starting after after_id.
+
+    This is keyset pagination: instead of OFFSET (which re-reads every skipped
+    row) the next page starts from the last ID of the previous one, so every
+    page costs the same no matter how deep into the table it is.
+
+    :param select: SELECT ... FROM clause with the table aliased as alias
+    :type select: str
+    :param alias: Alias of the table whose ID is paged on
+    :type alias: str
+    :param after_id: Last ID of the previous page, None for the first page
+    :type after_id: str, optional
+    :param limit: Maximum rows in the page
+    :type limit: int
+    :param order: 'asc' or 'desc'
+    :type order: str
+    :return: List of row tuples
+    :rtype: list
+    :raises ValueError: If order is not 'asc' or 'desc'
+    """
+    if order not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+    query = select
+    params = ()
+    if after_id is not None:
+        query += f" WHERE {alias}.id {'>' if order == 'asc' else '<'} ?"
+        params = (after_id,)
+    query += f" ORDER BY {alias}.id {order.upper()} LIMIT ?"
+    return get_connection().execute(query, params + (limit,)).fetchall()
+
+
+@_instrumented
+def get_students_page(after_id=None, limit=100, order='asc'):
+    """
+    Get one page of students ordered by ID.
+
+    Pass the ID of the last row of a page as after_id to get the next page.
+    An empty list means there are no more rows.
+
+    :param after_id: Last student ID of the previous page, defaults to None (first page)
+    :type after_id: str, optional
+    :param limit: Maximum number of students, defaults to 100
+    :type limit: int
+    :param order: 'asc' (default) or 'desc'
+    :type order: str
+    :return: List of student tuples (id, name, age, email)
+    :rtype: list
+    """
+    return _page(_STUDENT_SELECT, 's', after_id, limit, order)
+
+
+@_instrumented
+def get_instructors_page(after_id=None, limit=100, order='asc'):
+    """Get one page of instructors ordered by ID. Same options as get_students_page."""
+    return _page(_INSTRUCTOR_SELECT, 'i', after_id, limit, order)
+
+
+@_instrumented
+def get_courses_page(after_id=None, limit=100, order='asc'):
+    """Get one page of courses ordered by ID. Same options as get_students_page."""
+    return _page(_COURSE_SELECT, 'c', after_id, limit, order)
+
+
+def iter_pages(page_function, limit=100, order='asc'):
+    """
+    Walk through a whole table page by page.
+
+    :param page_function: get_students_page, get_instructors_page or get_courses_page
+    :type page_function: callable
+    :param limit: Rows per page, defaults to 100
+    :type limit: int
+    :param order: 'asc' (default) or 'desc'
+    :type order: str
+    :return: Generator of pages (lists of row tuples)
+    :rtype: generator
+    """
+    after_id = None
+    while True:
+        page = page_function(after_id, limit, order)
+        if not page:
+            break
+        yield page
+        after_id = page[-1][0]
+
+
+# Bulk operations - one transaction for the whole batch instead of a commit per row
+BULK_CHUNK_SIZE = 5000
+
+
+def _bulk_execute(query, rows, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Run query for every row in rows inside a single transaction.
+
+    Rows are pulled from the iterable chunk_size at a time, so generators are
+    never fully loaded into memory. Each chunk goes through executemany. When a
+    row hits a constraint error SQLite only undoes that row, so it is reported
+    and executemany carries on with the rows after it - the rest are kept.
+    The connection runs with the bulk-load profile until the batch is done.
+
+    :param query: Parameterized INSERT statement
+    :type query: str
+    :param rows: Iterable of parameter tuples
+    :type rows: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted' count and 'conflicts' list of (index, row, error) tuples
+    :rtype: dict
+    """
+    inserted = 0
+    conflicts = []
+    position = 0
+    rows = iter(rows)
+    with use_profile('bulk-load') as db:
+        cursor = db.cursor()
+        try:
+            if not db.in_transaction:
+                cursor.execute("BEGIN")
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                # executemany reads one row, runs it, then reads the next, so
+                # the last row handed out is the one that raised
+                handed_out = [-1]
+
+                def remaining(start):
+                    for index in range(start, len(chunk)):
+                        handed_out[0] = index
+                        yield chunk[index]
+
+                start = 0
+                while start < len(chunk):
+                    try:
+                        cursor.executemany(query, remaining(start))
+                        inserted += len(chunk) - start
+                        break
+                    except sqlite3.IntegrityError as e:
+                        failed = handed_out[0]
+                        inserted += failed - start
+                        conflicts.append((position + failed, chunk[failed], str(e)))
+                        start = failed + 1
+                position += len(chunk)
+            _commit(db)
+            # A batch can touch any student or course, cheaper to start over
+            _invalidate()
+        except Exception:
+            _rollback()
+            raise
+    return {'inserted': inserted, 'conflicts': conflicts}
+
+
+@_instrumented(trace=False)
+def insert_students_bulk(students, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert many students in one transaction.
+
+    Duplicate IDs do not stop the batch, they are returned in 'conflicts'.
+
+    :param students: Iterable of (student_id, name, age, email) tuples, can be a generator
+    :type students: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted' count and 'conflicts' list of (index, row, error) tuples
+    :rtype: dict
+    """
+    query = "INSERT INTO STUDENTS(ID, NAME, AGE, EMAIL) VALUES (?,?,?,?)"
+    result = _bulk_execute(query, students, chunk_size)
+    print(f"{result['inserted']} students inserted, {len(result['conflicts'])} conflicts")
+    return result
+
+
+@_instrumented(trace=False)
+def insert_instructors_bulk(instructors, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert many instructors in one transaction.
+
+    :param instructors: Iterable of (instructor_id, name, age, email) tuples, can be a generator
+    :type instructors: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted' count and 'conflicts' list of (index, row, error) tuples
+    :rtype: dict
+    """
+    query = "INSERT INTO INSTRUCTORS(ID, NAME, AGE, EMAIL) VALUES (?,?,?,?)"
+    result = _bulk_execute(query, instructors, chunk_size)
+    print(f"{result['inserted']} instructors inserted, {len(result['conflicts'])} conflicts")
+    return result
+
+
+@_instrumented(trace=False)
+def insert_courses_bulk(courses, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert many courses in one transaction.
+
+    :param courses: Iterable of (course_id, name, instructor_id) tuples, instructor_id may be None
+    :type courses: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted' count and 'conflicts' list of (index, row, error) tuples
+    :rtype: dict
+    """
+    query = "INSERT INTO COURSES(ID, NAME, INSTRUCTOR_ID) VALUES (?,?,?)"
+    result = _bulk_execute(query, courses, chunk_size)
+    print(f"{result['inserted']} courses inserted, {len(result['conflicts'])} conflicts")
+    return result
+
+
+@_instrumented(trace=False)
+def register_many(pairs, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Register many students for courses in one transaction.
+
+    Meant for the term-start enrollment load. Registrations that already exist
+    are reported in 'conflicts' instead of failing the whole load.
+
+    :param pairs: Iterable of (student_id, course_id) tuples, can be a generator
+    :type pairs: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted' count and 'conflicts' list of (index, row, error) tuples
+    :rtype: dict
+    """
+    query = "INSERT INTO REGISTRATIONS(STUDENT_ID, COURSE_ID) VALUES (?,?)"
+    result = _bulk_execute(query, pairs, chunk_size)
+    print(f"{result['inserted']} registrations inserted, {len(result['conflicts'])} conflicts")
+    return result
+
+
+# Merge (upsert) - for syncing from an external source where rows may or may
+# not exist yet. Rows whose values already match are skipped by the WHERE of
+# the DO UPDATE, so they cost a lookup but write no pages and bump no version.
+def _merge(table, columns, rows, chunk_size):
+    """
+    Insert or update rows of table by their ID in one transaction.
+
+    The counts come from the statistics row count (inserts) and the change
+    feed version (inserts plus real updates) before and after the batch, so no
+    row has to be read back.
+
+    :param table: Table name
+    :type table: str
+    :param columns: Column names, the first one is the ID
+    :type columns: tuple
+    :param rows: Iterable of tuples matching columns, can be a generator
+    :type rows: iterable
+    :param chunk_size: Rows per executemany call
+    :type chunk_size: int
+    :return: Dictionary with 'inserted', 'updated', 'unchanged' counts and 'conflicts' list
+    :rtype: dict
+    """
+    key, values = columns[0], columns[1:]
+    query = f"""INSERT INTO {table}({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+        ON CONFLICT({key}) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in values)}
+        WHERE {' OR '.join(f'{c} IS NOT excluded.{c}' for c in values)}"""
+    counters = """SELECT (SELECT ROW_COUNT FROM TABLE_COUNTS WHERE NAME = ?),
+                         (SELECT VERSION FROM CHANGE_COUNTER WHERE ID = 1)"""
+    with transaction() as db:
+        rows_before, version_before = db.execute(counters, (table,)).fetchone()
+        result = _bulk_execute(query, rows, chunk_size)
+        rows_after, version_after = db.execute(counters, (table,)).fetchone()
+    inserted = rows_after - rows_before
+    updated = version_after - version_before - inserted
+    return {'inserted': inserted,
+            'updated': updated,
+            'unchanged': result['inserted'] - inserted - updated,
+            'conflicts': result['conflicts']}
+
+
+@_instrumented(trace=False)
+def merge_students(students, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert new students and update existing ones, in one transaction.
+
+    :param students: Iterable of (student_id, name, age, email) tuples, can be a generator
+    :type students: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted', 'updated', 'unchanged' counts and 'conflicts' list
+    :rtype: dict
+    """
+    result = _merge('STUDENTS', ('ID', 'NAME', 'AGE', 'EMAIL'), students, chunk_size)
+    print(f"Students merged: {result['inserted']} inserted, {result['updated']} updated, "
+          f"{result['unchanged']} unchanged, {len(result['conflicts'])} conflicts")
+    return result
+
+
+@_instrumented(trace=False)
+def merge_instructors(instructors, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert new instructors and update existing ones, in one transaction.
+
+    :param instructors: Iterable of (instructor_id, name, age, email) tuples, can be a generator
+    :type instructors: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted', 'updated', 'unchanged' counts and 'conflicts' list
+    :rtype: dict
+    """
+    result = _merge('INSTRUCTORS', ('ID', 'NAME', 'AGE', 'EMAIL'), instructors, chunk_size)
+    print(f"Instructors merged: {result['inserted']} inserted, {result['updated']} updated, "
+          f"{result['unchanged']} unchanged, {len(result['conflicts'])} conflicts")
+    return result
+
+
+@_instrumented(trace=False)
+def merge_courses(courses, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert new courses and update existing ones, in one transaction.
+
+    :param courses: Iterable of (course_id, name, instructor_id) tuples, can be a generator
+    :type courses: iterable
+    :param chunk_size: Rows per executemany call, defaults to BULK_CHUNK_SIZE
+    :type chunk_size: int
+    :return: Dictionary with 'inserted', 'updated', 'unchanged' counts and 'conflicts' list
+    :rtype: dict
+    """
+    result = _merge('COURSES', ('ID', 'NAME', 'INSTRUCTOR_ID'), courses, chunk_size)
+    print(f"Courses merged: {result['inserted']} inserted, {result['updated']} updated, "
+          f"{result['unchanged']} unchanged, {len(result['conflicts'])} conflicts")
+    return result
+
+
+# Bulk deletes - the IDs go into a temp table and one DELETE joins on it, the
+# ON DELETE actions then take care of registrations and course instructors.
+def _delete_by_ids(table, ids):
+    """
+    Delete the rows of table whose ID is in ids, in one transaction.
+
+    :param table: STUDENTS, INSTRUCTORS or COURSES
+    :type table: str
+    :param ids: Iterable of IDs, can be a generator
+    :type ids: iterable
+    :return: Number of rows deleted from table
+    :rtype: int
+    """
+    with transaction() as db:
         cursor = db.cursor()
-        cursor.execute(query, (updated_name, updated_instructor_id, course_id))
-        db.commit()
-        db.close()
-        print(f"Course with ID {course_id} updated successfully")
-        return True
-    except Exception as e:
-        print(f'Error updating course: {e}')
-        return False
+        # Temp tables are private to the connection and live in temp storage
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS DELETE_IDS(ID TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.DELETE_IDS")
+        cursor.executemany("INSERT OR IGNORE INTO temp.DELETE_IDS(ID) VALUES (?)",
+                           ((row_id,) for row_id in ids))
+        cursor.execute(f"DELETE FROM {table} WHERE ID IN (SELECT ID FROM temp.DELETE_IDS)")
+        deleted = cursor.rowcount
+        cursor.execute("DELETE FROM temp.DELETE_IDS")
+    # Cascades can touch any roster, cheaper to start over
+    _invalidate()
+    return deleted
 
 
-def register_student_for_course(student_id, course_id):
+@_instrumented(trace=False)
+def delete_students(student_ids):
     """
-    Register a student for a course in the database.
-    
-    Creates the many-to-many relationship between students and courses.
-    
-    :param student_id: ID of the student
-    :type student_id: str
-    :param course_id: ID of the course
-    :type course_id: str
-    :return: True if registration successful
-    :rtype: bool
+    Delete many students and their registrations, e.g. a graduating cohort.
+
+    :param student_ids: Iterable of student IDs, can be a generator
+    :type student_ids: iterable
+    :return: Number of students deleted, 0 if the deletion failed
+    :rtype: int
     """
     try:
-        db = sqlite3.connect('school.db')
-        query = """
-            INSERT INTO REGISTRATIONS(STUDENT_ID, COURSE_ID)
-            VALUES (?,?)
-        """
-        cursor = db.cursor()
-        cursor.execute(query, (student_id, course_id))
-        db.commit()
-        db.close()
-        print(f'Student {student_id} registered for course {course_id}')
-        return True
-    except sqlite3.IntegrityError:
-        print(f'Student {student_id} already registered for course {course_id}')
-        return False
-    except Exception as e:
-        print(f'Error registering student: {e}')
-        return False
+        deleted = _delete_by_ids('STUDENTS', student_ids)
+        print(f"{deleted} students deleted")
+        return deleted
+    except sqlite3.Error as e:
+        print(f'Error deleting students: {e}')
+        return 0
 
 
-def unregister_student_from_course(student_id, course_id):
-    """Unregister a student from a course."""
+@_instrumented(trace=False)
+def delete_instructors(instructor_ids):
+    """
+    Delete many instructors, their courses are kept without an instructor.
+
+    :param instructor_ids: Iterable of instructor IDs, can be a generator
+    :type instructor_ids: iterable
+    :return: Number of instructors deleted, 0 if the deletion failed
+    :rtype: int
+    """
     try:
-        db = sqlite3.connect('school.db')
-        query = "DELETE FROM REGISTRATIONS WHERE STUDENT_ID=? AND COURSE_ID=?"
-        cursor = db.cursor()
-        cursor.execute(query, (student_id, course_id))
-        db.commit()
-        db.close()
-        print(f'Student {student_id} unregistered from course {course_id}')
-        return True
-    except Exception as e:
-        print(f'Error unregistering student: {e}')
-        return False
+        deleted = _delete_by_ids('INSTRUCTORS', instructor_ids)
+        print(f"{deleted} instructors deleted")
+        return deleted
+    except sqlite3.Error as e:
+        print(f'Error deleting instructors: {e}')
+        return 0
 
 
-def get_student_courses(student_id):
+@_instrumented(trace=False)
+def delete_courses(course_ids):
     """
-    Get all courses for a specific student.
-    
-    :param student_id: ID of the student
-    :type student_id: str
-    :return: List of course tuples (id, name)
-    :rtype: list
+    Delete many courses and their registrations.
+
+    :param course_ids: Iterable of course IDs, can be a generator
+    :type course_ids: iterable
+    :return: Number of courses deleted, 0 if the deletion failed
+    :rtype: int
     """
-    db = sqlite3.connect('school.db')
-    query = '''
+    try:
+        deleted = _delete_by_ids('COURSES', course_ids)
+        print(f"{deleted} courses deleted")
+        return deleted
+    except sqlite3.Error as e:
+        print(f'Error deleting courses: {e}')
+        return 0
+
+
+# Archive - registrations and courses of past terms move to a separate SQLite
+# file, attached as 'archive' on the connections that ask for history. The
+# hot tables stay small and the archive keeps a snapshot of the names, so it
+# still reads right after a course or student is deleted.
+_ARCHIVE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS archive.ARCHIVED_COURSES
+       (ID TEXT PRIMARY KEY,
+        NAME TEXT NOT NULL,
+        INSTRUCTOR_ID TEXT,
+        INSTRUCTOR_NAME TEXT,
+        CREATED_AT DATETIME,
+        ARCHIVED_AT DATETIME NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS archive.ARCHIVED_REGISTRATIONS
+       (STUDENT_ID TEXT NOT NULL,
+        COURSE_ID TEXT NOT NULL,
+        STUDENT_NAME TEXT,
+        CREATED_AT DATETIME,
+        ARCHIVED_AT DATETIME NOT NULL,
+        PRIMARY KEY (STUDENT_ID, COURSE_ID))""",
+    """CREATE INDEX IF NOT EXISTS archive.IDX_ARCHIVED_REGISTRATIONS_COURSE
+       ON ARCHIVED_REGISTRATIONS(COURSE_ID)""",
+]
+
+# UNION drops registrations that are in both, e.g. archived and made again
+_STUDENT_COURSES_ARCHIVE_QUERY = _STUDENT_COURSES_QUERY + '''
+        UNION
         SELECT c.id, c.name
-        FROM COURSES c
-        JOIN REGISTRATIONS r ON c.id = r.course_id
+        FROM archive.ARCHIVED_REGISTRATIONS r
+        JOIN archive.ARCHIVED_COURSES c ON c.id = r.course_id
         WHERE r.student_id = ?
     '''
-    cursor = db.cursor()
-    courses = cursor.execute(query, (student_id,)).fetchall()
-    db.close()
-    return courses
+_COURSE_STUDENTS_ARCHIVE_QUERY = _COURSE_STUDENTS_QUERY + '''
+        UNION
+        SELECT r.student_id, r.student_name
+        FROM archive.ARCHIVED_REGISTRATIONS r
+        WHERE r.course_id = ?
+    '''
 
 
-def get_course_students(course_id):
+def get_archive_path():
     """
-    Get all students for a specific course.
-    
-    :param course_id: ID of the course
-    :type course_id: str
-    :return: List of student tuples (id, name)
-    :rtype: list
+    Get the path of the archive file.
+
+    :return: The path set with configure_archive(), or e.g. 'school_archive.db' next to 'school.db'
+    :rtype: str
     """
-    db = sqlite3.connect('school.db')
-    query = '''
-        SELECT s.id, s.name
-        FROM STUDENTS s
-        JOIN REGISTRATIONS r ON s.id = r.student_id
-        WHERE r.course_id = ?
-    '''
-    cursor = db.cursor()
-    students = cursor.execute(query, (course_id,)).fetchall()
-    db.close()
-    return students
+    if _manager.archive_path:
+        return _manager.archive_path
+    root, ext = os.path.splitext(_manager.db_path)
+    return f"{root}_archive{ext or '.db'}"
 
 
-def search_students(search_term):
-    """Search students by name, ID, or email."""
-    db = sqlite3.connect('school.db')
-    query = '''
-        SELECT id, name, age, email FROM STUDENTS
-        WHERE name LIKE ? OR id LIKE ? OR email LIKE ?
-    '''
-    cursor = db.cursor()
-    students = cursor.execute(query, (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%')).fetchall()
-    db.close()
-    return students
+def configure_archive(archive_path=None):
+    """
+    Use a different archive file. Open connections are closed so they attach the new one.
 
+    :param archive_path: Path of the archive file, None for the default next to the database
+    :type archive_path: str, optional
+    """
+    _manager.archive_path = archive_path
+    _manager.close_all()
 
-def search_instructors(search_term):
-    """Search instructors by name, ID, or email."""
-    db = sqlite3.connect('school.db')
-    query = '''
-        SELECT id, name, age, email FROM INSTRUCTORS
-        WHERE name LIKE ? OR id LIKE ? OR email LIKE ?
-    '''
-    cursor = db.cursor()
-    instructors = cursor.execute(query, (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%')).fetchall()
-    db.close()
-    return instructors
 
+def attach_archive():
+    """
+    Attach the archive to the calling thread's connection now.
 
-def search_courses(search_term):
-    """Search courses by name or ID."""
-    db = sqlite3.connect('school.db')
-    query = '''
-        SELECT c.id, c.name, c.instructor_id, i.name as instructor_name
-        FROM COURSES c
-        LEFT JOIN INSTRUCTORS i ON c.instructor_id = i.id
-        WHERE c.name LIKE ? OR c.id LIKE ?
-    '''
-    cursor = db.cursor()
-    courses = cursor.execute(query, (f'%{search_term}%', f'%{search_term}%')).fetchall()
-    db.close()
-    return courses
+    Historical reads (include_archive=True) and archive_before() attach it
+    themselves, but ATTACH is not allowed inside a transaction. Call this
+    before a transaction() block that uses the archive.
+
+    :return: True if the archive is attached, False if there is no archive file yet
+    :rtype: bool
+    """
+    return _attach_archive(get_connection())
+
+
+def _attach_archive(db, create=False):
+    """
+    Attach the archive file to a connection as 'archive' if it is not yet.
+
+    :param db: Connection to attach to
+    :type db: sqlite3.Connection
+    :param create: Create the archive file if it does not exist, defaults to False
+    :type create: bool
+    :return: True if the archive is attached, False if there is no archive file
+    :rtype: bool
+    :raises RuntimeError: If the archive still has to be attached but a transaction is open
+    """
+    if any(row[1] == 'archive' for row in db.execute("PRAGMA database_list")):
+        return True
+    path = get_archive_path()
+    if not create and not os.path.exists(path):
+        return False
+    if db.in_transaction or _in_unit_of_work():
+        raise RuntimeError("The archive cannot be attached inside a transaction() block, "
+                           "call attach_archive() before the block")
+    db.execute("ATTACH DATABASE ? AS archive", (path,))
+    for statement in _ARCHIVE_TABLES:
+        db.execute(statement)
+    return True
+
+
+@_instrumented(trace=False)
+def archive_before(cutoff):
+    """
+    Move registrations made before cutoff, and courses that have nothing newer, to the archive.
+
+    Courses created before cutoff are only moved once none of their registrations
+    are left in the hot tables, so a course that still runs stays. Every course
+    an archived registration refers to is copied to the archive for its name.
+    Copy and delete run in one transaction across both files. In WAL mode that
+    commit is only atomic per file, but archiving again just overwrites copies.
+    Archiving is not deleting: the change feed gets no tombstones for the
+    moved rows, so sync clients (get_changes_since) keep their copies.
+
+    :param cutoff: Registrations and courses created before this time are archived (UTC, like CREATED_AT)
+    :type cutoff: datetime or str
+    :return: Dictionary with the number of archived 'registrations' and 'courses', None on error
+    :rtype: dict
+    :raises RuntimeError: Inside a transaction() block, unless attach_archive() was called first
+    """
+    if isinstance(cutoff, datetime):
+        cutoff = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        _attach_archive(get_connection(), create=True)
+        with transaction() as db:
+            cursor = db.cursor()
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO archive.ARCHIVED_COURSES
+                    (ID, NAME, INSTRUCTOR_ID, INSTRUCTOR_NAME, CREATED_AT, ARCHIVED_AT)
+                SELECT c.ID, c.NAME, c.INSTRUCTOR_ID, i.NAME, c.CREATED_AT, {_CHANGE_NOW}
+                FROM COURSES c
+                LEFT JOIN INSTRUCTORS i ON i.ID = c.INSTRUCTOR_ID
+                WHERE c.ID IN (SELECT COURSE_ID FROM REGISTRATIONS WHERE CREATED_AT < :cutoff)
+                   OR (c.CREATED_AT < :cutoff AND NOT EXISTS (
+                       SELECT 1 FROM REGISTRATIONS r
+                       WHERE r.COURSE_ID = c.ID AND r.CREATED_AT >= :cutoff))
+            """, {'cutoff': cutoff})
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO archive.ARCHIVED_REGISTRATIONS
+                    (STUDENT_ID, COURSE_ID, STUDENT_NAME, CREATED_AT, ARCHIVED_AT)
+                SELECT r.STUDENT_ID, r.COURSE_ID, s.NAME, r.CREATED_AT, {_CHANGE_NOW}
+                FROM REGISTRATIONS r
+                LEFT JOIN STUDENTS s ON s.ID = r.STUDENT_ID
+                WHERE r.CREATED_AT < :cutoff
+            """, {'cutoff': cutoff})
+            # Counted on the insert, REGISTRATIONS is a view in the compact schema
+            registrations = cursor.rowcount
+            version = cursor.execute("SELECT VERSION FROM CHANGE_COUNTER WHERE ID = 1").fetchone()[0]
+            cursor.execute("DELETE FROM REGISTRATIONS WHERE CREATED_AT < ?", (cutoff,))
+            cursor.execute("""
+                DELETE FROM COURSES
+                WHERE CREATED_AT < ?
+                  AND NOT EXISTS (SELECT 1 FROM REGISTRATIONS r WHERE r.COURSE_ID = COURSES.ID)
+            """, (cutoff,))
+            courses = cursor.rowcount
+            # The delete triggers wrote tombstones for the moved rows, take them back
+            cursor.execute("""
+                DELETE FROM TOMBSTONES
+                WHERE TABLE_NAME IN ('REGISTRATIONS', 'COURSES') AND CHANGE_VERSION > ?
+            """, (version,))
+    except sqlite3.Error as e:
+        print(f"Error archiving: {e}")
+        return None
+    _invalidate()
+    print(f"{registrations} registrations and {courses} courses archived to {get_archive_path()}")
+    return {'registrations': registrations, 'courses': courses}
 
 
-def backup_database(backup_filename=None):
+BACKUP_PREFIX = 'school_backup_'
+BACKUP_COMPRESSION = {'gzip': ('.gz', gzip.open), 'lzma': ('.xz', lzma.open)}
+
+
+@_instrumented
+def backup_database(backup_filename=None, pages=1024, progress=None, compress=None,
+                    keep=None, verify=True, busy_sleep=0.25):
     """
     Create a backup of the database.
     
     Copies the current database to a backup file with timestamp.
+
+    Uses SQLite's online backup API, which copies `pages` pages at a time and
+    lets other connections write between batches, so clients are not frozen
+    for the whole copy like with a plain file copy. If another connection
+    changes the database during the copy SQLite restarts it. Batches follow
+    each other without a pause, busy_sleep only applies when a batch could not
+    run because another connection holds a lock.
     
     :param backup_filename: Custom backup filename, defaults to None
     :type backup_filename: str, optional
+    :param pages: Pages copied per batch, -1 copies everything in one step, defaults to 1024
+    :type pages: int
+    :param progress: Called as progress(status, remaining, total) after every batch, defaults to None
+    :type progress: callable, optional
+    :param compress: 'gzip' or 'lzma' to compress the backup, defaults to None
+    :type compress: str, optional
+    :param keep: Keep only this many timestamped backups in the backup folder, defaults to None (keep all)
+    :type keep: int, optional
+    :param verify: Run PRAGMA integrity_check on the copy, defaults to True
+    :type verify: bool
+    :param busy_sleep: Seconds to wait before retrying a batch that hit a locked database, defaults to 0.25
+    :type busy_sleep: float
     :return: True if backup successful
     :rtype: bool
     """
     try:
+        if compress is not None and compress not in BACKUP_COMPRESSION:
+            raise ValueError(f"compress must be one of {', '.join(BACKUP_COMPRESSION)}")
         if not backup_filename:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"school_backup_{timestamp}.db"
-        
-        import shutil
-        shutil.copy2('school.db', backup_filename)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_filename = f"{BACKUP_PREFIX}{timestamp}.db"
+
+        copy_filename = backup_filename + '.tmp' if compress else backup_filename
+        target = sqlite3.connect(copy_filename)
+        try:
+            # sqlite3 only sleeps after a BUSY/LOCKED step, never between batches that went through
+            get_connection().backup(target, pages=pages, progress=progress, sleep=busy_sleep)
+        finally:
+            target.close()
+
+        if verify and not _integrity_ok(copy_filename):
+            os.remove(copy_filename)
+            print(f"Backup {backup_filename} failed the integrity check and was removed")
+            return False
+
+        if compress:
+            extension, open_compressed = BACKUP_COMPRESSION[compress]
+            with open(copy_filename, 'rb') as source, open_compressed(backup_filename + extension, 'wb') as packed:
+                shutil.copyfileobj(source, packed, 1024 * 1024)
+            os.remove(copy_filename)
+            backup_filename += extension
+
+        if keep is not None:
+            _rotate_backups(os.path.dirname(os.path.abspath(backup_filename)), keep)
+
         print(f"Database backed up to {backup_filename}")
         return True
     except Exception as e:
@@ -474,17 +2981,77 @@ def backup_database(backup_filename=None):
         return False
 
 
-def get_database_statistics():
+def _integrity_ok(db_filename):
+    """Run PRAGMA integrity_check on a database file and report whether it passed."""
+    check = sqlite3.connect(db_filename)
+    try:
+        return check.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+    finally:
+        check.close()
+
+
+def verify_backup(backup_filename):
+    """
+    Check a backup file with PRAGMA integrity_check.
+
+    Compressed backups (.gz, .xz) are unpacked to a temporary file first.
+
+    :param backup_filename: Path of the backup
+    :type backup_filename: str
+    :return: True if the backup is a healthy SQLite database
+    :rtype: bool
+    """
+    for extension, open_compressed in BACKUP_COMPRESSION.values():
+        if backup_filename.endswith(extension):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                unpacked = os.path.join(tmp_dir, 'backup.db')
+                with open_compressed(backup_filename, 'rb') as packed, open(unpacked, 'wb') as target:
+                    shutil.copyfileobj(packed, target, 1024 * 1024)
+                return _integrity_ok(unpacked)
+    return _integrity_ok(backup_filename)
+
+
+def _rotate_backups(directory, keep):
+    """
+    Delete the oldest timestamped backups in directory so only `keep` remain.
+
+    Only files named like the default backup name are touched. The timestamp
+    in the name sorts the same way as the time, so sorting names is enough.
+    """
+    backups = sorted(name for name in os.listdir(directory) if name.startswith(BACKUP_PREFIX)
+                     and not name.endswith('.tmp'))
+    for name in backups[:max(0, len(backups) - keep)]:
+        os.remove(os.path.join(directory, name))
+        print(f"Removed old backup {name}")
+
+
+@_instrumented
+def get_database_statistics(live=False):
     """
     Get statistics about the database contents.
     
     Returns counts of students, instructors, courses, and registrations.
+
+    The counts come from the TABLE_COUNTS table that triggers keep up to date,
+    so this is cheap enough to poll. Pass live=True to count the tables
+    directly instead, e.g. to compare against the counters.
     
+    :param live: Run COUNT(*) on every table instead of reading the counters, defaults to False
+    :type live: bool
     :return: Dictionary with count statistics
     :rtype: dict
     """
-    db = sqlite3.connect('school.db')
+    db = get_connection()
     cursor = db.cursor()
+
+    if not live:
+        counts = dict(cursor.execute('SELECT NAME, ROW_COUNT FROM TABLE_COUNTS'))
+        return {
+            'students': counts.get('STUDENTS', 0),
+            'instructors': counts.get('INSTRUCTORS', 0),
+            'courses': counts.get('COURSES', 0),
+            'registrations': counts.get('REGISTRATIONS', 0)
+        }
     
     # Count students
     cursor.execute('SELECT COUNT(*) FROM STUDENTS')
@@ -502,8 +3069,6 @@ def get_database_statistics():
     cursor.execute('SELECT COUNT(*) FROM REGISTRATIONS')
     registration_count = cursor.fetchone()[0]
     
-    db.close()
-    
     return {
         'students': student_count,
         'instructors': instructor_count,
@@ -511,6 +3076,326 @@ def get_database_statistics():
         'registrations': registration_count
     }
 
+
+@_instrumented
+def get_course_enrollment_counts():
+    """
+    Get how many students are registered in each course.
+
+    :return: Dictionary of course ID to number of registered students
+    :rtype: dict
+    """
+    return dict(get_connection().execute('SELECT COURSE_ID, STUDENT_COUNT FROM COURSE_ENROLLMENT'))
+
+
+@_instrumented
+def get_instructor_course_counts():
+    """
+    Get how many courses each instructor teaches.
+
+    :return: Dictionary of instructor ID to number of courses
+    :rtype: dict
+    """
+    return dict(get_connection().execute('SELECT INSTRUCTOR_ID, COURSE_COUNT FROM INSTRUCTOR_COURSES'))
+
+
+def rebuild_statistics():
+    """
+    Recount all statistics counters from the base tables.
+
+    Fixes any drift, e.g. after rows were changed with the triggers dropped or
+    through IDs that were renamed. Also recreates missing counter tables and
+    triggers.
+
+    :return: The statistics after the rebuild
+    :rtype: dict
+    """
+    _outside_unit_of_work("rebuild_statistics()")
+    db = get_connection()
+    cursor = db.cursor()
+    try:
+        cursor.execute("BEGIN")
+        for statement in _STATISTICS_TABLES + _statistics_triggers() + _STATISTICS_REBUILD:
+            cursor.execute(statement)
+        db.commit()
+    except Exception:
+        _rollback()
+        raise
+    print("Statistics counters rebuilt")
+    return get_database_statistics()
+
+
+# Change feed readers - see CHANGE_FEED_TABLES for how versions are kept
+_CHANGE_QUERIES = {
+    'students': _STUDENT_SELECT + ' WHERE s.CHANGE_VERSION > ? ORDER BY s.CHANGE_VERSION',
+    'instructors': _INSTRUCTOR_SELECT + ' WHERE i.CHANGE_VERSION > ? ORDER BY i.CHANGE_VERSION',
+    'courses': _COURSE_SELECT + ' WHERE c.CHANGE_VERSION > ? ORDER BY c.CHANGE_VERSION',
+    'registrations': '''SELECT STUDENT_ID, COURSE_ID FROM REGISTRATIONS
+        WHERE CHANGE_VERSION > ? ORDER BY CHANGE_VERSION''',
+}
+
+
+def get_change_token():
+    """
+    Get the current change version, to use as the token for the next get_changes_since().
+
+    :return: Change version of the last committed change, 0 for a database without changes
+    :rtype: int
+    """
+    row = get_connection().execute(
+        "SELECT VERSION FROM CHANGE_COUNTER WHERE ID = 1").fetchone()
+    return row[0] if row else 0
+
+
+@_instrumented
+def get_changes_since(token=None):
+    """
+    Get the students, instructors, courses and registrations changed after a token.
+
+    Rows come in the same shape as the get_all_* functions. Deleted rows are
+    listed under 'deleted' by ID ((student ID, course ID) for registrations).
+    Everything is read in one transaction, so the returned token matches the
+    rows exactly and can be passed to the next call.
+
+    If token is None, or too old because its tombstones were purged, or newer
+    than the database (e.g. after a restore), all rows are returned and 'full'
+    is True: the client should then replace its data instead of merging.
+
+    :param token: Token returned by the previous call or by get_change_token(), defaults to None
+    :type token: int, optional
+    :return: Dictionary with 'token', 'full', one list per entity and 'deleted'
+    :rtype: dict
+    """
+    with transaction() as db:
+        cursor = db.cursor()
+        version, purged = cursor.execute(
+            "SELECT VERSION, PURGED_VERSION FROM CHANGE_COUNTER WHERE ID = 1").fetchone()
+        full = token is None or token < purged or token > version
+        # Rows from before the change feed existed have version 0
+        since = -1 if full else token
+        changes = {'token': version, 'full': full}
+        for name, query in _CHANGE_QUERIES.items():
+            changes[name] = cursor.execute(query, (since,)).fetchall()
+        changes['deleted'] = {name: [] for name in _CHANGE_QUERIES}
+        if not full:
+            for table, key1, key2 in cursor.execute(
+                    """SELECT TABLE_NAME, KEY1, KEY2 FROM TOMBSTONES
+                       WHERE CHANGE_VERSION > ? ORDER BY CHANGE_VERSION""", (since,)):
+                if table == 'REGISTRATIONS':
+                    changes['deleted']['registrations'].append((key1, key2))
+                else:
+                    changes['deleted'][table.lower()].append(key1)
+    return changes
+
+
+def purge_tombstones(before_token):
+    """
+    Delete the tombstones of deletes made up to a change token.
+
+    Clients still holding an older token get a full reload from get_changes_since().
+
+    :param before_token: Remove tombstones with a version up to and including this token
+    :type before_token: int
+    :return: Number of tombstones removed
+    :rtype: int
+    """
+    try:
+        with transaction() as db:
+            cursor = db.cursor()
+            cursor.execute("DELETE FROM TOMBSTONES WHERE CHANGE_VERSION <= ?", (before_token,))
+            removed = cursor.rowcount
+            cursor.execute("""UPDATE CHANGE_COUNTER SET PURGED_VERSION = MAX(PURGED_VERSION, ?)
+                              WHERE ID = 1""", (before_token,))
+        print(f"{removed} tombstones purged")
+        return removed
+    except sqlite3.Error as e:
+        print(f"Error purging tombstones: {e}")
+        return 0
+
+# Write-behind - GUI writes go into a queue and a background thread saves them
+# in batches, so a burst of data entry does not wait for the disk on every row.
+# Listed in the order a batch is written, so that rows a registration or a
+# course refers to are always saved before it.
+_WRITE_BEHIND_BULK = {
+    'instructor': insert_instructors_bulk,
+    'course': insert_courses_bulk,
+    'student': insert_students_bulk,
+    'registration': register_many,
+}
+_STOP_WRITER = object()
+_WAKE_WRITER = object()  # put by flush() so a writer waiting for more rows notices right away
+
+
+class WriteBehindQueue:
+    """
+    Background writer that saves queued rows in batched transactions.
+
+    A batch is written when batch_size rows are waiting or flush_interval
+    seconds after its first row arrived, whichever comes first. Each kind of
+    row in the batch goes through its bulk insert function and the whole batch
+    is one transaction(). Within a batch instructors are written first, then
+    courses, students and registrations, so queued rows may refer to each other.
+
+    :ivar batch_size: Maximum rows per batch
+    :vartype batch_size: int
+    :ivar flush_interval: Seconds a row may wait before its batch is written
+    :vartype flush_interval: float
+    :ivar put_timeout: Seconds put() waits for room when the queue is full, None waits forever
+    :vartype put_timeout: float
+    """
+
+    def __init__(self, batch_size=500, flush_interval=0.5, max_queue=10000,
+                 put_timeout=None, on_error=None):
+        """
+        Start the writer thread.
+
+        :param batch_size: Maximum rows per batch, defaults to 500
+        :type batch_size: int
+        :param flush_interval: Seconds before a partial batch is written, defaults to 0.5
+        :type flush_interval: float
+        :param max_queue: Rows that may wait before put() blocks, defaults to 10000
+        :type max_queue: int
+        :param put_timeout: Seconds put() blocks on a full queue before raising queue.Full, defaults to None
+        :type put_timeout: float, optional
+        :param on_error: Called as on_error(kind, row, error) for every row that could not be saved,
+            defaults to printing the error. Exceptions it raises are logged and ignored
+        :type on_error: callable, optional
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.on_error = on_error or self._print_error
+        self._queue = queue.Queue(max_queue)
+        self._flush_now = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='school-db-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, kind, row):
+        """
+        Queue one row for writing.
+
+        Blocks while the queue is full, which slows the producer down to the
+        speed of the disk instead of letting the queue grow without limit.
+
+        :param kind: 'student', 'instructor', 'course' or 'registration'
+        :type kind: str
+        :param row: Values in the order the matching bulk function expects
+        :type row: tuple
+        :raises queue.Full: If put_timeout passes without room in the queue
+        :raises RuntimeError: If the queue was closed
+        """
+        if kind not in _WRITE_BEHIND_BULK:
+            raise ValueError(f"Unknown write kind '{kind}'")
+        if self._closed:
+            raise RuntimeError("Write-behind queue is closed")
+        self._queue.put((kind, row), timeout=self.put_timeout)
+
+    def flush(self):
+        """Write everything queued so far and wait until it is saved."""
+        if self._closed:
+            return  # close() already wrote everything
+        self._flush_now.set()
+        self._queue.put(_WAKE_WRITER)
+        self._queue.join()
+        self._flush_now.clear()
+
+    def close(self):
+        """Flush the remaining rows and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_now.set()
+        self._queue.put(_STOP_WRITER)
+        self._thread.join()
+
+    def pending(self):
+        """Number of rows waiting to be written."""
+        return self._queue.qsize()
+
+    def _run(self):
+        """Writer thread: collect batches and write them until close()."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _WAKE_WRITER:
+                self._queue.task_done()
+                continue
+            if item is _STOP_WRITER:
+                self._queue.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    if self._flush_now.is_set():
+                        # Someone is waiting: take what is queued, but still in full batches
+                        item = self._queue.get_nowait()
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _WAKE_WRITER:
+                    self._queue.task_done()
+                    continue
+                if item is _STOP_WRITER:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stopping:
+                self._queue.task_done()
+        # Drain anything queued after the stop marker so flush() never hangs
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _WAKE_WRITER or item is _STOP_WRITER:
+                self._queue.task_done()
+            else:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.batch_size):
+            self._write(leftover[start:start + self.batch_size])
+        for _ in leftover:
+            self._queue.task_done()
+        _manager.close()
+
+    def _write(self, batch):
+        """Write one batch in a single transaction, reporting rows that failed."""
+        try:
+            with transaction():
+                for kind, bulk_insert in _WRITE_BEHIND_BULK.items():
+                    rows = [row for row_kind, row in batch if row_kind == kind]
+                    if not rows:
+                        continue
+                    result = bulk_insert(rows)
+                    for _, row, error in result['conflicts']:
+                        self._report(kind, row, error)
+        except Exception as e:
+            for kind, row in batch:
+                self._report(kind, row, e)
+
+    def _report(self, kind, row, error):
+        """Pass a failed row to on_error, which must not take the writer thread down with it."""
+        try:
+            self.on_error(kind, row, error)
+        except Exception:
+            # flush() and close() would wait forever for a dead writer
+            logger.exception("on_error failed for %s %r", kind, row)
+
+    @staticmethod
+    def _print_error(kind, row, error):
+        """Default on_error: print like the other database functions do."""
+        print(f"Error writing {kind} {row}: {error}")
+
+
 class DatabaseGUI:
     """
     Integration class for database operations with GUI.
@@ -519,77 +3404,192 @@ class DatabaseGUI:
     I added this when I realized I needed to connect the GUI to the database.
     """
     
-    def __init__(self):
-        """Initialize database GUI and create tables."""
+    def __init__(self, db_path=None, write_behind=False, **write_behind_options):
+        """
+        Initialize database GUI and create tables.
+
+        With write_behind=True the add_*_to_db and register_student_course_db
+        methods only queue the row and return True right away; a background
+        thread saves the rows in batches (see WriteBehindQueue). Errors are
+        reported through the on_error option instead of the return value.
+
+        :param db_path: Database file to switch the shared connections to, defaults to None (keep current)
+        :type db_path: str, optional
+        :param write_behind: Queue single-object writes and save them in the background, defaults to False
+        :type write_behind: bool
+        :param write_behind_options: batch_size, flush_interval, max_queue, put_timeout, on_error
+            passed on to WriteBehindQueue
+        """
+        if db_path is not None and db_path != _manager.db_path:
+            configure_database(db_path)
         create_tables()  # Initialize database
+        self.writer = WriteBehindQueue(**write_behind_options) if write_behind else None
+
+    def flush(self):
+        """Wait until all queued writes are saved. Does nothing without write-behind."""
+        if self.writer:
+            self.writer.flush()
+
+    def close(self):
+        """Save queued writes and close the shared database connections when the GUI shuts down."""
+        if self.writer:
+            self.writer.close()
+        close_connections()
     
     def add_student_to_db(self, student):
         """Add a Student object to the database."""
+        if self.writer:
+            self.writer.put('student', (student.id, student.name, student.age, student._email))
+            return True
         return insert_student(student.id, student.name, student.age, student._email)
     
     def add_instructor_to_db(self, instructor):
         """Add an Instructor object to the database."""
+        if self.writer:
+            self.writer.put('instructor', (instructor.id, instructor.name, instructor.age, instructor._email))
+            return True
         return insert_instructor(instructor.id, instructor.name, instructor.age, instructor._email)
     
     def add_course_to_db(self, course):
         """Add a Course object to the database."""
         instructor_id = course.instructor.id if course.instructor else None
+        if self.writer:
+            self.writer.put('course', (course.id, course.name, instructor_id))
+            return True
         return insert_course(course.id, course.name, instructor_id)
     
     def register_student_course_db(self, student, course):
         """Register a student for a course in the database."""
+        if self.writer:
+            self.writer.put('registration', (student.id, course.id))
+            return True
         return register_student_for_course(student.id, course.id)
+
+    def transaction(self):
+        """Unit of work for a multi-step GUI action, see database.transaction()."""
+        return transaction()
+
+    def add_students_to_db(self, students):
+        """Add many Student objects to the database in one transaction."""
+        return insert_students_bulk((s.id, s.name, s.age, s._email) for s in students)
+
+    def add_instructors_to_db(self, instructors):
+        """Add many Instructor objects to the database in one transaction."""
+        return insert_instructors_bulk((i.id, i.name, i.age, i._email) for i in instructors)
+
+    def add_courses_to_db(self, courses):
+        """Add many Course objects to the database in one transaction."""
+        return insert_courses_bulk((c.id, c.name, c.instructor.id if c.instructor else None)
+                                   for c in courses)
+
+    def register_students_courses_db(self, pairs):
+        """Register many (student, course) object pairs in one transaction."""
+        return register_many((student.id, course.id) for student, course in pairs)
     
-    def load_all_from_db(self):
+    def load_all_from_db(self, course_ids=None):
         """
         Load all data from database and return as objects.
         
         Reconstructs the object relationships from the database tables.
         This was the most complex part to get right.
+
+        Every object is kept in a dict keyed by its ID so instructors, students
+        and courses are found with one lookup instead of a scan over the lists,
+        which keeps the load linear in the number of rows.
+
+        Passing course_ids loads only those courses, their instructors and the
+        students registered in them (one joined query each), e.g. to show a
+        single course roster without loading the whole school.
         
+        :param course_ids: Only load these courses and their rosters, defaults to None (everything)
+        :type course_ids: iterable, optional
         :return: Tuple of (students, instructors, courses) lists
         :rtype: tuple
         """
-        students = []
-        instructors = []
-        courses = []
+        # Queued writes have to be in the database before reading it back
+        self.flush()
+        if course_ids is not None:
+            return self._load_courses_from_db(course_ids)
+
+        students = {}
+        instructors = {}
+        courses = {}
         
         # Load students
-        for student_data in get_all_students():
-            student = Student(student_data[1], student_data[2], student_data[3], student_data[0])
-            students.append(student)
+        # The GUIs save validated objects, so rows read back skip the checks
+        for row in iter_students():
+            students[row[0]] = Student.from_trusted_row(row)
         
         # Load instructors
-        for instructor_data in get_all_instructors():
-            instructor = Instructor(instructor_data[1], instructor_data[2], instructor_data[3], instructor_data[0])
-            instructors.append(instructor)
+        for row in iter_instructors():
+            instructors[row[0]] = Instructor.from_trusted_row(row)
         
         # Load courses
-        for course_data in get_all_courses():
-            # Find instructor
-            instructor = None
-            if course_data[2]:  # instructor_id exists
-                for inst in instructors:
-                    if inst.id == course_data[2]:
-                        instructor = inst
-                        break
-            
-            course = Course(course_data[0], course_data[1], instructor)
-            courses.append(course)
+        for course_id, name, instructor_id, _ in iter_courses():
+            courses[course_id] = Course(course_id, name, instructors.get(instructor_id))
         
         # Load registrations
-        db = sqlite3.connect('school.db')
-        cursor = db.cursor()
-        registrations = cursor.execute('SELECT student_id, course_id FROM REGISTRATIONS').fetchall()
-        db.close()
+        db = get_connection()
+        registrations = db.execute('SELECT student_id, course_id FROM REGISTRATIONS')
         
         for student_id, course_id in registrations:
-            # Find student and course objects
-            student = next((s for s in students if s.id == student_id), None)
-            course = next((c for c in courses if c.id == course_id), None)
+            student = students.get(student_id)
+            course = courses.get(course_id)
             
             if student and course:
                 student.register_course(course)
-                course.add_student(student)
         
-        return students, instructors, courses
+        return list(students.values()), list(instructors.values()), list(courses.values())
+
+    def _load_courses_from_db(self, course_ids):
+        """
+        Load a subset of courses with their instructors and enrolled students.
+
+        :param course_ids: IDs of the courses to load
+        :type course_ids: iterable
+        :return: Tuple of (students, instructors, courses) lists
+        :rtype: tuple
+        """
+        students = {}
+        instructors = {}
+        courses = {}
+        db = get_connection()
+        course_ids = list(dict.fromkeys(course_ids))
+
+        # Keep each IN (...) list well under SQLite's parameter limit
+        for start in range(0, len(course_ids), 500):
+            chunk = course_ids[start:start + 500]
+            marks = ','.join('?' * len(chunk))
+
+            rows = db.execute(f'''
+                SELECT c.id, c.name, i.id, i.name, i.age, i.email
+                FROM COURSES c
+                LEFT JOIN INSTRUCTORS i ON c.instructor_id = i.id
+                WHERE c.id IN ({marks})
+            ''', chunk)
+            for course_id, name, instructor_id, inst_name, inst_age, inst_email in rows:
+                instructor = None
+                if instructor_id is not None:
+                    instructor = instructors.get(instructor_id)
+                    if instructor is None:
+                        instructor = Instructor.from_trusted_row(
+                            (instructor_id, inst_name, inst_age, inst_email))
+                        instructors[instructor_id] = instructor
+                courses[course_id] = Course(course_id, name, instructor)
+
+            rows = db.execute(f'''
+                SELECT r.course_id, s.id, s.name, s.age, s.email
+                FROM REGISTRATIONS r
+                JOIN STUDENTS s ON s.id = r.student_id
+                WHERE r.course_id IN ({marks})
+            ''', chunk)
+            for course_id, student_id, name, age, email in rows:
+                student = students.get(student_id)
+                if student is None:
+                    student = Student.from_trusted_row((student_id, name, age, email))
+                    students[student_id] = student
+                course = courses.get(course_id)
+                if course:
+                    student.register_course(course)
+
+        return list(students.values()), list(instructors.values()), list(courses.values())
@@ -1,21 +1,96 @@
-import re
+from validation import validate_age, validate_email
+
+class EnrollmentSet:
+    """
+    Insertion-ordered set of the courses of a student, or the students of a course.
+
+    Backed by a dict, so add, discard and membership checks are O(1) and
+    iteration keeps the order things were added in. Change it through
+    enroll() and unenroll() so the other side stays in sync.
+    """
+    __slots__ = ('_items',)
+
+    def __init__(self, items=()):
+        """
+        Creates a set, optionally with some items already in it.
+        """
+        self._items = dict.fromkeys(items) if items else {}
+
+    def add(self, item):
+        """
+        Adds an item, returns False if it was already there.
+        """
+        if item in self._items:
+            return False
+        self._items[item] = None
+        return True
+
+    def discard(self, item):
+        """
+        Removes an item, returns False if it was not there.
+        """
+        if item not in self._items:
+            return False
+        del self._items[item]
+        return True
+
+    def clear(self):
+        """
+        Removes everything.
+        """
+        self._items.clear()
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f"EnrollmentSet({list(self._items)!r})"
+
+
+def enroll(student, course):
+    """
+    Registers a student for a course on both sides at once.
+
+    Returns False if the student was already registered, nothing is added twice.
+    """
+    if not student.reg_courses.add(course):
+        return False
+    course.enrolled_students.add(student)
+    return True
+
+
+def unenroll(student, course):
+    """
+    Removes a student from a course on both sides at once.
+
+    Returns False if the student was not registered for the course.
+    """
+    if not student.reg_courses.discard(course):
+        return False
+    course.enrolled_students.discard(student)
+    return True
+
 
 class Person:
     """
     Base class for all people in the school system.
     """
+    # No per-instance __dict__, a full campus holds hundreds of thousands of these
+    __slots__ = ('name', 'age', '_email')
+
     def __init__(self, name, age, email):
         """
         Constructor that sets up a person with basic info.
         """
-        # Validating Age Here:
-        if not isinstance(age, int) or age < 0:
-            raise ValueError("Age must be a non-negative integer.")
-
-        # Validating Email Here:
-        email_val = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,4}$"
-        if not re.match(email_val, email):
-            raise ValueError("Invalid email format.")
+        # Validating Age and Email Here (precompiled regex in validation.py):
+        validate_age(age)
+        validate_email(email)
         
         self.name = name  # Public
         self.age = age    # Public
@@ -32,25 +107,58 @@ class Student(Person):
     """
     Student class that inherits from Person.
     """
+    __slots__ = ('id', 'reg_courses')
+
     def __init__(self, name, age, email, std_id):
         """
         Creates a new student object.
         """
         super().__init__(name, age, email)
         self.id = std_id
-        self.reg_courses = []  # List to store Course objects
+        self.reg_courses = EnrollmentSet()  # Registered Course objects
+
+    @classmethod
+    def from_trusted_row(cls, row):
+        """
+        Creates a student from an (id, name, age, email) row without validating it.
+
+        Only for data that was already checked, e.g. rows read back from the
+        database or rows that passed validation.validate().
+        """
+        student = cls.__new__(cls)
+        student.id, student.name, student.age, student._email = row
+        student.reg_courses = EnrollmentSet()
+        return student
 
     def register_course(self, course):
         """
-        Adds a course to the student's registration list.
+        Registers the student for a course, the course's student list is updated too.
+
+        Returns False if the student was already registered.
         """
-        (self.reg_courses).append(course)
+        return enroll(self, course)
+
+    def unregister_course(self, course):
+        """
+        Removes the student from a course, on both sides.
+        """
+        return unenroll(self, course)
+
+    def withdraw_all(self):
+        """
+        Removes the student from every course, e.g. before deleting the student.
+        """
+        for course in self.reg_courses:
+            course.enrolled_students.discard(self)
+        self.reg_courses.clear()
 
 
 class Instructor(Person):
     """
     Instructor class, also inherits from Person.
     """
+    __slots__ = ('id', 'ass_courses')
+
     def __init__(self, name, age, email, ins_id):
         """
         Creates a new instructor object.
@@ -59,6 +167,18 @@ class Instructor(Person):
         self.id = ins_id
         self.ass_courses = []  # List to store assigned Course objects
 
+    @classmethod
+    def from_trusted_row(cls, row):
+        """
+        Creates an instructor from an (id, name, age, email) row without validating it.
+
+        Only for data that was already checked, see Student.from_trusted_row.
+        """
+        instructor = cls.__new__(cls)
+        instructor.id, instructor.name, instructor.age, instructor._email = row
+        instructor.ass_courses = []
+        return instructor
+
     def assign_course(self, course):
         """
         Assigns a course to this instructor.
@@ -70,6 +190,8 @@ class Course:
     """
     Course class to represent individual courses.
     """
+    __slots__ = ('id', 'name', 'instructor', 'enrolled_students')
+
     def __init__(self, crs_id, crs_name, inst):
         """
         Creates a new course object.
@@ -77,10 +199,306 @@ class Course:
         self.id = crs_id
         self.name = crs_name
         self.instructor = inst
-        self.enrolled_students = []  # List to store Student objects
+        self.enrolled_students = EnrollmentSet()  # Enrolled Student objects
 
     def add_student(self, student):
         """
-        Enrolls a student in this course.
+        Enrolls a student in this course, the student's course list is updated too.
+
+        Returns False if the student was already enrolled.
+        """
+        return enroll(student, self)
+
+    def remove_student(self, student):
+        """
+        Removes a student from this course, on both sides.
+        """
+        return unenroll(student, self)
+
+    def remove_all_students(self):
+        """
+        Removes every student from this course, e.g. before deleting the course.
+        """
+        for student in self.enrolled_students:
+            student.reg_courses.discard(self)
+        self.enrolled_students.clear()
+
+
+class SchoolRegistry:
+    """
+    Identity map of all the students, instructors and courses of the school.
+
+    Every object is kept once, in a dict keyed by its ID, so getting or removing
+    one is a single lookup instead of a scan over a list. Emails and the courses
+    of each instructor are indexed as well. Removing something also cleans up
+    its relationships, like the ON DELETE rules in the database do.
+
+    Listeners added with subscribe() are called as listener(event, obj) after
+    every change. event is 'added', 'removed', 'changed' (e.g. a course that
+    lost its instructor, or a new email), 'registered', 'unregistered' (obj is
+    a (student, course) pair) or 'loaded' (obj is None).
+    """
+
+    def __init__(self, students=(), instructors=(), courses=()):
+        """
+        Creates a registry, optionally filled with existing objects.
+        """
+        self._students = {}      # id -> Student, in the order they were added
+        self._instructors = {}   # id -> Instructor
+        self._courses = {}       # id -> Course
+        self._emails = {}        # email -> list of the people using it
+        self._taught_by = {}     # instructor id -> {course id: Course}
+        self._listeners = []
+        self.load(students, instructors, courses)
+
+    @property
+    def students(self):
+        """
+        All students, in the order they were added.
+        """
+        return self._students.values()
+
+    @property
+    def instructors(self):
+        """
+        All instructors, in the order they were added.
+        """
+        return self._instructors.values()
+
+    @property
+    def courses(self):
+        """
+        All courses, in the order they were added.
+        """
+        return self._courses.values()
+
+    def subscribe(self, listener):
+        """
+        Calls listener(event, obj) after every change from now on.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """
+        Stops calling a listener added with subscribe().
+        """
+        self._listeners.remove(listener)
+
+    def _notify(self, event, obj):
+        for listener in list(self._listeners):
+            listener(event, obj)
+
+    def load(self, students=(), instructors=(), courses=()):
+        """
+        Replaces everything in the registry with the given objects.
+
+        Listeners get a single 'loaded' event instead of one per object, so
+        loading a whole school does not refresh the GUI thousands of times.
+        """
+        self._students.clear()
+        self._instructors.clear()
+        self._courses.clear()
+        self._emails.clear()
+        self._taught_by.clear()
+        for student in students:
+            self._add_person(self._students, student)
+        for instructor in instructors:
+            self._add_person(self._instructors, instructor)
+        for course in courses:
+            self._add_course(course)
+        self._notify('loaded', None)
+
+    def clear(self):
+        """
+        Removes everything from the registry.
+        """
+        self.load()
+
+    def _add_person(self, people, person):
+        if person.id in people:
+            return False
+        people[person.id] = person
+        self._emails.setdefault(person._email, []).append(person)
+        return True
+
+    def _remove_email(self, person):
+        people = self._emails.get(person._email)
+        if people and person in people:
+            people.remove(person)
+            if not people:
+                del self._emails[person._email]
+
+    def _add_course(self, course):
+        if course.id in self._courses:
+            return False
+        self._courses[course.id] = course
+        if course.instructor is not None:
+            self._link(course, course.instructor)
+        return True
+
+    def _link(self, course, instructor):
+        self._taught_by.setdefault(instructor.id, {})[course.id] = course
+        if course not in instructor.ass_courses:
+            instructor.assign_course(course)
+
+    def _unlink(self, course, instructor):
+        taught = self._taught_by.get(instructor.id)
+        if taught is not None:
+            taught.pop(course.id, None)
+            if not taught:
+                del self._taught_by[instructor.id]
+        if course in instructor.ass_courses:
+            instructor.ass_courses.remove(course)
+
+    def add_student(self, student):
+        """
+        Adds a student, returns False if a student with the same ID is already there.
+        """
+        if not self._add_person(self._students, student):
+            return False
+        self._notify('added', student)
+        return True
+
+    def add_instructor(self, instructor):
+        """
+        Adds an instructor, returns False if the ID is already taken.
+        """
+        if not self._add_person(self._instructors, instructor):
+            return False
+        self._notify('added', instructor)
+        return True
+
+    def add_course(self, course):
+        """
+        Adds a course and assigns it to its instructor, returns False if the ID is already taken.
+        """
+        if not self._add_course(course):
+            return False
+        self._notify('added', course)
+        return True
+
+    def get_student(self, student_id):
+        """
+        Returns the student with this ID, or None.
+        """
+        return self._students.get(student_id)
+
+    def get_instructor(self, instructor_id):
+        """
+        Returns the instructor with this ID, or None.
+        """
+        return self._instructors.get(instructor_id)
+
+    def get_course(self, course_id):
+        """
+        Returns the course with this ID, or None.
+        """
+        return self._courses.get(course_id)
+
+    def find_by_email(self, email):
+        """
+        Returns the students and instructors using this email, emails don't have to be unique.
+        """
+        return list(self._emails.get(email, ()))
+
+    def courses_taught_by(self, instructor_id):
+        """
+        Returns the courses of an instructor.
+        """
+        return list(self._taught_by.get(instructor_id, {}).values())
+
+    def remove_student(self, student_id):
+        """
+        Removes a student and takes them out of all their courses.
+
+        Returns the removed student, or None if there was no such student.
+        """
+        student = self._students.pop(student_id, None)
+        if student is None:
+            return None
+        self._remove_email(student)
+        student.withdraw_all()
+        self._notify('removed', student)
+        return student
+
+    def remove_instructor(self, instructor_id):
+        """
+        Removes an instructor, their courses stay but have no instructor anymore.
+        Listeners get a 'changed' event for each of those courses.
+
+        Returns the removed instructor, or None if there was no such instructor.
+        """
+        instructor = self._instructors.pop(instructor_id, None)
+        if instructor is None:
+            return None
+        self._remove_email(instructor)
+        # Same as ON DELETE SET NULL on COURSES.INSTRUCTOR_ID
+        orphaned = list(self._taught_by.pop(instructor_id, {}).values())
+        for course in orphaned:
+            course.instructor = None
+        instructor.ass_courses.clear()
+        self._notify('removed', instructor)
+        for course in orphaned:
+            self._notify('changed', course)
+        return instructor
+
+    def remove_course(self, course_id):
+        """
+        Removes a course, unregisters its students and takes it off its instructor.
+
+        Returns the removed course, or None if there was no such course.
+        """
+        course = self._courses.pop(course_id, None)
+        if course is None:
+            return None
+        course.remove_all_students()
+        if course.instructor is not None:
+            self._unlink(course, course.instructor)
+        self._notify('removed', course)
+        return course
+
+    def assign_instructor(self, course, instructor):
+        """
+        Changes the instructor of a course (None for no instructor) and keeps the index up to date.
+        """
+        if course.instructor is not None:
+            self._unlink(course, course.instructor)
+        course.instructor = instructor
+        if instructor is not None:
+            self._link(course, instructor)
+        self._notify('changed', course)
+
+    def change_email(self, person, email):
+        """
+        Changes the email of a student or instructor and keeps the email index up to date.
+
+        Always change emails through here once a person is in the registry,
+        setting _email directly leaves find_by_email() with the old address.
+        Raises ValueError if the email format is invalid.
+        """
+        validate_email(email)
+        indexed = person in self._emails.get(person._email, ())
+        if indexed:
+            self._remove_email(person)
+        person._email = email
+        if indexed:
+            self._emails.setdefault(email, []).append(person)
+        self._notify('changed', person)
+
+    def register(self, student, course):
+        """
+        Registers a student for a course, returns False if they already were.
+        """
+        if not enroll(student, course):
+            return False
+        self._notify('registered', (student, course))
+        return True
+
+    def unregister(self, student, course):
+        """
+        Removes a student from a course, returns False if they were not registered.
         """
-        (self.enrolled_students).append(student)
\ No newline at end of file
+        if not unenroll(student, course):
+            return False
+        self._notify('unregistered', (student, course))
+        return True
\ No newline at end of file
@@ -2,8 +2,8 @@ import sys
 from PyQt5.QtWidgets import *
 from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QTabWidget, QLabel, QFormLayout, QLineEdit, QSpinBox, QHBoxLayout, QPushButton, QComboBox, QMessageBox, QTableWidget, QTableWidgetItem, QFileDialog
 from PyQt5.QtCore import Qt
-from people import Student, Instructor, Course
-from serialization_csv import save_to_csv, load_from_csv
+from people import Student, Instructor, Course, SchoolRegistry
+from serialization_csv import save_registry_to_csv, load_registry_from_csv
 import database
 import csv
 
@@ -15,12 +15,8 @@ class SchoolManagementPyQt(QMainWindow):
     I made this as an alternative to the Tkinter version because PyQt5 looks
     more modern. The functionality is basically the same but uses Qt widgets.
     
-    :ivar students: List of Student objects
-    :vartype students: list
-    :ivar instructors: List of Instructor objects
-    :vartype instructors: list
-    :ivar courses: List of Course objects
-    :vartype courses: list
+    :ivar registry: All Student, Instructor and Course objects, keyed by ID
+    :vartype registry: SchoolRegistry
     :ivar tabs: Main tab widget container
     :vartype tabs: QTabWidget
     """
@@ -35,12 +31,12 @@ class SchoolManagementPyQt(QMainWindow):
         self.setWindowTitle("School Management System - PyQt5")
         self.setGeometry(100, 100, 1000, 700)
         
-        # Data storage
-        self.students = []
-        self.instructors = []
-        self.courses = []
+        # Data storage, one object per ID
+        self.registry = SchoolRegistry()
         
         self.init_ui()
+        # Dropdowns follow every add/remove from here on
+        self.registry.subscribe(self.on_registry_change)
     
     def init_ui(self):
         """
@@ -331,7 +327,9 @@ class SchoolManagementPyQt(QMainWindow):
                 return
             
             student = Student(name, age, email, student_id)
-            self.students.append(student)
+            if not self.registry.add_student(student):
+                QMessageBox.warning(self, "Error", f"Student ID {student_id} already exists")
+                return
             QMessageBox.information(self, "Success", "Student added successfully")
             self.clear_student_form()
             self.show_all_records()
@@ -352,10 +350,11 @@ class SchoolManagementPyQt(QMainWindow):
                 return
             
             instructor = Instructor(name, age, email, instructor_id)
-            self.instructors.append(instructor)
+            if not self.registry.add_instructor(instructor):
+                QMessageBox.warning(self, "Error", f"Instructor ID {instructor_id} already exists")
+                return
             QMessageBox.information(self, "Success", "Instructor added successfully")
             self.clear_instructor_form()
-            self.refresh_instructor_list()
             self.show_all_records()
             
         except ValueError as e:
@@ -374,16 +373,14 @@ class SchoolManagementPyQt(QMainWindow):
             
             instructor = None
             if instructor_selection:
-                # Find instructor by ID
-                for inst in self.instructors:
-                    if inst.id in instructor_selection:
-                        instructor = inst
-                        break
+                # Find instructor by the ID part of "ID - name"
+                instructor = self.registry.get_instructor(instructor_selection.partition(' - ')[0])
             
             course = Course(course_id, course_name, instructor)
-            self.courses.append(course)
-            if instructor:
-                instructor.assign_course(course)
+            # Also assigns the course to the instructor
+            if not self.registry.add_course(course):
+                QMessageBox.warning(self, "Error", f"Course ID {course_id} already exists")
+                return
             
             QMessageBox.information(self, "Success", "Course added successfully")
             self.clear_course_form()
@@ -402,23 +399,14 @@ class SchoolManagementPyQt(QMainWindow):
                 QMessageBox.warning(self, "Error", "Select both student and course")
                 return
             
-            # Find student and course
-            student = None
-            course = None
-            
-            for s in self.students:
-                if s.id in student_selection:
-                    student = s
-                    break
-            
-            for c in self.courses:
-                if c.id in course_selection:
-                    course = c
-                    break
+            # Find student and course by the ID part of "ID - name"
+            student = self.registry.get_student(student_selection.partition(' - ')[0])
+            course = self.registry.get_course(course_selection.partition(' - ')[0])
             
             if student and course:
-                student.register_course(course)
-                course.add_student(student)
+                if not self.registry.register(student, course):
+                    QMessageBox.warning(self, "Warning", "Student is already registered for this course")
+                    return
                 QMessageBox.information(self, "Success", "Student registered successfully")
                 self.show_all_records()
                 
@@ -436,7 +424,7 @@ class SchoolManagementPyQt(QMainWindow):
         
         row = 0
         # Add students
-        for student in self.students:
+        for student in self.registry.students:
             self.table.insertRow(row)
             self.table.setItem(row, 0, QTableWidgetItem("Student"))
             self.table.setItem(row, 1, QTableWidgetItem(student.id))
@@ -445,7 +433,7 @@ class SchoolManagementPyQt(QMainWindow):
             row += 1
         
         # Add instructors
-        for instructor in self.instructors:
+        for instructor in self.registry.instructors:
             self.table.insertRow(row)
             self.table.setItem(row, 0, QTableWidgetItem("Instructor"))
             self.table.setItem(row, 1, QTableWidgetItem(instructor.id))
@@ -454,7 +442,7 @@ class SchoolManagementPyQt(QMainWindow):
             row += 1
         
         # Add courses
-        for course in self.courses:
+        for course in self.registry.courses:
             self.table.insertRow(row)
             self.table.setItem(row, 0, QTableWidgetItem("Course"))
             self.table.setItem(row, 1, QTableWidgetItem(course.id))
@@ -475,7 +463,7 @@ class SchoolManagementPyQt(QMainWindow):
         row = 0
         
         # Search students
-        for student in self.students:
+        for student in self.registry.students:
             if search_term in student.name.lower() or search_term in student.id.lower():
                 self.table.insertRow(row)
                 self.table.setItem(row, 0, QTableWidgetItem("Student"))
@@ -485,7 +473,7 @@ class SchoolManagementPyQt(QMainWindow):
                 row += 1
         
         # Search instructors
-        for instructor in self.instructors:
+        for instructor in self.registry.instructors:
             if search_term in instructor.name.lower() or search_term in instructor.id.lower():
                 self.table.insertRow(row)
                 self.table.setItem(row, 0, QTableWidgetItem("Instructor"))
@@ -495,7 +483,7 @@ class SchoolManagementPyQt(QMainWindow):
                 row += 1
         
         # Search courses
-        for course in self.courses:
+        for course in self.registry.courses:
             if search_term in course.name.lower() or search_term in course.id.lower():
                 self.table.insertRow(row)
                 self.table.setItem(row, 0, QTableWidgetItem("Course"))
@@ -521,16 +509,15 @@ class SchoolManagementPyQt(QMainWindow):
         
         if reply == QMessageBox.Yes:
             try:
+                # The registry cleans up courses, registrations and instructors too
                 if record_type == 'Student':
-                    self.students = [s for s in self.students if s.id != record_id]
+                    self.registry.remove_student(record_id)
                 elif record_type == 'Instructor':
-                    self.instructors = [i for i in self.instructors if i.id != record_id]
+                    self.registry.remove_instructor(record_id)
                 elif record_type == 'Course':
-                    self.courses = [c for c in self.courses if c.id != record_id]
+                    self.registry.remove_course(record_id)
                 
                 self.show_all_records()
-                self.refresh_instructor_list()
-                self.refresh_registration_lists()
                 QMessageBox.information(self, "Success", "Record deleted")
             except Exception as e:
                 QMessageBox.critical(self, "Error", str(e))
@@ -538,7 +525,7 @@ class SchoolManagementPyQt(QMainWindow):
     def save_data(self):
         """Save data using PyQt5 interface."""
         try:
-            save_to_csv(self.students, self.instructors, self.courses)
+            save_registry_to_csv(self.registry)
             QMessageBox.information(self, "Success", "Data saved to CSV files")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save data: {e}")
@@ -546,10 +533,9 @@ class SchoolManagementPyQt(QMainWindow):
     def load_data(self):
         """Load data using PyQt5 interface."""
         try:
-            self.students, self.instructors, self.courses = load_from_csv()
+            # Dropdowns are refreshed by the registry's 'loaded' event
+            load_registry_from_csv(registry=self.registry)
             self.show_all_records()
-            self.refresh_instructor_list()
-            self.refresh_registration_lists()
             QMessageBox.information(self, "Success", "Data loaded from CSV files")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load data: {e}")
@@ -571,21 +557,21 @@ class SchoolManagementPyQt(QMainWindow):
                     with open(filename, "w", newline='') as f:
                         writer = csv.writer(f)
                         writer.writerow(["ID", "Name", "Age", "Email", "Courses"])
-                        for student in self.students:
+                        for student in self.registry.students:
                             courses = ', '.join([c.name for c in student.reg_courses])
                             writer.writerow([student.id, student.name, student.age, student._email, courses])
                 elif data_type == 'instructors':
                     with open(filename, "w", newline='') as f:
                         writer = csv.writer(f)
                         writer.writerow(["ID", "Name", "Age", "Email", "Courses"])
-                        for instructor in self.instructors:
+                        for instructor in self.registry.instructors:
                             courses = ', '.join([c.name for c in instructor.ass_courses])
                             writer.writerow([instructor.id, instructor.name, instructor.age, instructor._email, courses])
                 elif data_type == 'courses':
                     with open(filename, "w", newline='') as f:
                         writer = csv.writer(f)
                         writer.writerow(["ID", "Name", "Instructor", "Students"])
-                        for course in self.courses:
+                        for course in self.registry.courses:
                             instructor_name = course.instructor.name if course.instructor else "None"
                             students = ', '.join([s.name for s in course.enrolled_students])
                             writer.writerow([course.id, course.name, instructor_name, students])
@@ -619,18 +605,40 @@ class SchoolManagementPyQt(QMainWindow):
         """Refresh the instructor dropdown in PyQt5."""
         self.course_instructor.clear()
         self.course_instructor.addItem("")  # Empty option
-        for instructor in self.instructors:
+        for instructor in self.registry.instructors:
             self.course_instructor.addItem(f"{instructor.id} - {instructor.name}")
     
     def refresh_registration_lists(self):
         """Refresh both registration dropdowns in PyQt5."""
         # Students
         self.reg_student.clear()
-        for student in self.students:
+        for student in self.registry.students:
             self.reg_student.addItem(f"{student.id} - {student.name}")
         
         # Courses
         self.reg_course.clear()
-        for course in self.courses:
+        for course in self.registry.courses:
             self.reg_course.addItem(f"{course.id} - {course.name}")
-
+    
+    def on_registry_change(self, event, obj):
+        """
+        Keep the dropdowns and the table in sync with the registry.
+        
+        Called by the registry after every change. Registrations don't show up
+        in any dropdown so those are skipped.
+        
+        :param event: What happened, e.g. 'added' or 'removed'
+        :type event: str
+        :param obj: The object that changed, None when everything was reloaded
+        :type obj: object
+        """
+        if event in ('registered', 'unregistered'):
+            return
+        if event == 'changed':
+            # e.g. a course that lost its instructor, the table shows instructor names
+            self.show_all_records()
+            return
+        if obj is None or isinstance(obj, Instructor):
+            self.refresh_instructor_list()
+        if not isinstance(obj, Instructor):
+            self.refresh_registration_lists()
@@ -1,6 +1,7 @@
 import csv
 import os
-from people import Student, Instructor, Course
+from people import Student, Instructor, Course, SchoolRegistry
+from validation import validate
 
 def save_to_csv(students, instructors, courses, filename_prefix="school_data"):
     """
@@ -38,51 +39,103 @@ def save_to_csv(students, instructors, courses, filename_prefix="school_data"):
                 writer.writerow([student.id, course.id])
 
 
+def _read_people(filename):
+    """
+    Reads (id, name, age, email) rows from a students or instructors CSV file and validates them together.
+
+    Returns an empty list if the file does not exist. Raises ValueError naming
+    every bad row, like the Person constructor would for the first one.
+    """
+    try:
+        with open(filename, "r") as f:
+            rows = [(row["ID"], row["Name"], int(row["Age"]), row["Email"]) for row in csv.DictReader(f)]
+    except FileNotFoundError:
+        return []
+    errors = validate(rows)
+    if errors:
+        details = '; '.join(f"row {index + 1} ({row[0]}): {error}" for index, row, error in errors)
+        raise ValueError(f"{filename}: {details}")
+    return rows
+
+
+def _iter_csv(filename, columns):
+    """
+    Yields the given columns of every row in a CSV file as tuples, nothing if the file does not exist.
+    """
+    try:
+        f = open(filename, "r", newline='')
+    except FileNotFoundError:
+        return
+    with f:
+        for row in csv.DictReader(f):
+            yield tuple(row[column] for column in columns)
+
+
+def read_csv_rows(filename_prefix="school_data"):
+    """
+    Reads the school CSV files as plain rows, without creating any objects.
+
+    Returns (students, instructors, courses, registrations). Students and
+    instructors are validated lists of (id, name, age, email) rows, courses a
+    list of (id, name, instructor_id) rows and registrations an iterator of
+    (student_id, course_id) pairs that reads the file as it is consumed.
+    """
+    students = _read_people(f"{filename_prefix}_students.csv")
+    instructors = _read_people(f"{filename_prefix}_instructors.csv")
+    courses = list(_iter_csv(f"{filename_prefix}_courses.csv", ("ID", "Name", "InstructorID")))
+    registrations = _iter_csv(f"{filename_prefix}_registrations.csv", ("StudentID", "CourseID"))
+    return students, instructors, courses, registrations
+
+
+def save_registry_to_csv(registry, filename_prefix="school_data"):
+    """
+    Saves everything in a SchoolRegistry to CSV files, same format as save_to_csv.
+    """
+    save_to_csv(registry.students, registry.instructors, registry.courses, filename_prefix)
+
+
 def load_from_csv(filename_prefix="school_data"):
     """
     Loads school data from CSV files and recreates objects and relationships.
+
+    Returns (students, instructors, courses) lists.
+    """
+    registry = load_registry_from_csv(filename_prefix)
+    return list(registry.students), list(registry.instructors), list(registry.courses)
+
+
+def load_registry_from_csv(filename_prefix="school_data", registry=None):
+    """
+    Loads school data from CSV files into a SchoolRegistry.
+
+    Everything ends up in registry, replacing what it held before (a new
+    SchoolRegistry if none is given), which is returned.
     """
+    student_rows, instructor_rows, course_rows, registrations = read_csv_rows(filename_prefix)
+
     # Load People (Students and Instructors)
     students = {}
-    try:
-        with open(f"{filename_prefix}_students.csv", "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                students[row["ID"]] = Student(row["Name"], int(row["Age"]), row["Email"], row["ID"])
-    except FileNotFoundError:
-        pass
+    for row in student_rows:
+        students[row[0]] = Student.from_trusted_row(row)
 
     instructors = {}
-    try:
-        with open(f"{filename_prefix}_instructors.csv", "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                instructors[row["ID"]] = Instructor(row["Name"], int(row["Age"]), row["Email"], row["ID"])
-    except FileNotFoundError:
-        pass
+    for row in instructor_rows:
+        instructors[row[0]] = Instructor.from_trusted_row(row)
 
     # Load Courses
     courses = {}
-    try:
-        with open(f"{filename_prefix}_courses.csv", "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                instructor = instructors.get(row["InstructorID"])
-                courses[row["ID"]] = Course(row["ID"], row["Name"], instructor)
-    except FileNotFoundError:
-        pass
+    for course_id, name, instructor_id in course_rows:
+        courses[course_id] = Course(course_id, name, instructors.get(instructor_id))
 
     # Load Registrations and build relationships
-    try:
-        with open(f"{filename_prefix}_registrations.csv", "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                student = students.get(row["StudentID"])
-                course = courses.get(row["CourseID"])
-                if student and course:
-                    student.register_course(course)
-                    course.add_student(student)  # Add students to courses as well
-    except FileNotFoundError:
-        pass
+    for student_id, course_id in registrations:
+        student = students.get(student_id)
+        course = courses.get(course_id)
+        if student and course:
+            student.register_course(course)  # Adds the student to the course as well
     
-    return list(students.values()), list(instructors.values()), list(courses.values())
\ No newline at end of file
+    if registry is None:
+        registry = SchoolRegistry()
+    # Courses get assigned to their instructors as they are added
+    registry.load(students.values(), instructors.values(), courses.values())
+    return registry
\ No newline at end of file
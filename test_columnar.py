@@ -0,0 +1,120 @@
+import os
+import random
+import tempfile
+import unittest
+
+import database
+from columnar import ColumnStore
+
+
+# Behaviour tests for columnar.py, run with: python -m pytest (or python -m unittest)
+
+def random_school(seed, students=300, courses=20, max_age=60):
+    rnd = random.Random(seed)
+    student_rows = [(f"S{i}", f"Student {i % 7}", rnd.randint(16, max_age), f"s{i}@school.edu")
+                    for i in range(students)]
+    instructor_rows = [('I1', 'Ann', 40, 'ann@school.edu')]
+    course_rows = [(f"C{i}", f"Course {i}", 'I1' if i % 2 else None) for i in range(courses)]
+    registrations = sorted({(rnd.choice(student_rows)[0], rnd.choice(course_rows)[0])
+                            for _ in range(students * 3)})
+    return student_rows, instructor_rows, course_rows, registrations
+
+
+class ColumnStoreFilterTest(unittest.TestCase):
+
+    def check_filters(self, school):
+        student_rows, _, course_rows, registrations = school
+        store = ColumnStore(*school)
+        courses_per_student = {row[0]: 0 for row in student_rows}
+        students_per_course = {row[0]: 0 for row in course_rows}
+        for student_id, course_id in registrations:
+            courses_per_student[student_id] += 1
+            students_per_course[course_id] += 1
+
+        def inside(value, low, high):
+            return (low is None or low <= value) and (high is None or value <= high)
+
+        for bounds in [(None, None, None, None), (18, None, None, None), (None, 30, None, None),
+                       (20, 40, None, None), (None, None, 3, None), (None, None, None, 1),
+                       (18, 50, 2, 4), (300, None, None, None)]:
+            min_age, max_age, min_courses, max_courses = bounds
+            expected = [row for row, (student_id, _, age, _) in enumerate(student_rows)
+                        if inside(age, min_age, max_age)
+                        and inside(courses_per_student[student_id], min_courses, max_courses)]
+            with self.subTest(bounds=bounds):
+                self.assertEqual(list(store.select_students(*bounds)), expected)
+        for low, high in [(None, None), (40, None), (None, 45), (42, 48)]:
+            expected = [row for row, course in enumerate(course_rows)
+                        if inside(students_per_course[course[0]], low, high)]
+            with self.subTest(course_bounds=(low, high)):
+                self.assertEqual(list(store.select_courses(low, high)), expected)
+
+    def test_filters_on_byte_sized_columns(self):
+        self.check_filters(random_school(1))
+
+    def test_filters_on_columns_with_large_values(self):
+        # Ages above 255 take the path without the byte lookup table
+        self.check_filters(random_school(2, max_age=400))
+
+    def test_unknown_registrations_are_skipped(self):
+        store = ColumnStore([('S1', 'Bob', 20, 'bob@school.edu')], [], [('C1', 'Math', None)],
+                            [('S1', 'C1'), ('S1', 'NOPE'), ('GONE', 'C1')])
+        self.assertEqual(list(store.enrollment_counts()), [1])
+        self.assertEqual(list(store.course_sizes()), [1])
+
+
+class ColumnStoreObjectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.school = random_school(3, students=50, courses=5)
+        self.store = ColumnStore(*self.school)
+
+    def test_materialized_objects_have_all_their_relationships(self):
+        registrations = self.school[3]
+        student = self.store.get_student('S7')
+        self.assertIs(self.store.get_student('S7'), student)
+        self.assertEqual(sorted(course.id for course in student.reg_courses),
+                         sorted(course_id for student_id, course_id in registrations if student_id == 'S7'))
+        course = self.store.get_course('C1')
+        self.assertEqual(sorted(s.id for s in course.enrolled_students),
+                         sorted(student_id for student_id, course_id in registrations if course_id == 'C1'))
+        self.assertEqual(course.instructor.id, 'I1')
+        self.assertIsNone(self.store.get_course('C0').instructor)
+        self.assertIsNone(self.store.get_student('NOPE'))
+
+    def test_students_at_follows_the_selected_rows(self):
+        rows = self.store.select_students(min_age=30)
+        students = list(self.store.students_at(rows))
+        self.assertEqual([s.id for s in students], [self.store.student_ids[row] for row in rows])
+        self.assertTrue(all(s.age >= 30 for s in students))
+
+
+class ColumnStoreSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        database.configure_database(os.path.join(self._tmp.name, 'test.db'))
+        database.create_tables()
+
+    def tearDown(self):
+        database.close_connections()
+        database.configure_database()
+        self._tmp.cleanup()
+
+    def test_from_database_matches_the_tables(self):
+        students, instructors, courses, registrations = random_school(4, students=40, courses=4)
+        database.insert_instructors_bulk(instructors)
+        database.insert_courses_bulk(courses)
+        database.insert_students_bulk(students)
+        database.register_many(registrations)
+        store = ColumnStore.from_database()
+        self.assertEqual(sorted(store.student_ids), sorted(row[0] for row in students))
+        for course_id, _, _ in courses:
+            with self.subTest(course=course_id):
+                self.assertEqual(
+                    sorted(store.student_ids[row] for row in store.students_of(store.course_row(course_id))),
+                    sorted(row[0] for row in database.get_course_students(course_id)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,584 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+import threading
+import time
+import unittest
+from unittest import mock
+
+import database
+
+
+# Behaviour tests for database.py. Every test runs on its own temporary
+# database file, run with: python -m pytest (or python -m unittest)
+
+class DatabaseTestCase(unittest.TestCase):
+    """Points the database module at a fresh file for every test."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, 'test.db')
+        database.configure_database(self.path)
+        database.create_tables()
+        database.configure_cache()
+
+    def tearDown(self):
+        database.close_connections()
+        database.configure_database()
+        self._tmp.cleanup()
+
+    def add_school(self):
+        """One instructor, two courses and two students without registrations."""
+        database.insert_instructor('I1', 'Ann', 40, 'ann@school.edu')
+        database.insert_course('C1', 'Math', 'I1')
+        database.insert_course('C2', 'Biology', 'I1')
+        database.insert_student('S1', 'Bob', 20, 'bob@school.edu')
+        database.insert_student('S2', 'Cy', 21, 'cy@school.edu')
+
+    @staticmethod
+    def in_thread(func, *args):
+        """Run func on another thread, so on another connection, and return its result."""
+        result = []
+        thread = threading.Thread(target=lambda: result.append(func(*args)))
+        thread.start()
+        thread.join()
+        return result[0]
+
+
+class QueryCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = database.QueryCache(maxsize=2, ttl=None)
+        cache.put('a', 1, {'x'})
+        cache.put('b', 2, {'x'})
+        self.assertEqual(cache.get('a'), (True, 1))
+        cache.put('c', 3, {'y'})
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, 1))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = database.QueryCache(ttl=10)
+        with mock.patch.object(database.time, 'monotonic', return_value=100.0):
+            cache.put('a', 1, ())
+        with mock.patch.object(database.time, 'monotonic', return_value=109.0):
+            self.assertEqual(cache.get('a'), (True, 1))
+        with mock.patch.object(database.time, 'monotonic', return_value=110.0):
+            self.assertEqual(cache.get('a'), (False, None))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_invalidate_only_drops_tagged_entries(self):
+        cache = database.QueryCache()
+        cache.put('a', 1, {'x', 'y'})
+        cache.put('b', 2, {'y'})
+        cache.put('c', 3, {'z'})
+        cache.invalidate('x')
+        self.assertEqual([cache.get(key)[0] for key in 'abc'], [False, True, True])
+        cache.invalidate('y', 'z')
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_result_queried_before_an_invalidation_is_not_stored(self):
+        cache = database.QueryCache()
+        generation = cache.generation
+        cache.invalidate('unrelated')
+        cache.put('a', 1, {'x'}, generation)
+        self.assertEqual(cache.get('a'), (False, None))
+        cache.put('a', 1, {'x'}, cache.generation)
+        self.assertEqual(cache.get('a'), (True, 1))
+
+
+class CachedQueryTest(DatabaseTestCase):
+
+    def test_writes_only_drop_the_results_they_touch(self):
+        self.add_school()
+        database.register_student_for_course('S2', 'C2')
+        for student_id in ('S1', 'S2'):
+            database.get_student_courses(student_id)
+        database.get_course_students('C2')
+        database.register_student_for_course('S1', 'C1')
+        before = database.get_cache_stats()
+        self.assertEqual(database.get_student_courses('S1'), [('C1', 'Math')])
+        self.assertEqual(database.get_student_courses('S2'), [('C2', 'Biology')])
+        self.assertEqual(len(database.get_course_students('C2')), 1)
+        after = database.get_cache_stats()
+        # Only S1's courses were read again
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (2, 1))
+
+    def test_write_committed_while_a_query_runs_is_not_hidden(self):
+        self.add_school()
+        put = database._query_cache.put
+
+        def put_after_a_write(*args):
+            # Another thread commits between our query and our put
+            self.in_thread(database.register_student_for_course, 'S1', 'C1')
+            put(*args)
+
+        with mock.patch.object(database._query_cache, 'put', put_after_a_write):
+            self.assertEqual(database.get_student_courses('S1'), [])
+        self.assertEqual(database.get_student_courses('S1'), [('C1', 'Math')])
+
+    def test_callers_cannot_change_cached_rows(self):
+        self.add_school()
+        database.get_all_courses().clear()
+        self.assertEqual(len(database.get_all_courses()), 2)
+
+
+class ConnectionTest(DatabaseTestCase):
+
+    def pragmas(self):
+        db = database.get_connection()
+        return (db.execute("PRAGMA synchronous").fetchone()[0],
+                db.execute("PRAGMA cache_size").fetchone()[0],
+                db.execute("PRAGMA foreign_keys").fetchone()[0])
+
+    def test_reconnect_after_close_applies_the_profile(self):
+        fast = database.get_profile('fast')
+        expected = (1, fast.cache_size, 1)
+        self.assertEqual(self.pragmas(), expected)
+        first = database.get_connection()
+        database.get_connection_manager().close()
+        self.assertIsNot(database.get_connection(), first)
+        self.assertEqual(self.pragmas(), expected)
+
+
+class TransactionCacheTest(DatabaseTestCase):
+
+    def test_reader_during_unit_of_work_does_not_keep_stale_rows(self):
+        self.add_school()
+        with database.transaction():
+            database.register_student_for_course('S1', 'C1')
+            # Another thread reads the committed state before the block ends
+            self.assertEqual(self.in_thread(database.get_student_courses, 'S1'), [])
+        self.assertEqual(len(self.in_thread(database.get_student_courses, 'S1')), 1)
+        self.assertEqual(len(database.get_student_courses('S1')), 1)
+
+    def test_uncommitted_reads_are_not_cached(self):
+        self.add_school()
+        with self.assertRaises(KeyError):
+            with database.transaction():
+                database.register_student_for_course('S1', 'C1')
+                self.assertEqual(len(database.get_student_courses('S1')), 1)
+                raise KeyError('undo')
+        self.assertEqual(database.get_student_courses('S1'), [])
+        self.assertEqual(self.in_thread(database.get_student_courses, 'S1'), [])
+
+    def test_bulk_write_in_unit_of_work_invalidates_after_commit(self):
+        self.add_school()
+        self.assertEqual(len(database.get_course_students('C1')), 0)
+        with database.transaction():
+            database.register_many([('S1', 'C1'), ('S2', 'C1')])
+            self.in_thread(database.get_course_students, 'C1')
+        self.assertEqual(len(self.in_thread(database.get_course_students, 'C1')), 2)
+
+
+class TransactionTest(DatabaseTestCase):
+
+    def test_commit_and_rollback_of_whole_block(self):
+        self.add_school()
+        with database.transaction():
+            database.register_student_for_course('S1', 'C1')
+        with self.assertRaises(RuntimeError):
+            with database.transaction():
+                database.register_student_for_course('S2', 'C1')
+                raise RuntimeError('undo')
+        self.assertEqual([row[0] for row in database.get_course_students('C1')], ['S1'])
+
+    def test_nested_block_only_undoes_its_own_changes(self):
+        self.add_school()
+        with database.transaction():
+            database.register_student_for_course('S1', 'C1')
+            with self.assertRaises(ValueError):
+                with database.transaction():
+                    database.register_student_for_course('S2', 'C1')
+                    raise ValueError('undo inner')
+            database.register_student_for_course('S1', 'C2')
+        self.assertEqual([row[0] for row in database.get_course_students('C1')], ['S1'])
+        self.assertEqual(len(database.get_student_courses('S1')), 2)
+
+    def test_failed_statement_keeps_the_rest_of_the_block(self):
+        self.add_school()
+        with database.transaction():
+            self.assertTrue(database.insert_student('S3', 'Dee', 22, 'dee@school.edu'))
+            self.assertFalse(database.insert_student('S3', 'Dup', 22, 'dup@school.edu'))
+        self.assertEqual(database.get_database_statistics(live=True)['students'], 3)
+
+    def test_schema_changes_refuse_to_join_a_block(self):
+        self.add_school()
+        for func in (database.create_tables, database.migrate, database.convert_to_compact_schema,
+                     database.create_search_index, database.drop_search_index,
+                     database.rebuild_search_index, database.rebuild_statistics):
+            with self.subTest(func=func.__name__):
+                with self.assertRaises(RuntimeError):
+                    with database.transaction():
+                        database.register_student_for_course('S1', 'C1')
+                        func()
+                # The caller's unit of work was rolled back, not committed halfway
+                self.assertEqual(database.get_student_courses('S1'), [])
+        self.assertFalse(database.is_compact_schema())
+
+
+class RecordingQueue(database.WriteBehindQueue):
+    """WriteBehindQueue that remembers its batch sizes and can hold the writer in its first batch."""
+
+    def __init__(self, **options):
+        self.sizes = []
+        self.writing = threading.Event()
+        self.gate = threading.Event()
+        super().__init__(**options)
+
+    def _write(self, batch):
+        self.sizes.append(len(batch))
+        self.writing.set()
+        self.gate.wait(5)
+        super()._write(batch)
+
+
+def student_rows(start, count):
+    return [(f"S{i}", f"Student {i}", 20, f"s{i}@school.edu") for i in range(start, start + count)]
+
+
+class WriteBehindTest(DatabaseTestCase):
+
+    def test_flush_writes_full_batches(self):
+        writer = RecordingQueue(batch_size=10, flush_interval=0.01)
+        writer.put('student', student_rows(0, 1)[0])
+        self.assertTrue(writer.writing.wait(5))
+        # The writer is held in its first batch while 25 more rows queue up
+        for row in student_rows(1, 25):
+            writer.put('student', row)
+        flusher = threading.Thread(target=writer.flush)
+        flusher.start()
+        while not writer._flush_now.is_set():
+            flusher.join(0.001)
+        writer.gate.set()
+        flusher.join(5)
+        self.assertFalse(flusher.is_alive())
+        self.assertEqual(writer.sizes, [1, 10, 10, 5])
+        self.assertEqual(database.get_database_statistics(live=True)['students'], 26)
+        writer.close()
+
+    def test_flush_does_not_wait_for_the_interval(self):
+        writer = database.WriteBehindQueue(batch_size=100, flush_interval=30)
+        for row in student_rows(0, 3):
+            writer.put('student', row)
+        thread = threading.Thread(target=writer.flush)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(database.get_database_statistics(live=True)['students'], 3)
+        writer.close()
+
+    def test_close_writes_everything_and_later_flush_returns(self):
+        writer = RecordingQueue(batch_size=10, flush_interval=30)
+        writer.gate.set()
+        for row in student_rows(0, 25):
+            writer.put('student', row)
+        writer.close()
+        self.assertEqual(sum(writer.sizes), 25)
+        self.assertTrue(all(size <= 10 for size in writer.sizes))
+        writer.flush()
+        self.assertEqual(database.get_database_statistics(live=True)['students'], 25)
+        with self.assertRaises(RuntimeError):
+            writer.put('student', student_rows(25, 1)[0])
+
+    def test_failed_rows_go_to_on_error(self):
+        errors = []
+        writer = database.WriteBehindQueue(on_error=lambda kind, row, error: errors.append((kind, row[0])))
+        writer.put('student', student_rows(0, 1)[0])
+        writer.put('student', student_rows(0, 1)[0])
+        writer.put('registration', ('S0', 'NOPE'))
+        writer.close()
+        self.assertEqual(sorted(errors), [('registration', 'S0'), ('student', 'S0')])
+        self.assertEqual(database.get_database_statistics(live=True)['students'], 1)
+
+    def test_failing_on_error_does_not_stop_the_writer(self):
+        def on_error(kind, row, error):
+            raise ValueError('broken callback')
+
+        writer = database.WriteBehindQueue(flush_interval=30, on_error=on_error)
+        with self.assertLogs('database', 'ERROR') as logs:
+            writer.put('student', student_rows(0, 1)[0])
+            writer.put('student', student_rows(0, 1)[0])
+            writer.put('student', student_rows(1, 1)[0])
+            flusher = threading.Thread(target=writer.flush, daemon=True)
+            flusher.start()
+            flusher.join(5)
+            self.assertFalse(flusher.is_alive())
+        self.assertIn('broken callback', logs.output[0])
+        # The writer is still there for the next rows
+        writer.put('student', student_rows(2, 1)[0])
+        writer.close()
+        self.assertEqual(database.get_database_statistics(live=True)['students'], 3)
+
+    def test_gui_reload_sees_queued_writes(self):
+        from people import Student, Instructor, Course
+        gui = database.DatabaseGUI(write_behind=True, flush_interval=30)
+        instructor = Instructor('Ann', 40, 'ann@school.edu', 'I1')
+        course = Course('C1', 'Math', instructor)
+        student = Student('Bob', 20, 'bob@school.edu', 'S1')
+        gui.add_instructor_to_db(instructor)
+        gui.add_course_to_db(course)
+        gui.add_student_to_db(student)
+        gui.register_student_course_db(student, course)
+        students, instructors, courses = gui.load_all_from_db()
+        self.assertEqual([s.id for s in students], ['S1'])
+        self.assertEqual([c.id for c in students[0].reg_courses], ['C1'])
+        _, _, courses = gui.load_all_from_db(course_ids=['C1'])
+        self.assertEqual(courses[0].instructor.id, 'I1')
+        gui.close()
+        # Reading after close() must not wait on the stopped writer
+        self.assertEqual(len(gui.load_all_from_db()[0]), 1)
+
+
+class BulkInsertTest(DatabaseTestCase):
+
+    def test_conflicts_report_their_position_in_the_input(self):
+        database.insert_student('S0', 'Old', 30, 'old@school.edu')
+        rows = student_rows(0, 9)
+        # Duplicates at the start, at a chunk border and at the very end
+        rows = (row for row in rows[:3] + [rows[2], rows[3]] + rows[4:] + [rows[8]])
+        result = database.insert_students_bulk(rows, chunk_size=3)
+        self.assertEqual(result['inserted'], 8)
+        self.assertEqual([(index, row[0]) for index, row, error in result['conflicts']],
+                         [(0, 'S0'), (3, 'S2'), (10, 'S8')])
+        self.assertEqual(database.get_database_statistics(live=True)['students'], 9)
+
+    def test_register_many_keeps_the_new_pairs(self):
+        self.add_school()
+        database.register_student_for_course('S1', 'C1')
+        result = database.register_many([('S1', 'C1'), ('S1', 'C2'), ('S2', 'NOPE'), ('S2', 'C1')])
+        self.assertEqual(result['inserted'], 2)
+        self.assertEqual([index for index, row, error in result['conflicts']], [0, 2])
+        self.assertEqual(sorted(row[0] for row in database.get_course_students('C1')), ['S1', 'S2'])
+
+
+# Schema of the original release, before any migration existed
+OLD_SCHEMA = [
+    """CREATE TABLE STUDENTS (ID TEXT PRIMARY KEY, NAME TEXT NOT NULL, AGE INTEGER NOT NULL,
+       EMAIL TEXT NOT NULL, CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP)""",
+    """CREATE TABLE INSTRUCTORS (ID TEXT PRIMARY KEY, NAME TEXT NOT NULL, AGE INTEGER NOT NULL,
+       EMAIL TEXT NOT NULL, CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP)""",
+    """CREATE TABLE COURSES (ID TEXT PRIMARY KEY, NAME TEXT NOT NULL, INSTRUCTOR_ID TEXT,
+       CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP,
+       FOREIGN KEY (INSTRUCTOR_ID) REFERENCES INSTRUCTORS(ID))""",
+    """CREATE TABLE REGISTRATIONS (STUDENT_ID TEXT, COURSE_ID TEXT,
+       CREATED_AT DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (STUDENT_ID, COURSE_ID),
+       FOREIGN KEY (STUDENT_ID) REFERENCES STUDENTS(ID), FOREIGN KEY (COURSE_ID) REFERENCES COURSES(ID))""",
+    "INSERT INTO INSTRUCTORS(ID, NAME, AGE, EMAIL) VALUES ('I1', 'Ann', 40, 'ann@school.edu')",
+    "INSERT INTO COURSES(ID, NAME, INSTRUCTOR_ID) VALUES ('C1', 'Math', 'I1'), ('C2', 'Art', 'GONE')",
+    "INSERT INTO STUDENTS(ID, NAME, AGE, EMAIL) VALUES ('S1', 'Bob', 20, 'bob@school.edu')",
+    # Foreign keys were never enforced, so old files can hold dangling rows
+    "INSERT INTO REGISTRATIONS(STUDENT_ID, COURSE_ID) VALUES ('S1', 'C1'), ('S1', 'C2'), ('GONE', 'C1')",
+]
+
+
+class MigrationTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        database.close_connections()
+        self.path = os.path.join(self._tmp.name, 'old.db')
+        old = database.sqlite3.connect(self.path)
+        for statement in OLD_SCHEMA:
+            old.execute(statement)
+        old.commit()
+        old.close()
+        database.configure_database(self.path)
+
+    def test_old_file_is_upgraded_in_place(self):
+        self.assertEqual(database.get_schema_version(), 0)
+        database.create_tables()
+        self.assertEqual(database.get_schema_version(), database.MIGRATIONS[-1][0])
+        indexes = {row[0] for row in database.get_connection().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('IDX_REGISTRATIONS_COURSE', indexes)
+        # Dangling registrations are dropped, a missing instructor becomes NULL
+        self.assertEqual(sorted(database.get_student_courses('S1')), [('C1', 'Math'), ('C2', 'Art')])
+        self.assertEqual(database.get_course_students('C1'), [('S1', 'Bob')])
+        self.assertIsNone(database.get_connection().execute(
+            "SELECT INSTRUCTOR_ID FROM COURSES WHERE ID = 'C2'").fetchone()[0])
+        # The counters were filled from the existing rows
+        self.assertEqual(database.get_database_statistics(),
+                         database.get_database_statistics(live=True))
+        self.assertEqual(database.get_course_enrollment_counts(), {'C1': 1, 'C2': 1})
+
+    def test_migrated_file_enforces_the_new_rules(self):
+        database.create_tables()
+        token = database.get_change_token()
+        self.assertTrue(database.delete_student('S1'))
+        self.assertEqual(database.get_course_students('C1'), [])
+        self.assertEqual(database.get_database_statistics()['registrations'], 0)
+        changes = database.get_changes_since(token)
+        self.assertEqual(changes['deleted']['students'], ['S1'])
+        self.assertEqual(sorted(changes['deleted']['registrations']), [('S1', 'C1'), ('S1', 'C2')])
+
+    def test_migrations_can_be_applied_one_by_one(self):
+        self.assertEqual(database.migrate(target_version=2), 2)
+        self.assertEqual(database.get_database_statistics()['registrations'], 3)
+        self.assertEqual(database.migrate(), database.MIGRATIONS[-1][0])
+        self.assertEqual(database.get_database_statistics()['registrations'], 2)
+        # Nothing left to do on a second run
+        self.assertEqual(database.migrate(), database.MIGRATIONS[-1][0])
+
+    def test_failed_migration_keeps_the_previous_version(self):
+        broken = database.MIGRATIONS[:1] + [
+            (2, "broken", ["CREATE TABLE HALF_DONE (ID INTEGER)", "SELECT * FROM NO_SUCH_TABLE"])]
+        with mock.patch.object(database, 'MIGRATIONS', broken):
+            with self.assertRaises(database.sqlite3.Error):
+                database.migrate()
+        self.assertEqual(database.get_schema_version(), 1)
+        self.assertIsNone(database.get_connection().execute(
+            "SELECT name FROM sqlite_master WHERE name = 'HALF_DONE'").fetchone())
+        # The real migration 2 and everything after it still apply
+        self.assertEqual(database.migrate(), database.MIGRATIONS[-1][0])
+
+
+class CompactSchemaTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_school()
+        database.register_student_for_course('S1', 'C1')
+        self.assertTrue(database.convert_to_compact_schema())
+        self.assertTrue(database.is_compact_schema())
+
+    def assert_counters_match(self):
+        self.assertEqual(database.get_database_statistics(), database.get_database_statistics(live=True))
+
+    def test_conversion_keeps_the_registrations(self):
+        self.assertEqual(database.get_student_courses('S1'), [('C1', 'Math')])
+        self.assertEqual(database.get_course_enrollment_counts(), {'C1': 1, 'C2': 0})
+        self.assert_counters_match()
+
+    def test_view_inserts_map_ids_and_keep_constraint_errors(self):
+        self.assertTrue(database.register_student_for_course('S2', 'C1'))
+        self.assertFalse(database.register_student_for_course('S2', 'C1'))
+        self.assertFalse(database.register_student_for_course('S2', 'NOPE'))
+        self.assertEqual(sorted(row[0] for row in database.get_course_students('C1')), ['S1', 'S2'])
+        self.assertEqual(database.get_course_enrollment_counts()['C1'], 2)
+        self.assert_counters_match()
+
+    def test_view_updates_and_deletes_reach_counters_and_change_feed(self):
+        token = database.get_change_token()
+        with database.transaction() as db:
+            db.execute("UPDATE REGISTRATIONS SET COURSE_ID = 'C2' WHERE STUDENT_ID = 'S1'")
+        self.assertEqual(database.get_course_enrollment_counts(), {'C1': 0, 'C2': 1})
+        changes = database.get_changes_since(token)
+        self.assertEqual(changes['deleted']['registrations'], [('S1', 'C1')])
+        self.assertEqual([row[:2] for row in changes['registrations']], [('S1', 'C2')])
+        token = changes['token']
+        self.assertTrue(database.unregister_student_from_course('S1', 'C2'))
+        self.assertEqual(database.get_changes_since(token)['deleted']['registrations'], [('S1', 'C2')])
+        self.assert_counters_match()
+
+    def test_search_after_vacuum(self):
+        database.get_connection().execute("VACUUM")
+        self.assertEqual([row[0] for row in database.search_students('Bob')], ['S1'])
+        self.assertEqual([row[0] for row in database.search_courses('Biology')], ['C2'])
+        self.assertTrue(database.rebuild_search_index())
+        self.assertEqual([row[0] for row in database.search_instructors('Ann')], ['I1'])
+
+    def test_deleting_a_course_cascades_to_its_registrations(self):
+        self.assertTrue(database.delete_course('C1'))
+        self.assertEqual(database.get_student_courses('S1'), [])
+        self.assertEqual(database.get_connection().execute(
+            "SELECT COUNT(*) FROM REGISTRATION_KEYS").fetchone()[0], 0)
+        self.assert_counters_match()
+
+
+class SlowQueryLogTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        database.configure_instrumentation(slow_query_ms=0)
+        database.reset_metrics()
+
+    def tearDown(self):
+        database.configure_instrumentation(enabled=False)
+        database.reset_metrics()
+        super().tearDown()
+
+    def test_bulk_arguments_are_logged_and_kept_short(self):
+        rows = student_rows(0, 5000)
+        with self.assertLogs('database', 'WARNING') as logs:
+            database.insert_students_bulk(rows)
+        self.assertLess(len(logs.output[-1]), 1000)
+        self.assertIn("'S0'", logs.output[-1])
+        record = database.get_metrics()['slow_queries'][-1]
+        self.assertEqual(record['function'], 'insert_students_bulk')
+        self.assertIsInstance(record['args'], str)
+        self.assertLess(len(record['args']), 1000)
+
+
+class BackupTest(DatabaseTestCase):
+
+    def test_batches_follow_each_other_without_sleeping(self):
+        database.insert_students_bulk(student_rows(0, 2000))
+        steps = []
+        target = os.path.join(self._tmp.name, 'copy.db')
+        started = time.monotonic()
+        self.assertTrue(database.backup_database(target, pages=1, keep=None,
+                                                 progress=lambda status, remaining, total: steps.append(remaining)))
+        elapsed = time.monotonic() - started
+        self.assertGreater(len(steps), 20)
+        # With a pause between batches this would take len(steps) * 0.25 seconds
+        self.assertLess(elapsed, 2)
+        copy = database.sqlite3.connect(target)
+        try:
+            self.assertEqual(copy.execute("SELECT COUNT(*) FROM STUDENTS").fetchone()[0], 2000)
+        finally:
+            copy.close()
+
+
+class ArchiveTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_school()
+        database.register_student_for_course('S1', 'C1')
+        database.register_student_for_course('S2', 'C1')
+        self.token = database.get_change_token()
+        # Everything so far is older than the cutoff
+        self.assertEqual(database.archive_before(datetime.utcnow() + timedelta(days=1)),
+                         {'registrations': 2, 'courses': 2})
+
+    def test_archived_rows_are_not_reported_as_deleted(self):
+        changes = database.get_changes_since(self.token)
+        self.assertFalse(changes['full'])
+        self.assertEqual(changes['deleted'], {name: [] for name in changes['deleted']})
+        # A real delete after archiving still reaches the change feed
+        database.insert_course('C3', 'Art', 'I1')
+        token = database.get_change_token()
+        database.delete_course('C3')
+        self.assertEqual(database.get_changes_since(token)['deleted']['courses'], ['C3'])
+
+    def test_archived_registrations_stay_readable(self):
+        self.assertEqual(database.get_course_students('C1'), [])
+        self.assertEqual(sorted(row[0] for row in database.get_course_students('C1', include_archive=True)),
+                         ['S1', 'S2'])
+        self.assertEqual([row[0] for row in database.get_student_courses('S1', include_archive=True)], ['C1'])
+
+    def test_archive_before_refuses_to_attach_inside_a_transaction(self):
+        database.configure_archive(os.path.join(self._tmp.name, 'other_archive.db'))
+        with self.assertRaises(RuntimeError):
+            with database.transaction():
+                database.archive_before(datetime.utcnow())
+        # Nothing was attached, so reads do not find an archive without its tables
+        self.assertEqual(database.get_course_students('C1', include_archive=True), [])
+
+    def test_archive_reads_inside_a_transaction_need_attach_archive(self):
+        # A fresh connection does not have the archive attached yet
+        database.close_connections()
+        with self.assertRaises(RuntimeError):
+            with database.transaction():
+                database.get_course_students('C1', include_archive=True)
+        self.assertTrue(database.attach_archive())
+        with database.transaction():
+            database.insert_course('C3', 'Art', 'I1')
+            database.register_student_for_course('S1', 'C3')
+            self.assertEqual(sorted(row[0] for row in database.get_student_courses('S1', include_archive=True)),
+                             ['C1', 'C3'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+from people import EnrollmentSet, Student, Instructor, Course, SchoolRegistry, enroll, unenroll
+
+
+# Behaviour tests for people.py, run with: python -m pytest (or python -m unittest)
+
+class EnrollmentSetTest(unittest.TestCase):
+
+    def test_keeps_insertion_order_without_duplicates(self):
+        items = EnrollmentSet(['b', 'a'])
+        self.assertTrue(items.add('c'))
+        self.assertFalse(items.add('a'))
+        self.assertEqual(list(items), ['b', 'a', 'c'])
+        self.assertTrue(items.discard('a'))
+        self.assertFalse(items.discard('a'))
+        self.assertNotIn('a', items)
+        self.assertEqual(len(items), 2)
+
+    def test_enroll_and_unenroll_change_both_sides(self):
+        student = Student('Bob', 20, 'bob@school.edu', 'S1')
+        course = Course('C1', 'Math', None)
+        self.assertTrue(enroll(student, course))
+        self.assertFalse(student.register_course(course))
+        self.assertEqual(list(course.enrolled_students), [student])
+        self.assertEqual(list(student.reg_courses), [course])
+        self.assertTrue(unenroll(student, course))
+        self.assertFalse(course.remove_student(student))
+        self.assertEqual(len(course.enrolled_students), 0)
+        self.assertEqual(len(student.reg_courses), 0)
+
+
+class SchoolRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ann = Instructor('Ann', 40, 'ann@school.edu', 'I1')
+        self.math = Course('C1', 'Math', self.ann)
+        self.art = Course('C2', 'Art', self.ann)
+        self.bob = Student('Bob', 20, 'bob@school.edu', 'S1')
+        self.registry = SchoolRegistry([self.bob], [self.ann], [self.math, self.art])
+        self.registry.register(self.bob, self.math)
+        self.events = []
+        self.registry.subscribe(lambda event, obj: self.events.append((event, obj)))
+
+    def test_load_links_courses_to_their_instructor(self):
+        self.assertEqual(self.registry.courses_taught_by('I1'), [self.math, self.art])
+        self.assertEqual(self.ann.ass_courses, [self.math, self.art])
+        self.assertEqual(self.registry.find_by_email('ann@school.edu'), [self.ann])
+
+    def test_remove_student_leaves_their_courses(self):
+        self.assertIs(self.registry.remove_student('S1'), self.bob)
+        self.assertEqual(len(self.math.enrolled_students), 0)
+        self.assertEqual(self.registry.find_by_email('bob@school.edu'), [])
+        self.assertIsNone(self.registry.remove_student('S1'))
+        self.assertEqual(self.events, [('removed', self.bob)])
+
+    def test_remove_instructor_reports_the_courses_it_orphans(self):
+        self.assertIs(self.registry.remove_instructor('I1'), self.ann)
+        self.assertIsNone(self.math.instructor)
+        self.assertIsNone(self.art.instructor)
+        self.assertEqual(self.registry.courses_taught_by('I1'), [])
+        self.assertEqual(self.ann.ass_courses, [])
+        self.assertEqual(self.events, [('removed', self.ann), ('changed', self.math), ('changed', self.art)])
+
+    def test_remove_course_unregisters_and_unlinks(self):
+        self.assertIs(self.registry.remove_course('C1'), self.math)
+        self.assertEqual(len(self.bob.reg_courses), 0)
+        self.assertEqual(self.registry.courses_taught_by('I1'), [self.art])
+        self.assertEqual(self.ann.ass_courses, [self.art])
+        self.assertEqual(self.events, [('removed', self.math)])
+
+    def test_assign_instructor_moves_the_course(self):
+        bea = Instructor('Bea', 35, 'bea@school.edu', 'I2')
+        self.registry.add_instructor(bea)
+        self.registry.assign_instructor(self.math, bea)
+        self.assertEqual(self.registry.courses_taught_by('I1'), [self.art])
+        self.assertEqual(self.registry.courses_taught_by('I2'), [self.math])
+        self.assertEqual(self.events[-1], ('changed', self.math))
+
+    def test_change_email_updates_the_index(self):
+        self.registry.change_email(self.bob, 'robert@school.edu')
+        self.assertEqual(self.registry.find_by_email('bob@school.edu'), [])
+        self.assertEqual(self.registry.find_by_email('robert@school.edu'), [self.bob])
+        self.assertEqual(self.events, [('changed', self.bob)])
+        with self.assertRaises(ValueError):
+            self.registry.change_email(self.bob, 'not an email')
+        self.assertEqual(self.registry.find_by_email('robert@school.edu'), [self.bob])
+
+    def test_change_email_of_a_person_outside_the_registry(self):
+        cy = Student('Cy', 21, 'cy@school.edu', 'S2')
+        self.registry.change_email(cy, 'bob@school.edu')
+        self.assertEqual(cy._email, 'bob@school.edu')
+        self.assertEqual(self.registry.find_by_email('bob@school.edu'), [self.bob])
+
+    def test_load_sends_one_event(self):
+        self.registry.load([self.bob])
+        self.assertEqual(self.events, [('loaded', None)])
+        self.assertEqual(list(self.registry.courses), [])
+        self.assertEqual(self.registry.find_by_email('ann@school.edu'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from people import Student, Instructor, Course, SchoolRegistry
+from serialization_csv import save_to_csv, load_from_csv, save_registry_to_csv, load_registry_from_csv
+
+
+# Behaviour tests for serialization_csv.py, run with: python -m pytest (or python -m unittest)
+
+class CsvRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self._tmp.name, 'school_data')
+        self.ann = Instructor('Ann', 40, 'ann@school.edu', 'I1')
+        self.math = Course('C1', 'Math', self.ann)
+        self.art = Course('C2', 'Art', None)
+        self.bob = Student('Bob', 20, 'bob@school.edu', 'S1')
+        self.bob.register_course(self.math)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def check_loaded(self, students, instructors, courses):
+        self.assertEqual([(s.id, s.name, s.age, s._email) for s in students], [('S1', 'Bob', 20, 'bob@school.edu')])
+        self.assertEqual([i.id for i in instructors], ['I1'])
+        self.assertEqual([(c.id, c.name) for c in courses], [('C1', 'Math'), ('C2', 'Art')])
+        math, art = courses
+        self.assertIs(math.instructor, instructors[0])
+        self.assertIsNone(art.instructor)
+        self.assertEqual(instructors[0].ass_courses, [math])
+        self.assertEqual(list(students[0].reg_courses), [math])
+        self.assertEqual(list(math.enrolled_students), [students[0]])
+
+    def test_list_forms(self):
+        save_to_csv([self.bob], [self.ann], [self.math, self.art], self.prefix)
+        self.check_loaded(*load_from_csv(self.prefix))
+
+    def test_registry_forms(self):
+        save_registry_to_csv(SchoolRegistry([self.bob], [self.ann], [self.math, self.art]), self.prefix)
+        registry = SchoolRegistry()
+        events = []
+        registry.subscribe(lambda event, obj: events.append(event))
+        self.assertIs(load_registry_from_csv(self.prefix, registry), registry)
+        self.assertEqual(events, ['loaded'])
+        self.check_loaded(list(registry.students), list(registry.instructors), list(registry.courses))
+        self.assertEqual(registry.find_by_email('bob@school.edu'), [registry.get_student('S1')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+
+import tkinter as tk
+
+from people import Student, Instructor, Course
+
+
+def _has_display():
+    try:
+        tk.Tk().destroy()
+        return True
+    except tk.TclError:
+        return False
+
+
+# Behaviour tests for tkinterGUI.py, they need a display (e.g. run under xvfb-run)
+
+@unittest.skipUnless(_has_display(), "Tk needs a display")
+class DeleteSelectedTest(unittest.TestCase):
+
+    def setUp(self):
+        from tkinterGUI import SchoolGUI
+        self.gui = SchoolGUI()
+        self.gui.root.withdraw()
+        registry = self.gui.registry
+        ann = Instructor('Ann', 40, 'ann@school.edu', 'I1')
+        registry.add_instructor(ann)
+        registry.add_course(Course('C1', 'Math', ann))
+        registry.add_course(Course('C2', 'Art', ann))
+        registry.add_student(Student('Bob', 20, 'bob@school.edu', 'S1'))
+        self.gui.show_all_data()
+
+    def tearDown(self):
+        self.gui.root.destroy()
+
+    def rows(self):
+        return [tuple(self.gui.tree.item(item)['values']) for item in self.gui.tree.get_children()]
+
+    def select(self, item_type, item_id):
+        for item in self.gui.tree.get_children():
+            values = self.gui.tree.item(item)['values']
+            if values[0] == item_type and values[1] == item_id:
+                self.gui.tree.selection_set(item)
+                return
+        self.fail(f"no {item_type} {item_id} in the table")
+
+    def delete_selected(self):
+        with mock.patch('tkinterGUI.messagebox') as messagebox:
+            messagebox.askyesno.return_value = True
+            self.gui.delete_selected()
+        messagebox.showerror.assert_not_called()
+        messagebox.showinfo.assert_called_once()
+
+    def test_delete_instructor_with_courses(self):
+        self.select('Instructor', 'I1')
+        self.delete_selected()
+        self.assertIsNone(self.gui.registry.get_instructor('I1'))
+        rows = self.rows()
+        self.assertNotIn('Instructor', [row[0] for row in rows])
+        self.assertEqual([row[3] for row in rows if row[0] == 'Course'],
+                         ['Instructor: No instructor, Students: 0'] * 2)
+
+    def test_delete_course(self):
+        self.select('Course', 'C1')
+        self.delete_selected()
+        self.assertEqual([row[1] for row in self.rows() if row[0] == 'Course'], ['C2'])
+
+
+if __name__ == "__main__":
+    unittest.main()
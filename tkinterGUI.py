@@ -1,8 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from people import Student, Instructor, Course
+from people import Student, Instructor, Course, SchoolRegistry
 import database 
-from serialization_csv import save_to_csv, load_from_csv
+from serialization_csv import save_registry_to_csv
 
 class SchoolGUI:
     """
@@ -13,19 +13,15 @@ class SchoolGUI:
     
     :ivar root: Main Tkinter window
     :vartype root: tk.Tk
-    :ivar students_list: List of all students 
-    :vartype students_list: list
-    :ivar instructors_list: List of all instructors
-    :vartype instructors_list: list  
-    :ivar courses_list: List of all courses
-    :vartype courses_list: list
+    :ivar registry: All students, instructors and courses, keyed by ID
+    :vartype registry: SchoolRegistry
     """
     
     def __init__(self):
         """
         Initialize the Tkinter GUI.
         
-        Sets up the main window and creates empty lists for data storage.
+        Sets up the main window and creates an empty registry for data storage.
         Also calls setup_gui to build all the interface elements.
         """
         self.root = tk.Tk()
@@ -33,12 +29,12 @@ class SchoolGUI:
         self.root.geometry("900x700")
         self.root.configure(bg='white')
         
-        # my data lists
-        self.students_list = []
-        self.instructors_list = []
-        self.courses_list = []
+        # my data, one object per ID
+        self.registry = SchoolRegistry()
         
         self.setup_gui()
+        # dropdowns follow every add/remove from here on
+        self.registry.subscribe(self.on_registry_change)
     
     def setup_gui(self):
         """
@@ -319,7 +315,7 @@ class SchoolGUI:
         Add a new student to the system.
         
         Gets data from the form fields, validates it, creates a Student object,
-        and adds it to the list. Shows success/error messages.
+        and adds it to the registry. Shows success/error messages.
         
         :raises ValueError: When student data validation fails
         """
@@ -334,7 +330,9 @@ class SchoolGUI:
                 return
                 
             new_student = Student(name, age, email, student_id)
-            self.students_list.append(new_student)
+            if not self.registry.add_student(new_student):
+                messagebox.showerror("Error", f"Student ID {student_id} already exists!")
+                return
             
             messagebox.showinfo("Success", f"Student {name} added!")
             self.clear_student()
@@ -365,11 +363,12 @@ class SchoolGUI:
                 return
                 
             new_instructor = Instructor(name, age, email, instructor_id)
-            self.instructors_list.append(new_instructor)
+            if not self.registry.add_instructor(new_instructor):
+                messagebox.showerror("Error", f"Instructor ID {instructor_id} already exists!")
+                return
             
             messagebox.showinfo("Success", f"Instructor {name} added!")
             self.clear_instructor()
-            self.update_instructor_combo()
             self.show_all_data()
             
         except ValueError as e:
@@ -395,19 +394,16 @@ class SchoolGUI:
                 messagebox.showerror("Error", "Need course ID and name!")
                 return
             
-            # find instructor - this part was tricky
+            # the dropdown shows "ID - name"
             instructor = None
             if instructor_selection:
-                for inst in self.instructors_list:
-                    if inst.id in instructor_selection:
-                        instructor = inst
-                        break
+                instructor = self.registry.get_instructor(instructor_selection.partition(' - ')[0])
             
             new_course = Course(course_id, course_name, instructor)
-            self.courses_list.append(new_course)
-            
-            if instructor:
-                instructor.assign_course(new_course)
+            # also assigns the course to the instructor
+            if not self.registry.add_course(new_course):
+                messagebox.showerror("Error", f"Course ID {course_id} already exists!")
+                return
             
             messagebox.showinfo("Success", f"Course {course_name} added!")
             self.clear_course()
@@ -433,23 +429,14 @@ class SchoolGUI:
                 messagebox.showerror("Error", "Select both student and course!")
                 return
             
-            # find student and course - this part was tricky
-            student = None
-            course = None
-            
-            for s in self.students_list:
-                if s.id in student_selection:
-                    student = s
-                    break
-                    
-            for c in self.courses_list:
-                if c.id in course_selection:
-                    course = c
-                    break
+            # find student and course by the ID part of "ID - name"
+            student = self.registry.get_student(student_selection.partition(' - ')[0])
+            course = self.registry.get_course(course_selection.partition(' - ')[0])
             
             if student and course:
-                student.register_course(course)
-                course.add_student(student)
+                if not self.registry.register(student, course):
+                    messagebox.showwarning("Warning", f"{student.name} is already registered for {course.name}")
+                    return
                 messagebox.showinfo("Success", f"{student.name} registered for {course.name}!")
                 self.show_all_data()
             else:
@@ -470,17 +457,17 @@ class SchoolGUI:
             self.tree.delete(item)
         
         # add students
-        for student in self.students_list:
+        for student in self.registry.students:
             num_courses = len(student.reg_courses)
             self.tree.insert('', 'end', values=('Student', student.id, student.name, f'{num_courses} courses enrolled'))
         
         # add instructors  
-        for instructor in self.instructors_list:
+        for instructor in self.registry.instructors:
             num_courses = len(instructor.ass_courses)
             self.tree.insert('', 'end', values=('Instructor', instructor.id, instructor.name, f'{num_courses} courses teaching'))
         
         # add courses
-        for course in self.courses_list:
+        for course in self.registry.courses:
             inst_name = course.instructor.name if course.instructor else "No instructor"
             num_students = len(course.enrolled_students)
             info = f"Instructor: {inst_name}, Students: {num_students}"
@@ -503,19 +490,19 @@ class SchoolGUI:
             self.tree.delete(item)
         
         # search students
-        for student in self.students_list:
+        for student in self.registry.students:
             if search_text in student.name.lower() or search_text in student.id.lower():
                 num_courses = len(student.reg_courses)
                 self.tree.insert('', 'end', values=('Student', student.id, student.name, f'{num_courses} courses'))
         
         # search instructors
-        for instructor in self.instructors_list:
+        for instructor in self.registry.instructors:
             if search_text in instructor.name.lower() or search_text in instructor.id.lower():
                 num_courses = len(instructor.ass_courses)
                 self.tree.insert('', 'end', values=('Instructor', instructor.id, instructor.name, f'{num_courses} courses'))
         
         # search courses
-        for course in self.courses_list:
+        for course in self.registry.courses:
             if search_text in course.name.lower() or search_text in course.id.lower():
                 inst_name = course.instructor.name if course.instructor else "None"
                 self.tree.insert('', 'end', values=('Course', course.id, course.name, f'Instructor: {inst_name}'))
@@ -525,7 +512,8 @@ class SchoolGUI:
         Delete the selected item from the system.
         
         Gets the selected row from the table, confirms deletion, then removes
-        the item from the appropriate list. Updates dropdowns after deletion.
+        the item from the registry, which also updates the dropdowns, and
+        redraws the table.
         """
         selected = self.tree.selection()
         if not selected:
@@ -541,17 +529,16 @@ class SchoolGUI:
         # confirm deletion
         if messagebox.askyesno("Confirm", f"Delete {item_type} '{item_name}'?"):
             try:
+                # the registry takes care of courses, registrations and instructors
                 if item_type == 'Student':
-                    # remove from list
-                    self.students_list = [s for s in self.students_list if s.id != item_id]
+                    self.registry.remove_student(item_id)
                 elif item_type == 'Instructor':
-                    self.instructors_list = [i for i in self.instructors_list if i.id != item_id]
+                    self.registry.remove_instructor(item_id)
                 elif item_type == 'Course':
-                    self.courses_list = [c for c in self.courses_list if c.id != item_id]
+                    self.registry.remove_course(item_id)
                 
-                self.tree.delete(item)
-                self.update_instructor_combo()
-                self.update_reg_combos()
+                # redraw instead of deleting the row, a 'changed' event may have redrawn the table already
+                self.show_all_data()
                 messagebox.showinfo("Success", f"{item_type} deleted!")
                 
             except Exception as e:
@@ -565,7 +552,7 @@ class SchoolGUI:
         Shows success/error message to user.
         """
         try:
-            save_to_csv(self.students_list, self.instructors_list, self.courses_list)
+            save_registry_to_csv(self.registry)
             messagebox.showinfo("Success", "Data saved to CSV files!")
         except Exception as e:
             messagebox.showerror("Error", "Save error: " + str(e))
@@ -599,7 +586,7 @@ class SchoolGUI:
         Refreshes the combobox values to show all available instructors.
         """
         instructor_list = []
-        for inst in self.instructors_list:
+        for inst in self.registry.instructors:
             instructor_list.append(f"{inst.id} - {inst.name}")
         self.instructor_combo['values'] = instructor_list
     
@@ -611,16 +598,39 @@ class SchoolGUI:
         """
         # update student dropdown
         student_list = []
-        for s in self.students_list:
+        for s in self.registry.students:
             student_list.append(f"{s.id} - {s.name}")
         self.student_combo['values'] = student_list
         
         # update course dropdown  
         course_list = []
-        for c in self.courses_list:
+        for c in self.registry.courses:
             course_list.append(f"{c.id} - {c.name}")
         self.course_combo['values'] = course_list
     
+    def on_registry_change(self, event, obj):
+        """
+        Keep the dropdowns and the table in sync with the registry.
+        
+        Called by the registry after every change, registrations don't show up
+        in any dropdown so those are skipped.
+        
+        :param event: What happened, e.g. 'added' or 'removed'
+        :type event: str
+        :param obj: The object that changed, None when everything was reloaded
+        :type obj: object
+        """
+        if event in ('registered', 'unregistered'):
+            return
+        if event == 'changed':
+            # e.g. a course that lost its instructor, the table shows instructor names
+            self.show_all_data()
+            return
+        if obj is None or isinstance(obj, Instructor):
+            self.update_instructor_combo()
+        if not isinstance(obj, Instructor):
+            self.update_reg_combos()
+    
     def run(self):
         """
         Start the GUI application.
@@ -0,0 +1,65 @@
+import re
+
+# Compiled once at import, instead of re.match() looking the pattern up on
+# every Person that gets created
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,4}$")
+
+AGE_ERROR = "Age must be a non-negative integer."
+EMAIL_ERROR = "Invalid email format."
+
+
+def validate_age(age):
+    """
+    Check that an age is a non-negative integer.
+
+    :param age: Age to check
+    :type age: int
+    :raises ValueError: If the age is not a non-negative integer
+    """
+    if not isinstance(age, int) or age < 0:
+        raise ValueError(AGE_ERROR)
+
+
+def validate_email(email):
+    """
+    Check that an email address has a valid format.
+
+    :param email: Email address to check
+    :type email: str
+    :raises ValueError: If the email format is invalid
+    """
+    if not isinstance(email, str) or not EMAIL_PATTERN.match(email):
+        raise ValueError(EMAIL_ERROR)
+
+
+def validate(rows, age_column=2, email_column=3):
+    """
+    Validate the age and email of many person rows at once.
+
+    Each column is checked in its own pass, the email column through map() with
+    the precompiled regex. Nothing is raised, the bad rows are returned so a
+    loader can report all of them together.
+
+    :param rows: Sequence of rows, e.g. (id, name, age, email) tuples as stored in the database
+    :type rows: list
+    :param age_column: Index of the age in each row, defaults to 2
+    :type age_column: int
+    :param email_column: Index of the email in each row, defaults to 3
+    :type email_column: int
+    :return: List of (index, row, error) tuples, empty if every row is valid
+    :rtype: list
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    ages = [row[age_column] for row in rows]
+    emails = [row[email_column] for row in rows]
+    errors = []
+    for index, age in enumerate(ages):
+        if not isinstance(age, int) or age < 0:
+            errors.append((index, rows[index], AGE_ERROR))
+    # Anything that is not a string is checked as '' so it fails
+    matches = map(EMAIL_PATTERN.match, (e if isinstance(e, str) else '' for e in emails))
+    for index, match in enumerate(matches):
+        if match is None:
+            errors.append((index, rows[index], EMAIL_ERROR))
+    errors.sort(key=lambda error: error[0])
+    return errors